@@ -0,0 +1,121 @@
+"""Per-cycle cost of the radius filter: old per-aircraft geopy loop vs the vectorized filter
+
+Also checks that both select the same aircraft at several centres: Seattle,
+and the equator and low latitudes, where haversine is furthest from WGS-84.
+
+Run from the project root:
+    python -m benchmarks.bench_radius_filter
+"""
+import random
+import time
+
+from geopy.distance import distance, geodesic
+
+from src.location import (HAVERSINE_TOLERANCE, calculate_bounding_box, filter_within_radius, haversine_km,
+                          positions_from_states)
+
+USER_LAT, USER_LON = 47.61, -122.33
+RADIUS_KM = 20
+SIZES = [100, 1_000, 10_000]
+REPEATS = 5
+
+# (name, lat, lon) centres the filter is checked against geopy at
+CENTRES = [
+    ('Seattle', USER_LAT, USER_LON),
+    ('equator', 0.0, 0.0),
+    ('Singapore', 1.35, 103.82),
+    ('Bogota', 4.71, -74.07),
+    ('Mumbai', 19.08, 72.88),
+]
+EDGE_BEARINGS = range(0, 360, 15)
+EDGE_OFFSETS_KM = (-1e-4, -5e-5, 5e-5, 1e-4)  # Just inside and just outside the radius
+
+
+def make_states(count: int, seed: int = 0, lat: float = USER_LAT, lon: float = USER_LON) -> list[list]:
+    """Random state vectors spread over the query bounding box"""
+    rng = random.Random(seed)
+    bbox = calculate_bounding_box(lat, lon, RADIUS_KM)
+    states = []
+    for i in range(count):
+        vec = [None] * 17
+        vec[0] = f"{i:06x}"
+        vec[5] = rng.uniform(bbox['lomin'], bbox['lomax'])
+        vec[6] = rng.uniform(bbox['lamin'], bbox['lamax'])
+        states.append(vec)
+    return states
+
+
+def make_edge_states(lat: float, lon: float) -> list[list]:
+    """State vectors a few metres either side of the radius, on every bearing"""
+    states = []
+    for bearing in EDGE_BEARINGS:
+        for offset in EDGE_OFFSETS_KM:
+            point = geodesic(kilometers=RADIUS_KM + offset).destination((lat, lon), bearing)
+            vec = [None] * 17
+            vec[0] = f"{len(states):06x}"
+            vec[5], vec[6] = point.longitude, point.latitude
+            states.append(vec)
+    return states
+
+
+def geopy_loop(states: list[list], lat: float = USER_LAT, lon: float = USER_LON) -> list[int]:
+    """The original per-state-vector filter (missing positions skipped, 0.0 is a position at the equator)"""
+    user_pos = (lat, lon)
+    inside = []
+    for i, vec in enumerate(states):
+        if vec[6] is not None and vec[5] is not None:
+            if distance(user_pos, (vec[6], vec[5])).km <= RADIUS_KM:
+                inside.append(i)
+    return inside
+
+
+def vectorized(states: list[list], lat: float = USER_LAT, lon: float = USER_LON) -> list[int]:
+    lats, lons = positions_from_states(states)
+    indices, _ = filter_within_radius(lats, lons, lat, lon, RADIUS_KM)
+    return indices.tolist()
+
+
+def check_distances(states: list[list], lat: float = USER_LAT, lon: float = USER_LON):
+    """Reported distances must stay within HAVERSINE_TOLERANCE of geopy"""
+    lats, lons = positions_from_states(states)
+    indices, dists = filter_within_radius(lats, lons, lat, lon, RADIUS_KM)
+    for i, dist in zip(indices.tolist(), dists.tolist()):
+        exact = distance((lat, lon), (lats[i], lons[i])).km
+        assert abs(dist - exact) <= exact * HAVERSINE_TOLERANCE, (dist, exact)
+
+
+def check_centres():
+    """Same aircraft as geopy at every centre, including right at the edge"""
+    for name, lat, lon in CENTRES:
+        for states in (make_states(2_000, lat=lat, lon=lon), make_edge_states(lat, lon)):
+            assert geopy_loop(states, lat, lon) == vectorized(states, lat, lon), \
+                f"vectorized filter disagrees with geopy at {name}"
+            check_distances(states, lat, lon)
+        edge = make_edge_states(lat, lon)
+        lats, lons = positions_from_states(edge)
+        approx = haversine_km(lats, lons, lat, lon)
+        worst = max(abs(a / distance((lat, lon), (la, lo)).km - 1) for a, la, lo in zip(approx, lats, lons))
+        print(f"{name:>10}: matches geopy, haversine off by up to {worst * 100:.3f}% at the edge "
+              f"(tolerance {HAVERSINE_TOLERANCE * 100:.3f}%)")
+
+
+def best_of(func, states) -> float:
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(states)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    check_centres()
+    print()
+    print(f"{'aircraft':>10} {'geopy ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        states = make_states(size)
+        assert geopy_loop(states) == vectorized(states), "vectorized filter disagrees with geopy"
+        check_distances(states)
+        old = best_of(geopy_loop, states)
+        new = best_of(vectorized, states)
+        print(f"{size:>10} {old * 1000:>10.2f} {new * 1000:>10.2f} {old / new:>7.1f}x")
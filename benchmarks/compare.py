@@ -0,0 +1,66 @@
+"""Compare two benchmarks.run_all results and flag regressions
+
+Run from the project root:
+    python -m benchmarks.compare before.json after.json [--threshold 0.10]
+
+Exits with status 1 if any metric got worse by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# Metric name suffix -> True if bigger is better
+DIRECTIONS = {'_per_s': True, '_ms': False, '_ns_per_call': False, '_ns_per_lookup': False,
+              '_kb': False, '_bytes': False}
+
+
+def flatten(results: dict, prefix: str = '') -> dict[str, float]:
+    """{'a': {'b': 1}} -> {'a.b': 1}, numbers only"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def higher_is_better(name: str) -> bool | None:
+    for suffix, bigger_better in DIRECTIONS.items():
+        if name.endswith(suffix):
+            return bigger_better
+    return None  # Counts and rates that aren't performance (e.g. frames, hit rates)
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[tuple[str, float, float, float, bool]]:
+    """Rows of (metric, before, after, relative change, regressed)"""
+    old, new = flatten(before), flatten(after)
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        if name.startswith('meta.') or old[name] == 0:
+            continue
+        change = (new[name] - old[name]) / old[name]
+        direction = higher_is_better(name)
+        regressed = direction is not None and (-change if direction else change) > threshold
+        rows.append((name, old[name], new[name], change, regressed))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    rows = compare(before, after, args.threshold)
+    print(f"{'metric':<48} {'before':>14} {'after':>14} {'change':>8}")
+    for name, old, new, change, regressed in rows:
+        print(f"{name:<48} {old:>14.4g} {new:>14.4g} {change:>+7.1%}{'  REGRESSED' if regressed else ''}")
+    sys.exit(1 if any(row[4] for row in rows) else 0)
@@ -0,0 +1,225 @@
+"""Missed and late notifications vs poll interval, with and without dead-reckoning prediction
+
+Plays traffic through the same TrackPredictor the monitoring loop uses,
+polling at different intervals, and scores every notification against the
+true time the aircraft entered the radius:
+
+- plain:     notified at the first poll that finds the aircraft inside
+- predicted: also notified at the predicted entry time when the predictor
+             flags it between two polls, and then not again (like the app)
+
+A notification is on time within --tolerance seconds of the true entry.
+Later than that it is late, a prediction further ahead is early, and a
+prediction for an aircraft that never enters is a false alarm.
+
+The traffic is simulated (1 s ground truth, some aircraft turning) or read
+from a recording. With a recording the frames are the ground truth: the
+entry time is interpolated between the last report outside the radius and
+the first inside, and the polls are taken from the recorded frames.
+
+Run from the project root:
+    python -m benchmarks.eval_dead_reckoning [--tolerance 5]
+    python -m benchmarks.eval_dead_reckoning --recording traffic.osrec [--radius 2] [--lat 47.61 --lon -122.33]
+"""
+import argparse
+import math
+import random
+
+import numpy as np
+
+from src.location import filter_within_radius, haversine_km
+from src.recorder import read_recording
+from src.states_decoder import StatesBatch
+from src.track_predictor import KM_PER_DEG_LAT, TrackPredictor
+
+CENTER_LAT, CENTER_LON = 47.61, -122.33
+RADIUS_KM = 2
+DURATION_S = 3600
+AIRCRAFT = 400
+INTERVALS = [5, 10, 15, 30, 60, 90, 120]
+ETA_TOLERANCE_S = 5  # A notification this close to the true entry counts as on time
+
+
+def simulate(center_lat: float = CENTER_LAT, center_lon: float = CENTER_LON,
+             seed: int = 0) -> list[tuple[float, StatesBatch]]:
+    """Ground-truth traffic sampled every second
+
+    Most aircraft fly straight, some turn gently, which is what breaks
+    dead reckoning in practice.
+
+    Returns:
+        List of (time, StatesBatch), one per second
+    """
+    rng = random.Random(seed)
+    icaos, lats, lons, speeds, headings = [], [], [], [], []
+    km_per_deg_lon = KM_PER_DEG_LAT * math.cos(math.radians(center_lat))
+
+    for i in range(AIRCRAFT):
+        # Start somewhere within 60 km, aimed loosely at the center so crossings happen
+        start_t = rng.uniform(-600, DURATION_S)
+        bearing = rng.uniform(0, 360)
+        dist = rng.uniform(10, 60)
+        x = dist * math.sin(math.radians(bearing))
+        y = dist * math.cos(math.radians(bearing))
+        heading = (bearing + 180 + rng.gauss(0, 8)) % 360
+        speed = rng.uniform(60, 250)  # m/s, slow GA to fast jets
+        turn_rate = 0.0 if rng.random() < 0.7 else rng.uniform(-2, 2)  # deg/s
+
+        t = np.arange(DURATION_S) - start_t
+        hdg = (heading + turn_rate * np.clip(t, 0, None)) % 360
+        step = speed / 1000 * (t >= 0)  # km per second, parked before it starts
+        xs = x + np.cumsum(step * np.sin(np.radians(hdg)))
+        ys = y + np.cumsum(step * np.cos(np.radians(hdg)))
+
+        icaos.append(f"{i:06x}")
+        lats.append(center_lat + ys / KM_PER_DEG_LAT)
+        lons.append(center_lon + xs / km_per_deg_lon)
+        speeds.append(np.full(DURATION_S, speed))
+        headings.append(hdg)
+
+    # One row per second, so every frame is a contiguous slice
+    lats, lons, speeds, headings = (np.ascontiguousarray(np.array(a).T) for a in (lats, lons, speeds, headings))
+    icaos = tuple(icaos)
+    blank, airborne = (None,) * AIRCRAFT, (False,) * AIRCRAFT
+    return [(t, StatesBatch(t, icaos, blank, (t,) * AIRCRAFT, blank, airborne, tuple(speeds[t].tolist()),
+                            lats[t], lons[t], headings[t]))
+            for t in range(DURATION_S)]
+
+
+def load_recording(path: str) -> tuple[list[tuple[float, StatesBatch]], dict[str, float]]:
+    """Frames of a recording as (server time, StatesBatch), and the first query box"""
+    frames, bbox = [], None
+    for recorded_at, frame_bbox, data in read_recording(path):
+        bbox = bbox or frame_bbox
+        at = data['time'] or recorded_at
+        frames.append((at, StatesBatch.from_states(data['states'], at)))
+    return frames, bbox
+
+
+def entry_times(frames, center_lat: float, center_lon: float, radius_km: float) -> dict[str, float | None]:
+    """True time every aircraft entered the radius
+
+    Interpolated between the last report outside and the first inside when
+    the aircraft was in the previous frame too, otherwise the time of the
+    first report inside.
+
+    Returns:
+        icao24 -> entry time, None for aircraft already inside in the first
+        frame (their entry isn't known, they aren't scored)
+    """
+    entries = {}
+    previous = {}  # icao24 -> (time_position, distance km) in the previous frame
+    for index, (at, batch) in enumerate(frames):
+        if not len(batch):
+            previous = {}
+            continue
+        dists = haversine_km(batch.lats, batch.lons, center_lat, center_lon)
+        times = [time_position or at for time_position in batch.time_position]
+        for i in np.flatnonzero(dists <= radius_km).tolist():
+            icao24 = batch.icao24[i]
+            if icao24 in entries:
+                continue
+            entries[icao24] = times[i] if index else None
+            if icao24 in previous and index:
+                t0, d0 = previous[icao24]
+                if d0 > radius_km and times[i] > t0:
+                    entries[icao24] = t0 + (times[i] - t0) * (d0 - radius_km) / (d0 - float(dists[i]))
+        previous = dict(zip(batch.icao24, zip(times, dists.tolist())))
+    return entries
+
+
+def evaluate(frames, entries: dict, center_lat: float, center_lon: float, radius_km: float,
+             interval: float, tolerance: float) -> dict:
+    predictor = TrackPredictor()
+    plain, predicted = {}, {}  # icao24 -> notification time
+    by_prediction = set()
+    last_at = frames[-1][0]
+    polls, next_poll = 0, frames[0][0]
+
+    for at, batch in frames:
+        if at < next_poll:
+            continue  # Not polled, only ground truth
+        polls += 1
+        next_poll = at + interval
+
+        if len(batch):
+            inside, _ = filter_within_radius(batch.lats, batch.lons, center_lat, center_lon, radius_km)
+            for i in inside.tolist():
+                plain.setdefault(batch.icao24[i], at)
+                predicted.setdefault(batch.icao24[i], at)
+
+        predictor.update(batch, at)
+        for eta, icao24, _ in predictor.predict_entries(center_lat, center_lon, radius_km, at,
+                                                        min(at + interval, last_at), exclude=predicted):
+            predicted[icao24] = eta  # Notified at the predicted time, a later poll won't notify again
+            by_prediction.add(icao24)
+
+    entered = {icao24: entered_at for icao24, entered_at in entries.items() if entered_at is not None}
+
+    def score(notified: dict) -> tuple[int, int, int]:
+        missed = late = early = 0
+        for icao24, entered_at in entered.items():
+            if icao24 not in notified:
+                missed += 1
+            elif notified[icao24] - entered_at > tolerance:
+                late += 1
+            elif notified[icao24] - entered_at < -tolerance:
+                early += 1
+        return missed, late, early
+
+    plain_missed, plain_late, _ = score(plain)
+    predicted_missed, predicted_late, early = score(predicted)
+    eta_errors = [abs(predicted[icao24] - entered[icao24]) for icao24 in by_prediction if icao24 in entered]
+    total = len(entered) or 1
+    duration = last_at - frames[0][0]
+    return {
+        'interval_s': interval,
+        'entries': len(entered),
+        'miss_plain': plain_missed / total,
+        'late_plain': plain_late / total,
+        'miss_predicted': predicted_missed / total,
+        'late_predicted': predicted_late / total,
+        'early_predicted': early / total,
+        'false_alarms': len(by_prediction - entries.keys()),
+        'median_eta_error_s': float(np.median(eta_errors)) if eta_errors else 0.0,
+        'polls_per_day': round(86400 * (polls - 1) / duration) if polls > 1 else 0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', help="Score against a .osrec recording instead of simulated traffic")
+    parser.add_argument('--radius', type=float, default=RADIUS_KM, help=f"Radius in km (default {RADIUS_KM})")
+    parser.add_argument('--lat', type=float, help="Radius center (default: the middle of the recording's box)")
+    parser.add_argument('--lon', type=float)
+    parser.add_argument('--tolerance', type=float, default=ETA_TOLERANCE_S,
+                        help=f"Seconds from the true entry a notification is on time (default {ETA_TOLERANCE_S})")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames, bbox = load_recording(args.recording)
+        if len(frames) < 2:
+            parser.error(f"{args.recording}: needs at least two frames")
+        lat = args.lat if args.lat is not None else (bbox['lamin'] + bbox['lamax']) / 2
+        lon = args.lon if args.lon is not None else (bbox['lomin'] + bbox['lomax']) / 2
+        spacing = float(np.median(np.diff([at for at, _ in frames])))
+        intervals = [interval for interval in INTERVALS if interval >= spacing] or [spacing]
+        print(f"{args.recording}: {len(frames)} frames about {spacing:.0f} s apart, "
+              f"{(frames[-1][0] - frames[0][0]) / 60:.0f} min")
+    else:
+        lat = args.lat if args.lat is not None else CENTER_LAT
+        lon = args.lon if args.lon is not None else CENTER_LON
+        frames = simulate(lat, lon)
+        intervals = INTERVALS
+        print(f"{AIRCRAFT} simulated aircraft, {DURATION_S // 60} min of traffic")
+
+    entries = entry_times(frames, lat, lon, args.radius)
+    print(f"{args.radius:g} km radius around {lat:.4f}, {lon:.4f}, on time within {args.tolerance:g} s of the entry\n")
+    print(f"{'interval':>9} {'polls/day':>10} {'entries':>8} {'plain missed':>13} {'plain late':>11} "
+          f"{'pred missed':>12} {'pred late':>10} {'pred early':>11} {'false alarms':>13} {'eta error':>10}")
+    for interval in intervals:
+        r = evaluate(frames, entries, lat, lon, args.radius, interval, args.tolerance)
+        print(f"{r['interval_s']:>8g}s {r['polls_per_day']:>10} {r['entries']:>8} "
+              f"{r['miss_plain']:>13.1%} {r['late_plain']:>11.1%} {r['miss_predicted']:>12.1%} "
+              f"{r['late_predicted']:>10.1%} {r['early_predicted']:>11.1%} {r['false_alarms']:>13} "
+              f"{r['median_eta_error_s']:>9.1f}s")
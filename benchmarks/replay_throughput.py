@@ -0,0 +1,104 @@
+"""End-to-end poll-cycle throughput and latency from a recording, fully offline
+
+Serves the recording from a local ReplayServer and runs every frame through
+the real client and the monitoring hot path (fetch -> radius filter -> seen
+tracking -> notification text). Nothing is shown; notifications are only built.
+
+Run from the project root:
+    python -m benchmarks.replay_throughput data/recording.osrec [--radius 10] [--db data/aircraft-db.csv]
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import time
+
+from src.enrichment import EnrichmentCache
+from src.location import filter_within_radius
+from src.monitoring_loop import build_notification
+from src.opensky import OpenSkyClient
+from src.recorder import ReplayServer
+from src.seen_tracker import SeenAircraftTracker
+
+
+class NoDatabase:
+    """Stand-in when no aircraft database is given, every lookup misses"""
+
+    version = 0
+
+    def lookup_record(self, icao24):
+        return None
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(path: str, radius_km: float, aircraft_db) -> dict:
+    server = ReplayServer(path, speed=0).start()
+    os.environ.setdefault('OPENSKY_CLIENT_ID', 'replay')
+    os.environ.setdefault('OPENSKY_CLIENT_SECRET', 'replay')
+    client = OpenSkyClient(base_url=server.url, auth_url=server.token_url)
+    devnull = open(os.devnull, 'w')
+    with contextlib.redirect_stdout(devnull):
+        token = client.fetch_token()['access_token']
+
+    bbox = server.first_bbox
+    center_lat = (bbox['lamin'] + bbox['lamax']) / 2
+    center_lon = (bbox['lomin'] + bbox['lomax']) / 2
+    seen = SeenAircraftTracker()
+    enrichment = EnrichmentCache(aircraft_db)
+
+    fetch_ms, process_ms, aircraft, notified = [], [], 0, 0
+    started = time.perf_counter()
+    for _ in range(len(server.frames)):
+        with contextlib.redirect_stdout(devnull):  # Client prints a line per request
+            t0 = time.perf_counter()
+            batch = client.get_states(token, bbox)
+            t1 = time.perf_counter()
+
+        if len(batch):
+            in_radius, distances_km = filter_within_radius(batch.lats, batch.lons, center_lat, center_lon, radius_km)
+            for index, dist_km in zip(in_radius.tolist(), distances_km.tolist()):
+                if seen.observe(batch.icao24[index]):
+                    build_notification(batch.vector(index), enrichment, dist_km)
+                    notified += 1
+        t2 = time.perf_counter()
+
+        fetch_ms.append((t1 - t0) * 1000)
+        process_ms.append((t2 - t1) * 1000)
+        aircraft += len(batch)
+
+    elapsed = time.perf_counter() - started
+    server.stop()
+    devnull.close()
+    cycle_ms = [f + p for f, p in zip(fetch_ms, process_ms)]
+    return {
+        'frames': len(cycle_ms),
+        'aircraft': aircraft,
+        'notifications': notified,
+        'cycles_per_s': len(cycle_ms) / elapsed,
+        'aircraft_per_s': aircraft / elapsed,
+        'fetch_ms_median': statistics.median(fetch_ms),
+        'process_ms_median': statistics.median(process_ms),
+        'cycle_ms_median': statistics.median(cycle_ms),
+        'cycle_ms_p95': percentile(cycle_ms, 95),
+        'cycle_ms_max': max(cycle_ms)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('--radius', type=float, default=10)
+    parser.add_argument('--db', help="Aircraft database CSV (default: no enrichment)")
+    args = parser.parse_args()
+
+    if args.db:
+        from src.aircraft_db import AircraftDatabase
+        db = AircraftDatabase(args.db)
+    else:
+        db = NoDatabase()
+    print(json.dumps(run(args.recording, args.radius, db), indent=2))
@@ -0,0 +1,456 @@
+"""Benchmark suite for the hot paths, results as JSON for run-to-run comparison
+
+Everything runs offline on synthetic data (see benchmarks.synthetic): the
+aircraft database is generated and compiled in a temp directory and the
+poll cycle goes through a local ReplayServer. Compare two runs with
+benchmarks.compare.
+
+Run from the project root:
+    python -m benchmarks.run_all [--quick] [--out results.json] [--db-rows 200000]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from benchmarks import replay_throughput, synthetic
+from src.aircraft_db import KEY_SIZE, AircraftDatabase, compile_database, delta_path_for
+from src.history import SightingHistory
+from src.airline_lookup import extract_airline_code, get_airline_name, load_airline_codes
+from src.enrichment import ENRICHMENT_CACHE_SIZE, EnrichmentCache
+from src.location import filter_within_radius, positions_from_states
+from src.monitoring_loop import build_notification
+from src.scheduler import PollScheduler, traffic_level
+from src.seen_tracker import MAX_TRACKED, SeenAircraftTracker
+from src.shared_state import SharedState
+from src.snapshot import RuntimeSnapshots
+from src.states_decoder import _loads, decode_states
+
+USER_LAT, USER_LON = 47.61, -122.33
+RADIUS_KM = 20        # Radius filter and poll cycle
+TRAFFIC_BOX_KM = 50   # Synthetic traffic is spread over this half-size
+DB_ROWS = 200_000     # Roughly a third of the real OpenSky dump
+HOT_KEYS = 100
+REPEATS = 7
+
+
+def timed(func, repeats: int = REPEATS) -> dict:
+    """Median and best wall time of func() in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times)}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the code being measured"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def rss_kb() -> int:
+    """Current resident set size (Linux), falls back to the peak elsewhere"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def database_load_child(csv_path: str) -> dict:
+    """Runs in a fresh interpreter so the RSS numbers only contain the database"""
+    before = rss_kb()
+    start = time.perf_counter()
+    with quiet():
+        db = AircraftDatabase(csv_path)
+    load_ms = (time.perf_counter() - start) * 1000
+    after_load = rss_kb()
+
+    # Touch every page once, the worst case for a long-running process
+    keys = db._mm[db._keys_off:db._keys_off + KEY_SIZE * len(db)]
+    for start in range(0, len(keys), KEY_SIZE):
+        db._read_record(keys[start:start + KEY_SIZE].hex())
+    return {
+        'aircraft': len(db),
+        'load_ms': load_ms,
+        'rss_before_kb': before,
+        'rss_after_load_kb': after_load,
+        'rss_after_full_scan_kb': rss_kb(),
+        'compiled_bytes': os.path.getsize(db.path)
+    }
+
+
+def bench_database(csv_path: str) -> dict:
+    start = time.perf_counter()
+    with quiet():
+        compile_database(csv_path)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    child = subprocess.run([sys.executable, '-m', 'benchmarks.run_all', '--load-child', csv_path],
+                           capture_output=True, text=True, check=True)
+    return {'compile_ms': compile_ms, **json.loads(child.stdout)}
+
+
+def bench_database_update(csv_path: str, tmp_dir: str) -> dict:
+    """Next month's dump with 1% of the rows changed, applied as a delta instead of a recompile"""
+    with open(csv_path, encoding='utf-8') as f:
+        header, *rows = f.read().splitlines()
+    rng = random.Random(2)
+    for index in rng.sample(range(len(rows)), len(rows) // 100):
+        fields = rows[index].split(',')
+        fields[3] = f"'{rng.choice(synthetic.MANUFACTURERS)[1][0]}'"
+        rows[index] = ','.join(fields)
+    new_path = os.path.join(tmp_dir, 'aircraft-db-next.csv')
+    with open(new_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join([header] + rows[len(rows) // 200:]) + '\n')  # And 0.5% removed
+
+    with quiet():
+        db = AircraftDatabase(csv_path)
+        update = db.diff_dump(new_path)
+        stats = db.apply_update(update)
+    db.close()
+    os.remove(delta_path_for(db.path))  # Later steps use the original data
+    return {
+        'added': stats['added'],
+        'changed': stats['changed'],
+        'removed': stats['removed'],
+        'diff_ms': stats['diff_s'] * 1000,
+        'apply_ms': stats['apply_s'] * 1000
+    }
+
+
+def bench_lookup(csv_path: str, traffic_codes: list[str], lookups: int) -> dict:
+    rng = random.Random(1)
+    with quiet():
+        db = AircraftDatabase(csv_path)
+        cold_db = AircraftDatabase(csv_path)
+
+    # Hot: a handful of aircraft in range, asked about over and over (LRU hits)
+    hot = [rng.choice(traffic_codes[:HOT_KEYS]) for _ in range(lookups)]
+    for code in hot[:HOT_KEYS * 10]:
+        db.lookup(code)
+    start = time.perf_counter()
+    for code in hot:
+        db.lookup(code)
+    hot_s = time.perf_counter() - start
+
+    # Cold: every lookup is a different aircraft (binary search + string reads),
+    # a third of them aren't in the database at all
+    cold = rng.sample(traffic_codes, min(lookups, len(traffic_codes)))
+    absent = [f"{rng.randint(1, 0xFFFFFE):06x}" for _ in range(len(cold) // 2)]
+    cold = cold + absent
+    start = time.perf_counter()
+    for code in cold:
+        cold_db.lookup(code)
+    cold_s = time.perf_counter() - start
+
+    return {
+        'hot_lookups_per_s': len(hot) / hot_s,
+        'hot_ns_per_lookup': hot_s / len(hot) * 1e9,
+        'cold_lookups_per_s': len(cold) / cold_s,
+        'cold_ns_per_lookup': cold_s / len(cold) * 1e9,
+        'cold_hit_rate': sum(1 for code in cold if cold_db.lookup_record(code)) / len(cold)
+    }
+
+
+def bench_radius_filter(densities: list[int]) -> dict:
+    results = {}
+    for count in densities:
+        states = synthetic.generate_states(USER_LAT, USER_LON, count, TRAFFIC_BOX_KM)
+
+        def cycle():
+            lats, lons = positions_from_states(states)
+            filter_within_radius(lats, lons, USER_LAT, USER_LON, RADIUS_KM)
+
+        lats, lons = positions_from_states(states)
+        results[str(count)] = {
+            **timed(cycle),
+            'in_radius': len(filter_within_radius(lats, lons, USER_LAT, USER_LON, RADIUS_KM)[0])
+        }
+    return results
+
+
+def peak_alloc_kb(func) -> float:
+    """Peak Python allocation while func() runs"""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_decode(densities: list[int]) -> dict:
+    """Response body -> arrays for the radius filter: row lists (json + list comprehensions) vs StatesBatch"""
+    results = {'parser': _loads.__module__}
+    for count in densities:
+        body = json.dumps(synthetic.generate_payload(USER_LAT, USER_LON, count, TRAFFIC_BOX_KM)).encode()
+
+        def rows():
+            states = json.loads(body)['states']
+            lats, lons = positions_from_states(states)
+            tracks = np.array([s[10] if s[10] is not None else np.nan for s in states], dtype=float)
+            traffic_level(lats, lons, tracks, USER_LAT, USER_LON, RADIUS_KM)
+            return states
+
+        def columns():
+            batch = decode_states(body)
+            traffic_level(batch.lats, batch.lons, batch.tracks, USER_LAT, USER_LON, RADIUS_KM)
+            return batch
+
+        results[str(count)] = {
+            'payload_bytes': len(body),
+            'rows_ms': timed(rows)['median_ms'],
+            'columns_ms': timed(columns)['median_ms'],
+            'rows_peak_kb': peak_alloc_kb(rows),
+            'columns_peak_kb': peak_alloc_kb(columns)
+        }
+    return results
+
+
+def bench_airline_lookup() -> dict:
+    states = synthetic.generate_states(USER_LAT, USER_LON, 20_000, TRAFFIC_BOX_KM)
+    callsigns = [vec[1] for vec in states]
+    codes = [code for code in map(extract_airline_code, callsigns) if code]
+
+    start = time.perf_counter()
+    for callsign in callsigns:
+        extract_airline_code(callsign)
+    extract_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for code in codes:
+        get_airline_name(code)
+    name_s = time.perf_counter() - start
+
+    return {
+        'table_size': len(load_airline_codes()),
+        'table_load_ms': timed(load_airline_codes)['median_ms'],
+        'extract_ns_per_call': extract_s / len(callsigns) * 1e9,
+        'name_ns_per_call': name_s / len(codes) * 1e9,
+        'known_airline_rate': sum(1 for code in codes if get_airline_name(code)) / len(callsigns)
+    }
+
+
+def bench_notifications(csv_path: str) -> dict:
+    """Notification building for recurring traffic (300 regulars, 5,000 sightings), with and without the enrichment cache"""
+    rng = random.Random(4)
+    with quiet():
+        db = AircraftDatabase(csv_path)
+    batch = decode_states(json.dumps(synthetic.generate_payload(USER_LAT, USER_LON, 300, TRAFFIC_BOX_KM)))
+    vectors = [batch.vector(rng.randrange(len(batch))) for _ in range(5000)]
+
+    def build(maxsize):
+        enrichment = EnrichmentCache(db, maxsize)
+        for vec in vectors:
+            build_notification(vec, enrichment, 3.2)
+        return enrichment
+
+    cached = build(ENRICHMENT_CACHE_SIZE)
+    return {
+        'notifications': len(vectors),
+        'cached_ms': timed(lambda: build(ENRICHMENT_CACHE_SIZE))['median_ms'],
+        'uncached_ms': timed(lambda: build(0))['median_ms'],
+        'hit_rate': cached.hits / len(vectors)
+    }
+
+
+def bench_snapshot(tmp_dir: str) -> dict:
+    """Runtime snapshot with a full seen-aircraft tracker (20,000 aircraft): capture, write and restore"""
+    rng = random.Random(5)
+    path = os.path.join(tmp_dir, 'runtime.snapshot')
+    now = time.time()
+    tracker = SeenAircraftTracker()
+    for icao in rng.sample(range(1, 0xFFFFFF), MAX_TRACKED):
+        tracker.observe(icao, now - rng.uniform(0, 1200))
+    state = SharedState(tokens_used=1200, recent_flights=deque(maxlen=5))
+    snapshots = RuntimeSnapshots(path, state, PollScheduler(), {'': tracker})
+
+    def restore():
+        restored = RuntimeSnapshots(path, state, PollScheduler(), {'': SeenAircraftTracker()})
+        with quiet():
+            restored.restore()
+
+    return {
+        'aircraft': len(tracker),
+        'capture_ms': timed(snapshots.capture)['median_ms'],
+        'encode_write_ms': timed(lambda: snapshots._write(snapshots.capture()))['median_ms'],
+        'file_bytes': os.path.getsize(path),
+        'restore_ms': timed(restore)['median_ms']
+    }
+
+
+def bench_history(days: int, tmp_dir: str) -> dict:
+    """Sighting history: write `days` of one poll a minute (~15 aircraft in range), then time the queries"""
+    rng = random.Random(3)
+    history = SightingHistory(os.path.join(tmp_dir, 'history.db'), sighting_days=days + 1, visit_days=days + 1)
+    callsigns = [f"{rng.choice(synthetic.AIRLINES)}{n}" for n in range(2000)]
+    fleet = [f"{icao:06x}" for icao in rng.sample(range(1, 0xFFFFFF), 5000)]  # Aircraft come back
+    start_time = time.time() - days * 86400
+
+    in_range = {}  # icao24 -> (callsign, polls left)
+    rows = []
+    write_s = 0.0
+    for minute in range(days * 1440):
+        now = start_time + minute * 60
+        while len(in_range) < 15:
+            in_range[rng.choice(fleet)] = (rng.choice(callsigns), rng.randint(2, 10))
+        for icao24, (callsign, left) in list(in_range.items()):
+            rows.append((now, icao24, callsign, USER_LAT, USER_LON, 3000.0, rng.uniform(0, RADIUS_KM), ''))
+            if left <= 1:
+                del in_range[icao24]
+            else:
+                in_range[icao24] = (callsign, left - 1)
+        if len(rows) >= 2000:
+            start = time.perf_counter()
+            history.write(rows)
+            write_s += time.perf_counter() - start
+            rows = []
+
+    week_ago = time.time() - 7 * 86400
+    results = {
+        'days': days,
+        'sightings': history.written,
+        'rows_per_s': history.written / write_s,
+        'file_mb': os.path.getsize(history.path) / 1e6,
+        'aircraft_this_week': len(history.aircraft_seen(week_ago))
+    }
+    for name, query in [('last_100_flights', lambda: history.last_flights(100)),
+                        ('aircraft_this_week', lambda: history.aircraft_seen(week_ago)),
+                        ('busiest_hours', lambda: history.busiest_hours()),
+                        ('flights_by_callsign', lambda: history.flights(0, callsign=callsigns[0])),
+                        ('flights_by_operator', lambda: history.flights(week_ago, operator='Delta Air Lines'))]:
+        results[f"{name}_ms"] = timed(query)['median_ms']
+    return results
+
+
+def bench_tray_menu() -> dict:
+    try:
+        from src.tray import FlightTrackerTray
+    except ImportError as e:  # pystray / Pillow missing, or no display backend
+        return {'skipped': str(e)}
+
+    state = SharedState(
+        paused=False,
+        radius_km=10,
+        recent_flights=deque([{'display': f"Flight {i} (TST{i})", 'callsign': f"TST{i}"} for i in range(5)], maxlen=5),
+        current_aircraft={f"a{i:05x}" for i in range(40)},
+        poll_interval=15,
+        credits_today=1200,
+        projected_daily_spend=3200,
+        daily_budget=4000,
+        metrics_summary=None
+    )
+
+    def arrivals():
+        # A new flight per refresh: the recent flights submenu is rebuilt every time
+        for i in range(100):
+            state.append('recent_flights', {'display': f"Flight {i} (NEW{i})", 'callsign': f"NEW{i}"})
+            tray.refresh_menu()
+
+    tray = FlightTrackerTray(state)
+    tray.create_menu()
+    return {'menus_per_run': 100,
+            **timed(lambda: [FlightTrackerTray(state).create_menu() for _ in range(100)]),  # Full build
+            'refresh_unchanged_ms': timed(lambda: [tray.refresh_menu() for _ in range(100)])['median_ms'],
+            'refresh_new_flight_ms': timed(arrivals)['median_ms']}
+
+
+def bench_poll_cycle(densities: list[int], frames: int, csv_path: str, tmp_dir: str) -> dict:
+    with quiet():
+        db = AircraftDatabase(csv_path)
+    results = {}
+    for count in densities:
+        path = os.path.join(tmp_dir, f"traffic-{count}.osrec")
+        synthetic.write_recording(path, USER_LAT, USER_LON, count, frames, TRAFFIC_BOX_KM)
+        results[str(count)] = replay_throughput.run(path, RADIUS_KM, db)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick: bool = False, db_rows: int = DB_ROWS) -> dict:
+    densities = synthetic.DENSITIES[:3] if quick else synthetic.DENSITIES
+    frames = 5 if quick else 20
+    lookups = 20_000 if quick else 200_000
+    db_rows = min(db_rows, 20_000) if quick else db_rows
+
+    results = {
+        'meta': {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick
+        }
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Database contains every aircraft the traffic generator can produce at the
+        # largest density, plus unrelated aircraft up to db_rows
+        traffic_codes = [vec[0] for vec in synthetic.generate_states(USER_LAT, USER_LON, max(densities), TRAFFIC_BOX_KM)]
+        csv_path = os.path.join(tmp_dir, 'aircraft-db.csv')
+        synthetic.write_aircraft_csv(csv_path, traffic_codes, max(0, db_rows - len(traffic_codes)))
+
+        steps = [
+            ('database', lambda: bench_database(csv_path)),
+            ('database_update', lambda: bench_database_update(csv_path, tmp_dir)),
+            ('lookup', lambda: bench_lookup(csv_path, traffic_codes, lookups)),
+            ('radius_filter', lambda: bench_radius_filter(densities)),
+            ('decode', lambda: bench_decode(densities)),
+            ('airline_lookup', bench_airline_lookup),
+            ('notifications', lambda: bench_notifications(csv_path)),
+            ('history', lambda: bench_history(3 if quick else 60, tmp_dir)),
+            ('snapshot', lambda: bench_snapshot(tmp_dir)),
+            ('tray_menu', bench_tray_menu),
+            ('poll_cycle', lambda: bench_poll_cycle(densities, frames, csv_path, tmp_dir))
+        ]
+        for name, step in steps:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = step()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="Smaller densities and database, for a fast check")
+    parser.add_argument('--db-rows', type=int, default=DB_ROWS)
+    parser.add_argument('--out', help="Write the JSON here instead of stdout")
+    parser.add_argument('--load-child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load_child:
+        print(json.dumps(database_load_child(args.load_child)))
+        sys.exit(0)
+
+    output = json.dumps(run(args.quick, args.db_rows), indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
@@ -0,0 +1,199 @@
+"""Synthetic OpenSky traffic for benchmarks and offline runs
+
+Generates states/all payloads that look like the real thing: 17-field state
+vectors, callsigns padded to 8 characters, a mix of airline, general aviation
+and blank callsigns, some aircraft without a position, ground traffic and
+descending arrivals clustered around the center (an airport) and cruising
+traffic spread over the whole query box.
+
+Write a recording usable with --replay or benchmarks.replay_throughput:
+    python -m benchmarks.synthetic out.osrec [--aircraft 500] [--frames 60] [--lat 47.61 --lon -122.33]
+"""
+import argparse
+import math
+import random
+import time
+
+from src.location import calculate_bounding_box
+from src.recorder import write_frame
+from src.track_predictor import KM_PER_DEG_LAT
+
+DENSITIES = [10, 100, 1_000, 5_000, 20_000]
+
+# Mostly codes from data/airline_codes.json, plus a few it doesn't know
+AIRLINES = ['AAL', 'DAL', 'UAL', 'SWA', 'ASA', 'FFT', 'JBU', 'NKS', 'FDX', 'UPS',
+            'ACA', 'WJA', 'BAW', 'AFR', 'DLH', 'KLM', 'QXE', 'SKW', 'ENY', 'XYZ']
+COUNTRIES = ['United States', 'United States', 'United States', 'Canada', 'United Kingdom', 'Germany']
+MANUFACTURERS = [('Boeing', ['737-800', '737 MAX 8', '787-9', '777-300ER']),
+                 ('Airbus', ['A320-214', 'A321neo', 'A350-900']),
+                 ('Embraer', ['ERJ 175', 'E190']),
+                 ('Cessna', ['172S Skyhawk', '208B Grand Caravan']),
+                 ('Piper', ['PA-28-181'])]
+
+# Share of each kind of traffic
+AIRLINE_SHARE = 0.70
+GA_SHARE = 0.22          # The rest have a blank callsign
+NO_POSITION_SHARE = 0.03
+CLUSTER_SHARE = 0.40     # Arrivals and ground traffic near the center
+
+
+def _callsign(rng: random.Random) -> str | None:
+    kind = rng.random()
+    if kind < AIRLINE_SHARE:
+        return f"{rng.choice(AIRLINES)}{rng.randint(1, 9999)}".ljust(8)
+    if kind < AIRLINE_SHARE + GA_SHARE:
+        suffix = ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(rng.randint(0, 2)))
+        return f"N{rng.randint(1, 9999)}{suffix}".ljust(8)
+    return rng.choice(['', None])
+
+
+def generate_states(center_lat: float, center_lon: float, count: int, radius_km: float = 50,
+                    seed: int = 0, now: float | None = None) -> list[list]:
+    """Random but plausible state vectors inside the bounding box around a point
+
+    Args:
+        center_lat, center_lon: Center of the traffic (think: an airport)
+        count: Number of aircraft
+        radius_km: Half-size of the box the traffic is spread over
+        seed: Same seed, same traffic
+        now: Timestamp for time_position / last_contact (default: current time)
+
+    Returns:
+        List of OpenSky state vectors
+    """
+    rng = random.Random(seed)
+    now = int(time.time() if now is None else now)
+    bbox = calculate_bounding_box(center_lat, center_lon, radius_km)
+    km_per_deg_lon = KM_PER_DEG_LAT * max(math.cos(math.radians(center_lat)), 0.01)
+
+    states = []
+    for icao in rng.sample(range(1, 0xFFFFFF), count):
+        vec = [None] * 17
+        vec[0] = f"{icao:06x}"
+        vec[1] = _callsign(rng)
+        vec[2] = rng.choice(COUNTRIES)
+        vec[4] = now - rng.randint(0, 10)
+        vec[15] = False
+        vec[16] = 0  # ADS-B
+
+        if rng.random() < CLUSTER_SHARE:
+            # Near the center: on the ground or on approach, lower when closer
+            dist_km = abs(rng.gauss(0, radius_km / 4))
+            bearing = rng.uniform(0, 2 * math.pi)
+            lat = center_lat + dist_km * math.cos(bearing) / KM_PER_DEG_LAT
+            lon = center_lon + dist_km * math.sin(bearing) / km_per_deg_lon
+            on_ground = dist_km < 3 and rng.random() < 0.5
+            altitude = 0.0 if on_ground else round(dist_km * 55 + rng.uniform(0, 300), 2)
+            velocity = rng.uniform(0, 15) if on_ground else rng.uniform(65, 130)
+            vertical_rate = 0.0 if on_ground else round(rng.uniform(-6, -2), 2)
+            # Mostly heading towards the center
+            track = (math.degrees(bearing) + 180 + rng.gauss(0, 20)) % 360
+        else:
+            lat = rng.uniform(bbox['lamin'], bbox['lamax'])
+            lon = rng.uniform(bbox['lomin'], bbox['lomax'])
+            on_ground = False
+            altitude = round(rng.uniform(3000, 12000), 2)
+            velocity = rng.uniform(150, 260)
+            vertical_rate = round(rng.choice([0.0, 0.0, rng.uniform(-10, 10)]), 2)
+            track = rng.uniform(0, 360)
+
+        if rng.random() >= NO_POSITION_SHARE:
+            vec[3] = vec[4] - rng.randint(0, 3)
+            vec[5] = round(lon, 4)
+            vec[6] = round(lat, 4)
+        vec[7] = None if on_ground else altitude
+        vec[8] = on_ground
+        vec[9] = round(velocity, 2)
+        vec[10] = round(track, 2)
+        vec[11] = None if on_ground else vertical_rate
+        vec[13] = None if on_ground else round(altitude + rng.uniform(-100, 100), 2)
+        vec[14] = f"{rng.randint(0, 7777):04d}" if rng.random() < 0.8 else None
+        states.append(vec)
+    return states
+
+
+def advance(states: list[list], seconds: float) -> list[list]:
+    """The same traffic `seconds` later, every aircraft moved along its track"""
+    moved = []
+    for vec in states:
+        vec = list(vec)
+        if vec[5] is not None and vec[9] and vec[10] is not None:
+            dist_km = vec[9] * seconds / 1000
+            heading = math.radians(vec[10])
+            vec[6] = round(vec[6] + dist_km * math.cos(heading) / KM_PER_DEG_LAT, 4)
+            vec[5] = round(vec[5] + dist_km * math.sin(heading) /
+                           (KM_PER_DEG_LAT * max(math.cos(math.radians(vec[6])), 0.01)), 4)
+        if vec[3] is not None:
+            vec[3] = int(vec[3] + seconds)
+        vec[4] = int(vec[4] + seconds)
+        moved.append(vec)
+    return moved
+
+
+def generate_payload(center_lat: float, center_lon: float, count: int, radius_km: float = 50,
+                     seed: int = 0, now: float | None = None) -> dict:
+    """A states/all response body (states is null when nothing is flying, like the API)"""
+    now = int(time.time() if now is None else now)
+    states = generate_states(center_lat, center_lon, count, radius_km, seed, now)
+    return {'time': now, 'states': states or None}
+
+
+def write_recording(path: str, center_lat: float, center_lon: float, count: int, frames: int,
+                    radius_km: float = 50, interval: float = 15, seed: int = 0) -> dict:
+    """Write a recording of the same traffic moving over `frames` polls
+
+    Returns:
+        The bounding box the frames were recorded for
+    """
+    bbox = calculate_bounding_box(center_lat, center_lon, radius_km)
+    start = time.time() - frames * interval
+    states = generate_states(center_lat, center_lon, count, radius_km, seed, start)
+    open(path, 'wb').close()
+    for frame in range(frames):
+        recorded_at = start + frame * interval
+        write_frame(path, recorded_at, bbox, {'time': int(recorded_at), 'states': states or None})
+        states = advance(states, interval)
+    return bbox
+
+
+def write_aircraft_csv(path: str, icao24s: list[str], extra_rows: int = 0, seed: int = 0):
+    """Aircraft database CSV in the OpenSky dump format (single-quoted fields)
+
+    Every code in icao24s gets a row, plus extra_rows random aircraft that
+    won't show up in traffic, to bring the database to a realistic size.
+    """
+    rng = random.Random(seed)
+    used = {int(code, 16) for code in icao24s}
+    codes = list(icao24s)
+    while len(codes) < len(icao24s) + extra_rows:
+        icao = rng.randint(1, 0xFFFFFE)
+        if icao not in used:
+            used.add(icao)
+            codes.append(f"{icao:06x}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("'icao24','registration','manufacturerName','model','operator','operatorIcao'\n")
+        for code in codes:
+            manufacturer, models = rng.choice(MANUFACTURERS)
+            operator_icao = rng.choice(AIRLINES) if rng.random() < 0.6 else ''
+            operator = f"{operator_icao} Airlines" if operator_icao else rng.choice(['', 'Private', 'unknown'])
+            registration = f"N{rng.randint(1, 99999)}" if rng.random() < 0.9 else ''
+            f.write(f"'{code}','{registration}','{manufacturer}','{rng.choice(models)}',"
+                    f"'{operator}','{operator_icao}'\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out', help="Recording file to write")
+    parser.add_argument('--aircraft', type=int, default=500)
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--interval', type=float, default=15, help="Seconds between frames")
+    parser.add_argument('--radius', type=float, default=50, help="Half-size of the traffic box in km")
+    parser.add_argument('--lat', type=float, default=47.61)
+    parser.add_argument('--lon', type=float, default=-122.33)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_recording(args.out, args.lat, args.lon, args.aircraft, args.frames,
+                    args.radius, args.interval, args.seed)
+    print(f"Wrote {args.frames} frames of {args.aircraft} aircraft to {args.out}")
@@ -1,52 +1,235 @@
+import time
+STARTED_AT = time.perf_counter()  # Time to first poll is measured from here
+
+import argparse
+import os
+import sys
 import threading
 from collections import deque
-import time
 
-from src.aircraft_db import AircraftDatabase
-from src.tray import FlightTrackerTray
-from src.monitoring_loop import monitoring_loop
-from src.opensky import get_token
+# Only light modules up front: the monitor loop, tray (Pillow/pystray) and
+# recorder are imported below, while the network and database steps run
+from src.aircraft_db import DumpWatcher, find_dumps, open_latest_database
+from src.airline_lookup import ensure_airline_table
+from src.opensky import OpenSkyAuthError, OpenSkyClient
+from src.token_manager import TOKEN_CACHE_PATH, TokenManager
 from src.location import get_my_location
+from src.metrics import METRICS, MetricsServer, StatsFileWriter
+from src.shared_state import SharedState
+from src.startup import DeferredDatabase, StartupOrchestrator
+
+parser = argparse.ArgumentParser(description="Notify when aircraft enter your area")
+parser.add_argument('--watchpoints', help="JSON file of locations to watch (see data/watchpoints.example.json)")
+parser.add_argument('--notify', default='console,windows',
+                    help="Comma-separated notification backends: windows, console, jsonl (default: console,windows)")
+parser.add_argument('--notify-file', default='notifications.jsonl', help="Output file for the jsonl backend")
+parser.add_argument('--burst-threshold', type=int, default=5,
+                    help="More new aircraft than this at once are shown as one summary notification")
+parser.add_argument('--reentry-minutes', type=float, default=30,
+                    help="Notify again for an aircraft that returns after being out of range this long")
+parser.add_argument('--mode', choices=['pipeline', 'sequential'], default='pipeline',
+                    help="pipeline: asyncio fetch/filter/enrich/notify stages (default). "
+                         "sequential: the original single loop. --watchpoints always uses the sequential loop")
+parser.add_argument('--record', help="Append every OpenSky states response to this recording file")
+parser.add_argument('--replay', help="Serve a recording from a local stand-in API instead of OpenSky")
+parser.add_argument('--replay-speed', type=float, default=1.0,
+                    help="Replay speed multiplier, 0 = next frame on every poll (default: real time)")
+parser.add_argument('--metrics-port', type=int,
+                    help="Serve hot-path metrics in Prometheus text format on localhost:PORT/metrics")
+parser.add_argument('--history', default='history.db',
+                    help="SQLite file every in-radius observation is kept in (default: history.db)")
+parser.add_argument('--no-history', action='store_true', help="Don't keep a sighting history")
+parser.add_argument('--history-days', type=float, default=30,
+                    help="Keep individual observations this many days (visits are kept a year)")
+parser.add_argument('--snapshot', default='runtime.snapshot',
+                    help="File the runtime state is saved to every minute and restored from at startup")
+parser.add_argument('--no-snapshot', action='store_true', help="Start fresh, don't save or restore runtime state")
+parser.add_argument('--stats-file', help="Append a metrics snapshot every minute to this (size-rotated) file")
+args = parser.parse_args()
 
-# Shared state between monitoring thread and tray
-shared_state = {
-    'paused': False,
-    'radius_km': 5,
-    'tokens_used': 0,
-    'recent_flights': deque(maxlen=5),  # Stores only last 5 flights
-    'current_aircraft': set(),
-    'token': None,
-    'token_expires_at': None
-}
+# Shared state between monitoring thread and tray, every write wakes a sleeping monitor loop
+shared_state = SharedState(
+    paused=False,
+    radius_km=5,
+    tokens_used=0,
+    recent_flights=deque(maxlen=5),  # Stores only last 5 flights
+    current_aircraft=set(),
+    token=None,
+    token_expires_at=None,
+    poll_interval=None,  # Set by the poll scheduler
+    credits_today=0,
+    projected_daily_spend=0,
+    daily_budget=None,
+    metrics_summary=None,  # Set when metrics are enabled
+    exiting=False,  # Set by the tray's Exit
+    started_at=STARTED_AT  # Removed by the first poll
+)
 
 print("=== Flight Tracker Starting ===")
-token = get_token()
-shared_state['token'] = token
-shared_state['token_expires_at'] = time.time() + (1800) # Current time + 30 mins
+if args.metrics_port or args.stats_file:
+    # Off by default, instrumented code is then close to free
+    METRICS.enable()
+    if args.metrics_port:
+        metrics_server = MetricsServer(port=args.metrics_port).start()
+        print(f"Serving metrics at {metrics_server.url}")
+    if args.stats_file:
+        StatsFileWriter(args.stats_file).start()
+
+startup = StartupOrchestrator(STARTED_AT)
+
+if args.replay:
+    # Offline: a local server plays the recording back through the normal network code
+    from src.recorder import ReplayServer
+    replay_server = ReplayServer(args.replay, speed=args.replay_speed).start()
+    os.environ.setdefault('OPENSKY_CLIENT_ID', 'replay')
+    os.environ.setdefault('OPENSKY_CLIENT_SECRET', 'replay')
+    client = OpenSkyClient(base_url=replay_server.url, auth_url=replay_server.token_url)
+    print(f"Replaying {len(replay_server.frames)} recorded responses from {args.replay}")
+else:
+    client = OpenSkyClient()  # One pooled HTTP session for auth and API calls
+
+if args.record:
+    from src.recorder import RecordingClient
+    client = RecordingClient(client, args.record)
+    print(f"Recording responses to {args.record}")
+
+# Token, location and database don't depend on each other, so they run at the same time.
+# Token refreshes itself in the background before it expires (and is reused across restarts)
+token_manager = TokenManager(client, shared_state, cache_path=None if args.replay else TOKEN_CACHE_PATH).start()
+startup.start('token', token_manager.wait_ready)
+
+if not args.watchpoints and not args.replay:
+    print("Getting your location...")
+    startup.start('location', get_my_location)
+
+# The database can take seconds (minutes when it has to be compiled), so monitoring
+# doesn't wait for it: notifications are enriched once it's loaded
+aircraft_db = DeferredDatabase()
 
-aircraft_db = AircraftDatabase('data/aircraft-database-complete-2025-08.csv')
 
-# Get user location
-print("Getting your location...")
-user_lat, user_lon = get_my_location()
+def database_loaded(step):
+    if step.error is not None:
+        print(f"WARNING: Could not load the aircraft database, notifications won't be enriched: {step.error}")
+    else:
+        # Airline designators come from the same dump, compiled when it is newer than the table
+        try:
+            ensure_airline_table((find_dumps('data') or [step.result.csv_path])[-1])
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not compile the airline table, using the curated airlines: {e}")
+        aircraft_db.set(step.result)
+        print(f"Aircraft database ready after {startup.elapsed():.1f}s, enrichment on")
+        # Newer monthly dumps in data/ are diffed in and swapped in while monitoring runs
+        DumpWatcher(step.result, 'data').start()
 
-if user_lat is None or user_lon is None:
-    user_lat, user_lon = 47.61, -122.33
-    print(f"Could not get location, using Seattle ({user_lat}, {user_lon})")
 
-print(f"Central location: {user_lat:.4f}, {user_lon:.4f}")
-print(f"Starting with {shared_state['radius_km']}km radius")
+# Newest compiled dump in data/, a newer CSV next to it is applied as an update, not recompiled
+startup.start('database', open_latest_database, 'data').on_done(database_loaded)
+
+# Heavy imports happen here, while the steps above wait on the network and disk
+from src.notifier import NotificationDispatcher, create_backends
+from src.seen_tracker import SeenAircraftTracker
+from src.history import SightingHistory
+from src.scheduler import PollScheduler
+from src.snapshot import RuntimeSnapshots
+from src.tray import FlightTrackerTray
+
+scheduler = PollScheduler()
+monitor_kwargs = {'scheduler': scheduler}
+if args.watchpoints:
+    # Many locations, each with its own radius, sharing one fetch per region
+    from src.watchpoints import load_watchpoints, multi_monitoring_loop
+    watchpoints = load_watchpoints(args.watchpoints, quiet_period=args.reentry_minutes * 60)
+    print(f"Watching {len(watchpoints)} locations from {args.watchpoints}")
+    monitor_target = multi_monitoring_loop
+    monitor_args = (shared_state, aircraft_db, watchpoints)
+    trackers = {wp.name: wp.seen_aircraft for wp in watchpoints}
+else:
+    if args.replay:
+        # Center of the recorded bounding box
+        bbox = replay_server.first_bbox
+        user_lat, user_lon = (bbox['lamin'] + bbox['lamax']) / 2, (bbox['lomin'] + bbox['lomax']) / 2
+    else:
+        user_lat, user_lon = startup.wait('location')
+
+    if user_lat is None or user_lon is None:
+        user_lat, user_lon = 47.61, -122.33
+        print(f"Could not get location, using Seattle ({user_lat}, {user_lon})")
+
+    print(f"Central location: {user_lat:.4f}, {user_lon:.4f}")
+    print(f"Starting with {shared_state['radius_km']}km radius")
+    if args.mode == 'pipeline':
+        # Stages run on an asyncio loop in the monitor thread, next to the tray's main loop
+        from src.pipeline import pipeline_loop
+        monitor_target = pipeline_loop
+    else:
+        from src.monitoring_loop import monitoring_loop
+        monitor_target = monitoring_loop
+    monitor_args = (shared_state, aircraft_db, user_lat, user_lon)
+    monitor_kwargs['seen_aircraft'] = SeenAircraftTracker(quiet_period=args.reentry_minutes * 60)
+    trackers = {'': monitor_kwargs['seen_aircraft']}
+
+if not args.no_history:
+    # Written on its own thread, the monitor only queues what it saw
+    history = SightingHistory(args.history, aircraft_db, sighting_days=args.history_days).start()
+    monitor_kwargs['history'] = history
+
+snapshots = None
+if not args.no_snapshot and not args.replay:
+    # Aircraft already notified, credits spent today, the token counter and recent flights carry over a restart
+    snapshots = RuntimeSnapshots(args.snapshot, shared_state, scheduler, trackers)
+    snapshots.restore()
+    snapshots.start()
+    monitor_kwargs['snapshots'] = snapshots
+
+if not args.no_history and not shared_state['recent_flights']:
+    # No snapshot to take the recent flights from, rebuilt from the history with the notification titles
+    for flight in reversed(history.last_flights(shared_state['recent_flights'].maxlen)):
+        callsign = flight['callsign'] or "No callsign"
+        shared_state.append('recent_flights', {
+            'display': f"{flight['title'] or flight['operator'] or callsign} ({callsign})",
+            'callsign': callsign
+        })
+
+try:
+    # Short waits so Ctrl+C still gets through (an untimed wait can't be interrupted on Windows)
+    while not startup.steps['token'].done():
+        time.sleep(0.2)
+    startup.wait('token')
+except OpenSkyAuthError as e:
+    print(f"ERROR: {e}")
+    print("Fix the OpenSky credentials in .env and start again")
+    sys.exit(1)
+print(f"Ready to poll after {startup.elapsed():.1f}s ({startup.summary()})")
 print("System tray icon will appear shortly...\n")
 
-tray = FlightTrackerTray(shared_state)
+tray = FlightTrackerTray(shared_state, show_radius=not args.watchpoints)  # Watchpoints keep their own radii
+
+# Notifications are shown on their own thread, the monitor only enqueues them
+dispatcher = NotificationDispatcher(
+    shared_state,
+    tray,
+    create_backends(args.notify.split(','), args.notify_file),
+    burst_threshold=args.burst_threshold
+).start()
 
 # Start monitoring in background thread
 monitor_thread = threading.Thread(
-    target=monitoring_loop,
-    args=(shared_state, aircraft_db, user_lat, user_lon, tray),
+    target=monitor_target,
+    args=monitor_args + (tray,),
+    kwargs={'client': client, 'token_manager': token_manager, 'dispatcher': dispatcher, **monitor_kwargs},
     daemon=True  # Thread dies when main program exits
 )
 monitor_thread.start()
 
 # Blocks until exit clicked
 tray.run()
+
+if snapshots is not None:
+    # Exit sets 'exiting', the monitor returns from its wait; save its final state once it has
+    monitor_thread.join(5)
+    snapshots.stop()
+    if not monitor_thread.is_alive():
+        snapshots.save()
+
+if not args.no_history:
+    history.stop()  # Write what's still queued
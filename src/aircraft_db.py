@@ -1,67 +1,584 @@
-import pandas as pd
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from src.metrics import METRICS
+
+# Compiled database layout (all integers little-endian unless noted):
+#   header                 see HEADER below
+#   keys      count x 3B   icao24 as 24-bit big-endian ints, sorted ascending
+#   records   count x 16B  4 x uint32 string ids (registration, manufacturer, model, operator)
+#   offsets   (n+1) x 4B   uint32 start offset of each string in the blob
+#   blob                   utf-8 string data
+# String id 0 is reserved for "no value" so empty fields cost nothing.
+# Values are cleaned before they are written, so lookups never re-clean.
+MAGIC = b'ACDB'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHIIQQQQ')  # magic, version, reserved, count, nstrings, 4 section offsets
+KEY_SIZE = 3
+RECORD = struct.Struct('<4I')
+OFFSET = struct.Struct('<I')
+
+FIELDS = ['registration', 'manufacturerName', 'model', 'operator']
+
+DEFAULT_CACHE_SIZE = 4096
+DELTA_FORMAT_VERSION = 1
+DUMP_CHECK_INTERVAL_S = 3600
+
+# OpenSky publishes a new full dump every month
+DUMP_PATTERN = re.compile(r'aircraft-database-complete-(\d{4})-(\d{2})\.')
+_MISSING = object()  # Cached marker for aircraft not in the database
+
+# Immutable, slot-based record (namedtuple sets __slots__ = ())
+AircraftRecord = namedtuple('AircraftRecord', ['registration', 'manufacturer', 'model', 'operator'])
+
+
+def compiled_path_for(csv_path: str) -> str:
+    """Path of the compiled database that sits next to the CSV"""
+    return os.path.splitext(csv_path)[0] + '.acdb'
+
+
+def delta_path_for(compiled_path: str) -> str:
+    """Path of the update delta that sits next to a compiled database"""
+    return os.path.splitext(compiled_path)[0] + '.acdelta'
+
+
+def write_delta(delta_path: str, base_count: int, source: str, overlay: dict):
+    """Persist an overlay next to its compiled file (temp file and rename, like the compiled file)"""
+    tmp_path = delta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'format': DELTA_FORMAT_VERSION,
+            'base_count': base_count,
+            'source': source,
+            'records': {f"{key:06x}": list(rec) if rec is not None else None for key, rec in overlay.items()}
+        }, f)
+    os.replace(tmp_path, delta_path)
+
+
+def dump_month(path: str) -> tuple[str, str] | None:
+    """('YYYY', 'MM') of an OpenSky dump (or its compiled file) from its name"""
+    match = DUMP_PATTERN.search(os.path.basename(path))
+    return match.groups() if match else None
+
+
+def find_dumps(data_dir: str, extension: str = '.csv') -> list[str]:
+    """OpenSky aircraft dumps (or compiled files, extension='.acdb') in data_dir, oldest first"""
+    try:
+        names = os.listdir(data_dir)
+    except OSError:
+        return []
+    dumps = sorted((dump_month(name), name) for name in names if name.endswith(extension) and dump_month(name))
+    return [os.path.join(data_dir, name) for _, name in dumps]
+
+
+def icao24_to_int(icao24: str) -> int | None:
+    """Convert an ICAO24 hex code (e.g. 'a1b2c3') to its 24-bit integer value"""
+    try:
+        value = int(icao24.strip().strip("'\""), 16)
+    except (ValueError, AttributeError):
+        return None
+    return value if 0 <= value <= 0xFFFFFF else None
+
+
+def clean_value(val) -> str | None:
+    """Clean empty strings and unknown values from a raw CSV field"""
+    if val is None:
+        return None
+
+    # Convert to string and strip quotes and whitespace
+    val_str = str(val).strip().strip("'\"")
+
+    # Check if empty after stripping (including cases like '')
+    if val_str == '':
+        return None
+
+    # Filter out "unknown" in any form
+    val_lower = val_str.lower()
+    if 'unknown' in val_lower or 'unknow' in val_lower:
+        return None
+
+    # Return cleaned value (not the original val!)
+    return val_str
+
+
+def read_dump(csv_path: str) -> dict[int, AircraftRecord]:
+    """Parse an OpenSky aircraft CSV into {icao24 int: cleaned AircraftRecord}
+
+    This is the slow step (full CSV parse). Bad keys are skipped and the
+    first row of a duplicated icao24 wins.
+    """
+    import pandas as pd  # Only needed for compiling and updates, keeps normal startup light
+
+    # Read CSV with error handling for malformed lines
+    db = pd.read_csv(
+        csv_path,
+        on_bad_lines='skip',  # Skip malformed rows
+        engine='python',
+        encoding='utf-8',
+        dtype=str
+    )
+
+    # Remove quotes from column names
+    db.columns = db.columns.str.strip("'")
+
+    rows = {}
+    for row in db[['icao24'] + FIELDS].itertuples(index=False):
+        key = icao24_to_int(row[0]) if isinstance(row[0], str) else None
+        if key is None or key in rows:  # Skip bad keys, keep first duplicate like .loc did
+            continue
+        rows[key] = AircraftRecord._make(None if pd.isna(val) else clean_value(val) for val in row[1:])
+    return rows
+
+
+def write_compiled(out_path: str, rows: dict[int, AircraftRecord]):
+    """Write records in the compiled format (see the layout at the top)"""
+    # String table, id 0 means "no value"
+    string_ids = {}
+    strings = []
+
+    def intern(val):
+        if val is None:
+            return 0
+        if val not in string_ids:
+            strings.append(val)
+            string_ids[val] = len(strings)
+        return string_ids[val]
+
+    keys = sorted(rows)
+    records = [tuple(intern(val) for val in rows[key]) for key in keys]
+    encoded = [s.encode('utf-8') for s in strings]
+
+    keys_off = HEADER.size
+    recs_off = keys_off + KEY_SIZE * len(keys)
+    offsets_off = recs_off + RECORD.size * len(keys)
+    blob_off = offsets_off + OFFSET.size * (len(encoded) + 1)
+
+    # Write to a temp file then rename so a half-written file is never mapped
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(keys), len(encoded),
+                            keys_off, recs_off, offsets_off, blob_off))
+        f.write(b''.join(key.to_bytes(KEY_SIZE, 'big') for key in keys))
+        f.write(b''.join(RECORD.pack(*record) for record in records))
+
+        position = 0
+        offsets = []
+        for data in encoded:
+            offsets.append(OFFSET.pack(position))
+            position += len(data)
+        offsets.append(OFFSET.pack(position))
+        f.write(b''.join(offsets))
+        f.write(b''.join(encoded))
+    os.replace(tmp_path, out_path)
+
+    print(f"Compiled {len(keys)} aircraft, {len(encoded)} unique strings")
+
+
+def compile_database(csv_path: str, out_path: str | None = None) -> str:
+    """Compile the OpenSky aircraft CSV into the binary format AircraftDatabase maps
+
+    This is the slow step (full CSV parse), so it only runs when the compiled
+    file is missing or older than the CSV.
+
+    Returns:
+        Path of the compiled file
+    """
+    out_path = out_path or compiled_path_for(csv_path)
+    print(f"Compiling aircraft database {csv_path} -> {out_path}...")
+    write_compiled(out_path, read_dump(csv_path))
+
+    # A fresh compile already contains everything, an old delta no longer applies
+    delta_path = delta_path_for(out_path)
+    if os.path.exists(delta_path):
+        os.remove(delta_path)
+    return out_path
+
 
 class AircraftDatabase:
     """Handles lookups in the OpenSky aircraft database"""
-    
-    def __init__(self, csv_path: str):
-        """Load the aircraft database CSV"""
+
+    def __init__(self, csv_path: str, cache_size: int = DEFAULT_CACHE_SIZE):
+        """Map the compiled aircraft database, compiling it from the CSV if needed
+
+        Args:
+            csv_path: OpenSky aircraft database CSV
+            cache_size: Max number of lookups kept in the LRU cache
+        """
         print("Loading aircraft database...")
-        # Read CSV with error handling for malformed lines
-        self.db = pd.read_csv(
-            csv_path,
-            on_bad_lines='skip', # Skip malformed rows
-            engine='python',
-            encoding='utf-8'
+        self.csv_path = csv_path
+        self.path = compiled_path_for(csv_path)
+
+        # LRU cache in front of the binary search (icao24 -> record or _MISSING)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        if self._needs_compile():
+            compile_database(csv_path, self.path)
+
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, self._count, self._nstrings,
+         self._keys_off, self._recs_off, self._offsets_off, self._blob_off) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a compiled aircraft database (version {FORMAT_VERSION})")
+
+        # Changes from newer dumps on top of the compiled file (icao24 int -> record, None if removed),
+        # replaced as a whole by apply_update(). version goes up whenever lookups may answer differently.
+        self._overlay = {}
+        self._size = self._count
+        self.source = os.path.basename(csv_path)  # Dump the data currently reflects
+        self.version = 1
+        self._update_lock = threading.Lock()
+        self._load_delta()
+
+        print(f"Loaded {len(self)} aircraft")
+
+    def _load_delta(self):
+        """Apply the persisted delta of earlier updates, if it belongs to this compiled file"""
+        delta_path = delta_path_for(self.path)
+        if not os.path.exists(delta_path):
+            return
+        try:
+            with open(delta_path, 'r', encoding='utf-8') as f:
+                delta = json.load(f)
+            if delta['format'] != DELTA_FORMAT_VERSION or delta['base_count'] != self._count:
+                print(f"WARNING: Ignoring {delta_path}, it was made for a different database file")
+                return
+            overlay = {int(code, 16): AircraftRecord._make(rec) if rec is not None else None
+                       for code, rec in delta['records'].items()}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"WARNING: Could not read database delta {delta_path}: {e}")
+            return
+
+        self._size = self._count + sum(
+            (rec is not None) - (self._find(key) is not None) for key, rec in overlay.items()
         )
-        
-        # Remove quotes from column names
-        self.db.columns = self.db.columns.str.strip("'")
-        
-        # Load only needed columns
-        self.db = self.db[['icao24', 'registration', 'manufacturerName', 'model', 'operator']]
-        
-        # Index by icao24 for fast lookups
-        self.db.set_index('icao24', inplace=True)
-        print(f"Loaded {len(self.db)} aircraft")
-    
+        self._overlay = overlay
+        self.source = delta['source']
+
+    def _needs_compile(self) -> bool:
+        """True if the compiled file is missing, stale or from an older format"""
+        if not os.path.exists(self.path):
+            return True
+        if os.path.exists(self.csv_path) and os.path.getmtime(self.csv_path) > os.path.getmtime(self.path):
+            return True
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return True
+        magic, version = HEADER.unpack(header)[:2]
+        return magic != MAGIC or version != FORMAT_VERSION
+
+    def __len__(self):
+        return self._size
+
+    def _find(self, key: int) -> int | None:
+        """Binary search the sorted key array, returns the record index"""
+        target = key.to_bytes(KEY_SIZE, 'big')  # Big-endian bytes compare in numeric order
+        mm = self._mm
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._keys_off + mid * KEY_SIZE
+            probe = mm[start:start + KEY_SIZE]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def _string(self, string_id: int) -> str | None:
+        """Read a string from the string table"""
+        if string_id == 0:
+            return None
+        start, end = struct.unpack_from('<2I', self._mm, self._offsets_off + (string_id - 1) * OFFSET.size)
+        return self._mm[self._blob_off + start:self._blob_off + end].decode('utf-8')
+
+    def _read_record(self, icao24: str) -> AircraftRecord | None:
+        """Read a record straight from the mapped file"""
+        key = icao24_to_int(icao24)
+        if key is None:
+            return None
+        overlay = self._overlay
+        if key in overlay:
+            return overlay[key]
+        index = self._find(key)
+        if index is None:
+            return None
+        return AircraftRecord._make(
+            self._string(sid) for sid in RECORD.unpack_from(self._mm, self._recs_off + index * RECORD.size)
+        )
+
+    def lookup_record(self, icao24: str) -> AircraftRecord | None:
+        """Look up aircraft by ICAO24 hex code, going through the LRU cache
+
+        Args:
+            icao24: Aircraft transponder hex code (e.g., 'a1b2c3')
+
+        Returns:
+            AircraftRecord with cleaned values, or None if not found
+        """
+        key = icao24.lower()
+        cache = self._cache  # Read once: apply_update() swaps in an empty cache after the new overlay
+        record = cache.get(key)
+        if record is not None:
+            self.cache_hits += 1
+            METRICS.inc('lookup_cache_hits_total')
+            cache.move_to_end(key)
+            return None if record is _MISSING else record
+
+        self.cache_misses += 1
+        METRICS.inc('lookup_cache_misses_total')
+        record = self._read_record(key)
+        cache[key] = _MISSING if record is None else record  # Also cache "not in database"
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)  # Evict least recently used
+        return record
+
+    def peek_record(self, icao24: str) -> AircraftRecord | None:
+        """Look up without touching the LRU cache, for threads other than the monitor's"""
+        return self._read_record(icao24.lower())
+
     def lookup(self, icao24: str) -> dict | None:
         """Look up aircraft by ICAO24 hex code
-        
+
         Args:
             icao24: Aircraft transponder hex code (e.g., 'a1b2c3')
-            
+
         Returns:
             Dictionary with aircraft info, or None if not found
         """
-        try:
-            row = self.db.loc[icao24.lower()]
-            
-            # Helper function to clean empty strings and unknown values
-            def clean_value(val):
-                if pd.isna(val):
-                    return None
-                
-                # Convert to string and strip quotes and whitespace
-                val_str = str(val).strip().strip("'\"")
-                
-                # Check if empty after stripping (including cases like '')
-                if val_str == '':
-                    return None
-                
-                # Filter out "unknown" in any form
-                val_lower = val_str.lower()
-                if 'unknown' in val_lower or 'unknow' in val_lower:
-                    return None
-                
-                # Return cleaned value (not the original val!)
-                return val_str
-            
-            return {
-                'registration': clean_value(row['registration']),
-                'manufacturer': clean_value(row['manufacturerName']),
-                'model': clean_value(row['model']),
-                'operator': clean_value(row['operator'])
-            }
-        except KeyError:
-            # if aircraft not in database
-            return None
\ No newline at end of file
+        record = self.lookup_record(icao24)
+        return record._asdict() if record else None
+
+    def iter_base(self):
+        """Every (icao24 int, AircraftRecord) of the compiled file in key order, without the overlay"""
+        mm = self._mm
+        strings = [None] * (self._nstrings + 1)  # Decoded once each, records share them
+        for string_id in range(1, self._nstrings + 1):
+            strings[string_id] = self._string(string_id)
+        for index in range(self._count):
+            start = self._keys_off + index * KEY_SIZE
+            ids = RECORD.unpack_from(mm, self._recs_off + index * RECORD.size)
+            yield int.from_bytes(mm[start:start + KEY_SIZE], 'big'), AircraftRecord._make(strings[i] for i in ids)
+
+    def diff_dump(self, csv_path: str) -> 'DatabaseUpdate':
+        """Compare a newer dump with the database by icao24
+
+        The result holds the overlay that makes the compiled file match the
+        dump, plus added/changed/removed counts relative to what lookups
+        return right now. Nothing changes until apply_update().
+        """
+        start = time.perf_counter()
+        rows = read_dump(csv_path)
+        old_overlay = self._overlay
+        overlay = {}
+        added = changed = removed = 0
+        size = 0
+
+        # Aircraft an earlier delta added (not in the compiled file) that the new dump drops
+        dropped = {key for key, record in old_overlay.items() if record is not None and key not in rows}
+
+        for key, base_record in self.iter_base():
+            dropped.discard(key)  # Counted below
+            previous = old_overlay[key] if key in old_overlay else base_record
+            record = rows.pop(key, _MISSING)
+            if record is _MISSING:
+                overlay[key] = None
+                removed += previous is not None
+                continue
+            size += 1
+            if record != base_record:
+                overlay[key] = record
+            if previous is None:
+                added += 1
+            elif record != previous:
+                changed += 1
+
+        # What's left isn't in the compiled file at all
+        for key, record in rows.items():
+            overlay[key] = record
+            previous = old_overlay.get(key)
+            if previous is None:
+                added += 1
+            elif record != previous:
+                changed += 1
+        size += len(rows)
+        removed += len(dropped)
+
+        return DatabaseUpdate(os.path.basename(csv_path), overlay, size, self.version, {
+            'added': added,
+            'changed': changed,
+            'removed': removed,
+            'aircraft': size,
+            'diff_s': time.perf_counter() - start
+        })
+
+    def apply_update(self, update: 'DatabaseUpdate') -> dict:
+        """Persist an update's delta and switch lookups over to it
+
+        The delta is written next to the compiled file first (temp file and
+        rename), then the overlay and an empty LRU cache are swapped in with
+        plain assignments, so the monitor thread sees either the old or the
+        new data, never a mix.
+
+        Returns:
+            The update's stats plus apply time, overlay size and new version
+        """
+        start = time.perf_counter()
+        with self._update_lock:
+            if update.base_version != self.version:
+                raise ValueError("Database changed since the update was computed, diff the dump again")
+
+            write_delta(delta_path_for(self.path), self._count, update.source, update.overlay)
+
+            # Overlay before cache: a lookup that still reads the old cache can only fill the old cache
+            self._overlay = update.overlay
+            self._cache = OrderedDict()
+            self._size = update.size
+            self.source = update.source
+            self.version += 1
+
+        return {
+            **update.stats,
+            'apply_s': time.perf_counter() - start,
+            'overlay': len(update.overlay),
+            'version': self.version
+        }
+
+    def update_from_dump(self, csv_path: str) -> dict:
+        """Diff a newer dump and apply it, returns the per-update stats"""
+        print(f"Updating aircraft database from {csv_path}...")
+        stats = self.apply_update(self.diff_dump(csv_path))
+        print(f"Aircraft database now at {self.source}: +{stats['added']} added, {stats['changed']} changed, "
+              f"-{stats['removed']} removed ({stats['diff_s'] + stats['apply_s']:.1f}s, "
+              f"{stats['overlay']} records in the delta)")
+        return stats
+
+    def close(self):
+        self._mm.close()
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for tuning cache_size"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / total if total else 0.0,
+            'size': len(self._cache),
+            'max_size': self.cache_size
+        }
+
+
+class DatabaseUpdate:
+    """Result of AircraftDatabase.diff_dump(), applied with apply_update()"""
+
+    def __init__(self, source: str, overlay: dict, size: int, base_version: int, stats: dict):
+        self.source = source              # File name of the new dump
+        self.overlay = overlay            # icao24 int -> record (None if removed) on top of the compiled file
+        self.size = size                  # Aircraft in the new dump
+        self.base_version = base_version  # Database version the diff was made against
+        self.stats = stats
+
+
+def open_latest_database(data_dir: str = 'data', cache_size: int = DEFAULT_CACHE_SIZE) -> AircraftDatabase:
+    """Open the database for the dumps in data_dir without recompiling when a new one arrives
+
+    Prefers the newest dump that already has a compiled file, so a newer
+    dump is picked up through update_from_dump() instead of a full compile.
+    Only compiles when nothing has been compiled yet.
+    """
+    compiled = find_dumps(data_dir, '.acdb')
+    if compiled:
+        # The CSV it came from may be gone already, the compiled file is all a lookup needs
+        return AircraftDatabase(os.path.splitext(compiled[-1])[0] + '.csv', cache_size)
+    dumps = find_dumps(data_dir)
+    if not dumps:
+        raise FileNotFoundError(f"No aircraft-database-complete-YYYY-MM.csv in {data_dir}")
+    return AircraftDatabase(dumps[-1], cache_size)
+
+
+def pending_dump(db: AircraftDatabase, data_dir: str) -> str | None:
+    """Newest dump in data_dir if the database doesn't reflect it yet"""
+    dumps = find_dumps(data_dir)
+    if not dumps:
+        return None
+    current = dump_month(db.source)
+    if current is not None and dump_month(dumps[-1]) <= current:
+        return None  # Only move forward
+    return dumps[-1] if os.path.basename(dumps[-1]) != db.source else None
+
+
+class DumpWatcher:
+    """Applies new monthly dumps dropped into data_dir while the app runs"""
+
+    def __init__(self, db: AircraftDatabase, data_dir: str = 'data', interval: float = DUMP_CHECK_INTERVAL_S):
+        self.db = db
+        self.data_dir = data_dir
+        self.interval = interval
+        self.last_stats = None
+        self._stop = threading.Event()
+
+    def check(self) -> dict | None:
+        """Apply the newest dump if there is one, returns its stats"""
+        dump = pending_dump(self.db, self.data_dir)
+        if dump is None:
+            return None
+        self.last_stats = self.db.update_from_dump(dump)
+        return self.last_stats
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:  # Keep watching, the old data stays in use
+                print(f"WARNING: Could not update the aircraft database: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        threading.Thread(target=self._run, name='dump-watcher', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def compact_database(csv_path: str) -> str:
+    """Fold the delta into the compiled file (run while the app isn't using it)"""
+    db = AircraftDatabase(csv_path)
+    rows = {key: record for key, record in db.iter_base() if key not in db._overlay}
+    rows.update((key, record) for key, record in db._overlay.items() if record is not None)
+    db.close()
+    write_compiled(db.path, rows)
+    # Empty delta, only remembers which dump the compiled file now reflects
+    write_delta(delta_path_for(db.path), len(rows), db.source, {})
+    return db.path
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) == 2:
+        compile_database(sys.argv[1])
+    elif len(sys.argv) == 4 and sys.argv[1] == 'update':
+        # Diff a newer dump against the database compiled from sys.argv[2] and store the delta
+        AircraftDatabase(sys.argv[2]).update_from_dump(sys.argv[3])
+    elif len(sys.argv) == 3 and sys.argv[1] == 'compact':
+        compact_database(sys.argv[2])
+    else:
+        print("Usage: python -m src.aircraft_db <aircraft-database.csv>\n"
+              "       python -m src.aircraft_db update <compiled-dump.csv> <newer-dump.csv>\n"
+              "       python -m src.aircraft_db compact <compiled-dump.csv>")
+        sys.exit(1)
@@ -1,23 +1,207 @@
+import csv
 import json
+from collections import Counter
+import os
+import re
+import sys
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Curated short names, these win over the full table
+AIRLINE_CODES_PATH = os.path.join(DATA_DIR, 'airline_codes.json')
+
+# Compiled ICAO designator table, one 'DESIGNATOR<tab>name' line per airline, sorted.
+# Built from the sources below by `python -m src.airline_lookup compile`, and
+# automatically once the aircraft database dump is newer than the table
+AIRLINES_TABLE_PATH = os.path.join(DATA_DIR, 'airline_table.tsv')
+
+# Sources for the compile step:
+# - the OpenSky aircraft database dump the app already uses (operatorIcao and
+#   operator columns), a few thousand designators that are actually flying
+# - optionally the OpenFlights airline list, ~6,000 airlines in the airlines.dat
+#   format (id, name, alias, IATA, ICAO, callsign, country, active), whose
+#   names win: https://github.com/jpatokal/openflights/blob/master/data/airlines.dat
+OPENFLIGHTS_PATH = os.path.join(DATA_DIR, 'airlines.dat')
+
+# Leading letters of a callsign ('SWA3491' -> 'SWA'), one C-level match per call
+_AIRLINE_PREFIX = re.compile(r'[A-Za-z]+')
+
+# ICAO airline designators are exactly three letters
+_DESIGNATOR = re.compile(r'[A-Z]{3}')
+
+_codes = None  # code -> name, built on first lookup
+_load_lock = threading.Lock()
+
+
+def load_openflights(path: str) -> dict[str, str]:
+    """Read an OpenFlights airlines.dat file into {ICAO designator: name}
+
+    Rows without a valid designator are skipped. When a designator appears
+    more than once, an active airline wins over a defunct one.
+    """
+    table = {}
+    active = set()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 8:
+                continue
+            code = row[4].strip().upper()
+            name = row[1].strip()
+            if not name or not _DESIGNATOR.fullmatch(code) or code in active:
+                continue
+            table[code] = sys.intern(name)
+            if row[7].strip().upper() == 'Y':
+                active.add(code)
+    return table
+
+
+def load_aircraft_operators(path: str) -> dict[str, str]:
+    """Read {ICAO designator: operator name} from an OpenSky aircraft database CSV
+
+    Aircraft list the same operator in different spellings, the most common
+    spelling per designator wins. Empty and 'unknown' operators are skipped.
+    """
+    names = {}  # designator -> Counter of operator names
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, quotechar="'")
+        header = [column.strip() for column in next(reader, [])]
+        try:
+            code_col, name_col = header.index('operatorIcao'), header.index('operator')
+        except ValueError:
+            raise ValueError(f"{path} has no operatorIcao/operator columns")
+        for row in reader:
+            if len(row) <= max(code_col, name_col):
+                continue
+            code = row[code_col].strip().upper()
+            name = ' '.join(row[name_col].split())
+            if not name or not _DESIGNATOR.fullmatch(code) or 'unknow' in name.lower():
+                continue
+            names.setdefault(code, Counter())[name] += 1
+    return {code: sys.intern(counts.most_common(1)[0][0]) for code, counts in names.items()}
+
+
+def load_airline_table(path: str = AIRLINES_TABLE_PATH) -> dict[str, str]:
+    """Read the compiled designator table into {ICAO designator: name}"""
+    table = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            code, _, name = line.rstrip('\n').partition('\t')
+            if name:
+                table[code] = sys.intern(name)
+    return table
+
+
+def compile_airline_table(sources: list[str], path: str = AIRLINES_TABLE_PATH) -> dict[str, str]:
+    """Build the designator table from aircraft database dumps (.csv) and OpenFlights files and write it
+
+    Later sources win for a designator in both, pass OpenFlights files last.
+
+    Returns:
+        The compiled table
+    """
+    global _codes
+    table = {}
+    for source in sources:
+        added = load_aircraft_operators(source) if source.endswith('.csv') else load_openflights(source)
+        print(f"{source}: {len(added):,} designators")
+        table.update(added)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        for code in sorted(table):
+            name = ' '.join(table[code].split())  # No tabs or line breaks in the table
+            f.write(f"{code}\t{name}\n")
+    os.replace(tmp_path, path)
+    print(f"Wrote {len(table):,} airlines to {path}")
+    _codes = None  # Rebuilt from the new table on the next lookup
+    return table
+
+
+def ensure_airline_table(dump_path: str, path: str = AIRLINES_TABLE_PATH) -> bool:
+    """Compile the table if it is missing or older than the aircraft database dump (or airlines.dat)
+
+    Returns:
+        True if the table was compiled
+    """
+    sources = [source for source in (dump_path, OPENFLIGHTS_PATH) if os.path.exists(source)]
+    if not sources:
+        return False
+    if os.path.exists(path) and os.path.getmtime(path) >= max(map(os.path.getmtime, sources)):
+        return False
+    compile_airline_table(sources, path)
+    return True
+
+
+def load_airline_codes(curated_path: str = AIRLINE_CODES_PATH,
+                       table_path: str = AIRLINES_TABLE_PATH) -> dict[str, str]:
+    """Build the lookup table: the compiled designator table, curated names on top
+
+    Keys are upper-case so lookups with an already upper-case code need no
+    conversion. Names are interned, the same operator name is stored once.
+    """
+    codes = {}
+    if os.path.exists(table_path):  # Not compiled yet on a fresh install
+        try:
+            codes.update(load_airline_table(table_path))
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"WARNING: Could not read airline table {table_path}: {e}")
+
+    with open(curated_path, 'r', encoding='utf-8') as f:
+        for code, name in json.load(f).items():
+            codes[code.upper()] = sys.intern(name)
+    return codes
+
+
+def airline_codes() -> dict[str, str]:
+    """The lookup table, loaded the first time it's needed instead of at import"""
+    global _codes
+    if _codes is None:
+        with _load_lock:
+            if _codes is None:
+                _codes = load_airline_codes()
+    return _codes
 
-# Load airline codes once when module is imported
-with open('data/airline_codes.json', 'r') as f:
-    AIRLINE_CODES = json.load(f)
 
 def extract_airline_code(callsign):
     """Extract airline code from callsign (e.g., 'SWA3491' -> 'SWA')"""
     if not callsign:
         return None
-    
-    airline_code = ""
-    for char in callsign:
-        if char.isalpha():
-            airline_code += char
-        else:
-            break
-    
-    return airline_code.upper() if airline_code else None
+
+    match = _AIRLINE_PREFIX.match(callsign)
+    return match.group().upper() if match else None
+
 
 def get_airline_name(code):
     """Look up airline name by code"""
-    return AIRLINE_CODES.get(code.upper())
\ No newline at end of file
+    codes = _codes if _codes is not None else airline_codes()
+    name = codes.get(code)
+    if name is None and not code.isupper():
+        name = codes.get(code.upper())
+    return name
+
+
+def resolve_operator(aircraft_info, callsign):
+    """Operator from the aircraft database record, else the airline in the callsign"""
+    if aircraft_info and aircraft_info.operator:
+        return aircraft_info.operator
+    airline_code = extract_airline_code(callsign)
+    return get_airline_name(airline_code) if airline_code else None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'compile':
+        if len(sys.argv) > 2:
+            sources = sys.argv[2:]
+        else:
+            # Newest aircraft database dump, then airlines.dat if it was downloaded
+            from src.aircraft_db import find_dumps
+            sources = find_dumps(DATA_DIR)[-1:] + [OPENFLIGHTS_PATH]
+        sources = [source for source in sources if os.path.exists(source)]
+        if not sources:
+            print(f"No aircraft-database-complete-YYYY-MM.csv or airlines.dat in {DATA_DIR} (see the README)")
+            sys.exit(1)
+        compile_airline_table(sources)
+    else:
+        print("Usage: python -m src.airline_lookup compile [aircraft-database.csv] [airlines.dat ...]")
+        sys.exit(1)
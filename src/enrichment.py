@@ -0,0 +1,88 @@
+from collections import OrderedDict, namedtuple
+
+from src.airline_lookup import resolve_operator
+from src.metrics import METRICS
+
+ENRICHMENT_CACHE_SIZE = 2048  # (icao24, callsign) pairs, daily regulars and based aircraft fit many times over
+
+# Static part of a notification: 'Boeing 737', 'Delta Air Lines', 'Boeing 737 - Delta Air Lines'
+Enrichment = namedtuple('Enrichment', ['aircraft', 'operator', 'title'])
+
+
+def enrich(aircraft_info, callsign: str) -> Enrichment:
+    """Resolve the static details of a notification from the database record and callsign
+
+    Args:
+        aircraft_info: AircraftRecord, or None if the aircraft isn't in the database
+        callsign: Stripped callsign, "No callsign" if there isn't one
+
+    Returns:
+        Enrichment with the aircraft type, operator and notification title
+    """
+    # Either "Boeing 737", "737", or "Boeing" (whatever is available)
+    aircraft = None
+    if aircraft_info:
+        if aircraft_info.manufacturer and aircraft_info.model:
+            aircraft = f"{aircraft_info.manufacturer} {aircraft_info.model}"
+        else:
+            aircraft = aircraft_info.model or aircraft_info.manufacturer or None
+
+    # Determine operator (first try database, then fallback to callsign lookup)
+    operator = resolve_operator(aircraft_info, callsign)
+
+    if aircraft and operator:
+        title = f"{aircraft} - {operator}"
+    else:
+        title = aircraft or operator or callsign
+    return Enrichment(aircraft, operator, title)
+
+
+class EnrichmentCache:
+    """Enrichment per (icao24, callsign), resolved once and reused
+
+    The same aircraft and flights come back all the time (daily commuter
+    flights, based aircraft), so the database lookup, operator fallback and
+    title are done on the first sighting only. Bounded LRU like the
+    database's own cache; emptied when the database's version changes (a
+    monthly update was applied, or the background load finished), so
+    cached titles never outlive the data they came from.
+    """
+
+    def __init__(self, aircraft_db, maxsize: int = ENRICHMENT_CACHE_SIZE):
+        """
+        Args:
+            aircraft_db: AircraftDatabase (or DeferredDatabase) used on a miss
+            maxsize: Max number of (icao24, callsign) pairs kept
+        """
+        self.aircraft_db = aircraft_db
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version = aircraft_db.version
+        self._cache = OrderedDict()
+
+    def lookup(self, icao24: str, callsign: str) -> Enrichment:
+        version = self.aircraft_db.version
+        if version != self._version:
+            self._cache.clear()  # Database changed, records may differ
+            self._version = version
+
+        key = (icao24, callsign)
+        enrichment = self._cache.get(key)
+        if enrichment is not None:
+            self.hits += 1
+            METRICS.inc('enrichment_cache_hits_total')
+            self._cache.move_to_end(key)
+            return enrichment
+
+        self.misses += 1
+        METRICS.inc('enrichment_cache_misses_total')
+        with METRICS.timer('lookup_seconds'):
+            aircraft_info = self.aircraft_db.lookup_record(icao24)
+        enrichment = self._cache[key] = enrich(aircraft_info, callsign)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)  # Evict least recently used
+        return enrichment
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,410 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from src.enrichment import enrich
+from src.seen_tracker import QUIET_PERIOD_S
+
+SIGHTING_RETENTION_DAYS = 30   # Every in-radius observation, the bulk of the file
+VISIT_RETENTION_DAYS = 365     # One row per aircraft per time in range
+BATCH_ROWS = 2_000             # Write at most this many observations per transaction
+FLUSH_INTERVAL_S = 2.0         # ... or whatever arrived within this long
+MAX_QUEUE = 1_000              # Polls waiting for the writer before new ones are dropped
+MAINTENANCE_INTERVAL_S = 3600  # Retention and compaction
+DELETE_CHUNK = 20_000          # Rows per delete statement, keeps readers responsive
+VACUUM_PAGES = 10_000          # Free pages handed back to the OS per maintenance run
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sightings (
+    time REAL NOT NULL,
+    icao24 TEXT NOT NULL,
+    callsign TEXT,
+    lat REAL,
+    lon REAL,
+    altitude_m REAL,
+    distance_km REAL,
+    visit_id INTEGER NOT NULL,
+    watchpoint TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS sightings_time ON sightings (time);
+CREATE INDEX IF NOT EXISTS sightings_icao24 ON sightings (icao24, time);
+CREATE INDEX IF NOT EXISTS sightings_callsign ON sightings (callsign, time);
+CREATE INDEX IF NOT EXISTS sightings_visit ON sightings (visit_id);
+
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    icao24 TEXT NOT NULL,
+    callsign TEXT,
+    operator TEXT,
+    title TEXT,  -- Notification title, so the tray's recent flights look the same after a restart
+    watchpoint TEXT NOT NULL DEFAULT '',
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    closest_km REAL,
+    sightings INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS visits_first_seen ON visits (first_seen);
+CREATE INDEX IF NOT EXISTS visits_last_seen ON visits (last_seen);
+CREATE INDEX IF NOT EXISTS visits_icao24 ON visits (icao24, first_seen);
+CREATE INDEX IF NOT EXISTS visits_callsign ON visits (callsign, first_seen);
+CREATE INDEX IF NOT EXISTS visits_operator ON visits (operator, first_seen);
+
+-- One row per aircraft, so "seen this week" is one covering-index range scan, no GROUP BY over visits
+CREATE TABLE IF NOT EXISTS aircraft (
+    icao24 TEXT PRIMARY KEY,
+    callsign TEXT,
+    operator TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    visits INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS aircraft_recent ON aircraft (last_seen, icao24, callsign, operator, first_seen, visits);  -- Covering
+
+-- Per-hour totals, so "busiest hours" never scans the observations
+CREATE TABLE IF NOT EXISTS hourly (
+    hour INTEGER PRIMARY KEY,
+    sightings INTEGER NOT NULL DEFAULT 0,
+    visits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _nan_to_none(value: float) -> float | None:
+    return None if value != value else value
+
+
+class SightingHistory:
+    """Every in-radius observation in a local SQLite database (WAL mode)
+
+    The monitor threads only queue what they saw (record() never blocks).
+    A writer thread turns that into rows and writes a batch per transaction:
+    one sightings row per observation, and one visits row per aircraft per
+    time in range (a new visit starts after quiet_period out of range), with
+    the operator and notification title resolved once per visit. Old rows
+    are deleted and the space reclaimed every hour, so the file stays
+    bounded by the retention.
+
+    Queries open their own read-only connection per thread, WAL lets them run
+    while the writer writes.
+    """
+
+    def __init__(self, path: str, aircraft_db=None, sighting_days: float = SIGHTING_RETENTION_DAYS,
+                 visit_days: float = VISIT_RETENTION_DAYS, quiet_period: float = QUIET_PERIOD_S,
+                 batch_rows: int = BATCH_ROWS, flush_interval: float = FLUSH_INTERVAL_S,
+                 max_queue: int = MAX_QUEUE):
+        """Open (or create) the history database
+
+        Args:
+            path: SQLite file
+            aircraft_db: Database used to resolve the operator of each visit (optional)
+            sighting_days: Keep individual observations this long
+            visit_days: Keep visits and hourly totals this long
+            quiet_period: Out of range this long, then back = new visit
+        """
+        self.path = path
+        self.aircraft_db = aircraft_db
+        self.sighting_days = sighting_days
+        self.visit_days = visit_days
+        self.quiet_period = quiet_period
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self._last_observed = {}  # watchpoint -> time of the last recorded poll
+        self._open_visits = {}    # (icao24, watchpoint) -> [visit id, last seen]
+        self._local = threading.local()
+        self._thread = None
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if 'title' not in {row[1] for row in conn.execute("PRAGMA table_info(visits)")}:
+            conn.execute("ALTER TABLE visits ADD COLUMN title TEXT")  # History from before titles were kept
+        # Aircraft still in range from before a restart continue their visit
+        for visit_id, icao24, watchpoint, last_seen in conn.execute(
+                "SELECT id, icao24, watchpoint, last_seen FROM visits WHERE last_seen >= ?",
+                (time.time() - quiet_period,)):
+            self._open_visits[(icao24, watchpoint)] = [visit_id, last_seen]
+        conn.close()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Only takes effect on a new file, before WAL
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")  # Safe with WAL, no fsync per commit
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 10):
+        """Write what's queued and stop the writer"""
+        self.queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record(self, observed_at: float, batch, indices, distances_km, watchpoint: str = ''):
+        """Queue the aircraft of one poll that were inside the radius (never blocks)
+
+        Args:
+            observed_at: Time of the fetch
+            batch: StatesBatch of the poll
+            indices: Positions in the batch of the aircraft in range
+            distances_km: Their distances from the watched location
+            watchpoint: Name of the location, '' for the single-location loops
+        """
+        if observed_at <= self._last_observed.get(watchpoint, 0):
+            return  # Same fetch filtered again (radius changed), already recorded
+        self._last_observed[watchpoint] = observed_at
+        if len(indices) == 0:
+            return
+        try:
+            self.queue.put_nowait((observed_at, batch, indices, distances_km, watchpoint))
+        except queue.Full:
+            self.dropped += 1
+
+    def _rows(self, item) -> list[tuple]:
+        observed_at, batch, indices, distances_km, watchpoint = item
+        rows = []
+        for index, dist_km in zip(list(indices), list(distances_km)):
+            callsign = batch.callsign[index]
+            rows.append((
+                observed_at,
+                batch.icao24[index],
+                (callsign.strip() or None) if callsign else None,
+                _nan_to_none(float(batch.lats[index])),
+                _nan_to_none(float(batch.lons[index])),
+                batch.altitude[index],
+                float(dist_km),
+                watchpoint
+            ))
+        return rows
+
+    def _enrich(self, icao24: str, callsign: str | None):
+        """Operator and notification title of a new visit, resolved like the notification's"""
+        record = None
+        if self.aircraft_db is not None:
+            record = self.aircraft_db.peek_record(icao24)  # Uncached read, safe off the monitor thread
+        return enrich(record, callsign or "No callsign")
+
+    def write(self, rows: list[tuple], conn: sqlite3.Connection | None = None):
+        """Write observation rows (time, icao24, callsign, lat, lon, altitude_m, distance_km, watchpoint)
+
+        Runs on the writer thread; also usable directly to import or generate data.
+        """
+        conn = conn or self._writer_conn()
+        open_visits = self._open_visits
+        sightings = []
+        visit_updates = {}  # visit id -> [last seen, closest km, new sightings]
+        aircraft = {}       # icao24 -> [callsign, operator, first seen, last seen, new visits]
+        hourly = {}         # hour -> [sightings, visits]
+
+        with conn:
+            for observed_at, icao24, callsign, lat, lon, altitude_m, dist_km, watchpoint in rows:
+                hour = int(observed_at // 3600) * 3600
+                counts = hourly.setdefault(hour, [0, 0])
+                counts[0] += 1
+
+                plane = aircraft.get(icao24)
+                if plane is None:
+                    plane = aircraft[icao24] = [callsign, None, observed_at, observed_at, 0]
+                plane[3] = max(plane[3], observed_at)
+
+                visit = open_visits.get((icao24, watchpoint))
+                if visit is None or observed_at - visit[1] > self.quiet_period:
+                    enrichment = self._enrich(icao24, callsign)
+                    operator = enrichment.operator
+                    cursor = conn.execute(
+                        "INSERT INTO visits (icao24, callsign, operator, title, watchpoint, first_seen, last_seen,"
+                        " closest_km) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (icao24, callsign, operator, enrichment.title, watchpoint, observed_at, observed_at, dist_km)
+                    )
+                    visit = open_visits[(icao24, watchpoint)] = [cursor.lastrowid, observed_at]
+                    counts[1] += 1
+                    plane[0], plane[1] = callsign, operator
+                    plane[4] += 1
+                visit[1] = max(visit[1], observed_at)
+
+                update = visit_updates.get(visit[0])
+                if update is None:
+                    visit_updates[visit[0]] = [visit[1], dist_km, 1]
+                else:
+                    update[0] = visit[1]
+                    update[1] = min(update[1], dist_km)
+                    update[2] += 1
+                sightings.append((observed_at, icao24, callsign, lat, lon, altitude_m, dist_km, visit[0], watchpoint))
+
+            conn.executemany("INSERT INTO sightings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", sightings)
+            conn.executemany(
+                "UPDATE visits SET last_seen = max(last_seen, ?), closest_km = min(closest_km, ?),"
+                " sightings = sightings + ? WHERE id = ?",
+                [(last_seen, closest, count, visit_id) for visit_id, (last_seen, closest, count) in visit_updates.items()]
+            )
+            conn.executemany(
+                "INSERT INTO aircraft VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (icao24) DO UPDATE SET"
+                " callsign = coalesce(excluded.callsign, callsign), operator = coalesce(excluded.operator, operator),"
+                " last_seen = max(last_seen, excluded.last_seen), visits = visits + excluded.visits",
+                [(icao24, *plane) for icao24, plane in aircraft.items()]
+            )
+            conn.executemany(
+                "INSERT INTO hourly (hour, sightings, visits) VALUES (?, ?, ?) ON CONFLICT (hour) DO UPDATE SET"
+                " sightings = sightings + excluded.sightings, visits = visits + excluded.visits",
+                [(hour, n_sightings, n_visits) for hour, (n_sightings, n_visits) in hourly.items()]
+            )
+        self.written += len(sightings)
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'writer', None)
+        if conn is None:
+            conn = self._local.writer = self._connect()
+        return conn
+
+    def maintain(self, now: float | None = None):
+        """Delete rows past retention, give the free pages back and truncate the WAL"""
+        now = time.time() if now is None else now
+        conn = self._writer_conn()
+        deleted = 0
+        for table, key, column, days in (('sightings', 'rowid', 'time', self.sighting_days),
+                                         ('visits', 'id', 'last_seen', self.visit_days),
+                                         ('aircraft', 'icao24', 'last_seen', self.visit_days),
+                                         ('hourly', 'hour', 'hour', self.visit_days)):
+            cutoff = now - days * 86400
+            while True:
+                with conn:
+                    count = conn.execute(
+                        f"DELETE FROM {table} WHERE {key} IN"
+                        f" (SELECT {key} FROM {table} WHERE {column} < ? LIMIT {DELETE_CHUNK})", (cutoff,)
+                    ).rowcount
+                deleted += count
+                if count < DELETE_CHUNK:
+                    break
+
+        # Visits that can't continue any more don't need to stay in memory
+        cutoff = now - self.quiet_period
+        self._open_visits = {key: visit for key, visit in self._open_visits.items() if visit[1] >= cutoff}
+
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")  # execute() would free one page per call
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return deleted
+
+    def _collect(self, first) -> tuple[list[tuple], bool]:
+        """Rows of the first queued poll plus whatever arrives within flush_interval"""
+        rows = self._rows(first)
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return rows, True
+            rows.extend(self._rows(item))
+        return rows, False
+
+    def _run(self):
+        next_maintenance = time.monotonic()  # Trim right away, the app may not have run for a while
+        while True:
+            stopping = False
+            try:
+                item = self.queue.get(timeout=max(next_maintenance - time.monotonic(), 0.1))
+                stopping = item is None
+                if not stopping:
+                    rows, stopping = self._collect(item)
+                    self.write(rows)
+            except queue.Empty:
+                pass
+            except sqlite3.Error as e:  # Keep monitoring, history is best effort
+                print(f"WARNING: Could not write sighting history: {e}")
+
+            if time.monotonic() >= next_maintenance:
+                try:
+                    self.maintain()
+                except sqlite3.Error as e:
+                    print(f"WARNING: Sighting history maintenance failed: {e}")
+                next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL_S
+
+            if stopping:
+                self._writer_conn().close()
+                return
+
+    # Queries
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = self._local.reader = self._connect(read_only=True)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def _query(self, sql: str, params: tuple = ()) -> list[dict]:
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def last_flights(self, limit: int = 100) -> list[dict]:
+        """Most recent visits, newest first"""
+        return self._query("SELECT * FROM visits ORDER BY first_seen DESC LIMIT ?", (limit,))
+
+    def flights(self, since: float, until: float | None = None, icao24: str | None = None,
+                callsign: str | None = None, operator: str | None = None, limit: int = 1000) -> list[dict]:
+        """Visits that started in [since, until), optionally for one aircraft, callsign or operator"""
+        sql = "SELECT * FROM visits WHERE first_seen >= ? AND first_seen < ?"
+        params = [since, time.time() if until is None else until]
+        for column, value in (('icao24', icao24), ('callsign', callsign), ('operator', operator)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        return self._query(sql + " ORDER BY first_seen DESC LIMIT ?", (*params, limit))
+
+    def aircraft_seen(self, since: float) -> list[dict]:
+        """Distinct aircraft in range since a time, last seen first (visits counts the whole retention)"""
+        return self._query("SELECT * FROM aircraft WHERE last_seen >= ? ORDER BY last_seen DESC", (since,))
+
+    def busiest_hours(self, since: float | None = None) -> list[dict]:
+        """Arrivals per local hour of day (0-23), busiest first"""
+        return self._query(
+            "SELECT CAST(strftime('%H', hour, 'unixepoch', 'localtime') AS INTEGER) AS hour_of_day,"
+            " sum(visits) AS visits, sum(sightings) AS sightings FROM hourly WHERE hour >= ?"
+            " GROUP BY hour_of_day ORDER BY visits DESC", (since or 0,)
+        )
+
+    def track(self, icao24: str, since: float, until: float | None = None) -> list[dict]:
+        """Observations of one aircraft in a time range, oldest first"""
+        return self._query(
+            "SELECT time, callsign, lat, lon, altitude_m, distance_km, watchpoint FROM sightings"
+            " WHERE icao24 = ? AND time >= ? AND time < ? ORDER BY time",
+            (icao24, since, time.time() if until is None else until)
+        )
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[2] not in ('last', 'week', 'hours'):
+        print("Usage: python -m src.history <history.db> last|week|hours")
+        sys.exit(1)
+
+    history = SightingHistory(sys.argv[1])
+    week_ago = time.time() - 7 * 86400
+    if sys.argv[2] == 'last':
+        for flight in history.last_flights():
+            seen = time.strftime('%Y-%m-%d %H:%M', time.localtime(flight['first_seen']))
+            print(f"{seen}  {flight['icao24']}  {flight['callsign'] or '-':8}  {flight['operator'] or ''}")
+    elif sys.argv[2] == 'week':
+        aircraft = history.aircraft_seen(week_ago)
+        print(f"{len(aircraft)} aircraft seen in the last 7 days")
+        for plane in aircraft:
+            print(f"{plane['icao24']}  {plane['callsign'] or '-':8}  {plane['visits']:3} visits  {plane['operator'] or ''}")
+    else:
+        for hour in history.busiest_hours():
+            print(f"{hour['hour_of_day']:02}:00  {hour['visits']:6} arrivals  {hour['sightings']:8} sightings")
@@ -1,5 +1,37 @@
+import math
+
+import numpy as np
 import requests
 
+# Mean earth radius used by the vectorized haversine pre-filter
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid, for sizing bounding boxes
+WGS84_A_KM = 6378.137
+WGS84_E2 = 0.00669437999014
+
+
+def meridian_radius_km(lat: float) -> float:
+    """WGS-84 north-south radius of curvature, the smallest radius at a latitude (6335 km at the equator)"""
+    sin_lat = math.sin(math.radians(lat))
+    return WGS84_A_KM * (1 - WGS84_E2) / (1 - WGS84_E2 * sin_lat ** 2) ** 1.5
+
+
+# Haversine (sphere) overestimates geopy's WGS-84 geodesic distance the most
+# north-south at the equator, where the ellipsoid is flattest (0.5614%), and
+# underestimates it by at most ~0.45% near the poles; the tolerance is that
+# worst case plus a margin. Reported distances are haversine, so they stay
+# within it of geopy. Inclusion stays exact: only aircraft whose haversine
+# distance falls in the radius * (1 +/- tolerance) band get the geopy check,
+# so the set of aircraft in range matches the per-aircraft geopy loop.
+HAVERSINE_TOLERANCE = EARTH_RADIUS_KM / meridian_radius_km(0) - 1 + 0.0005  # ~0.61%
+
+
+def geodesic_km(point_a: tuple[float, float], point_b: tuple[float, float]) -> float:
+    """Exact WGS-84 distance between two (lat, lon) points in km"""
+    from geopy.distance import distance  # Imported on first use, geopy adds ~40 ms to startup
+    return distance(point_a, point_b).km
+
 # WARNING: ASK FOR PERMISSION BEFORE DOING SO WHEN PROPERLY BUILDING
 def get_my_location() -> tuple[float | None, float | None]:
     """Get user's location from IP address"""
@@ -12,22 +44,110 @@ def get_my_location() -> tuple[float | None, float | None]:
         return None, None
 
 def calculate_bounding_box(user_lat: float, user_lon: float, radius_km: float) -> dict[str, float]:
-    """Calculate bounding box around a point
-    
+    """Calculate the tightest bounding box that contains the whole radius around a point
+
+    A degree of longitude shrinks with cos(latitude), so the longitude
+    half-width is asin(sin(d) / cos(lat)) for an angular radius d (the
+    longitude where the circle is tangent to a meridian), not the latitude
+    half-width. d uses the smallest WGS-84 radius of curvature inside the box,
+    so the box always covers the geodesic radius the filter checks against.
+
     Args:
         lat: User latitude
         lon: User longitude
         radius_km: Radius in kilometers
-    
+
     Returns:
-        Dictionary with lamin, lamax, lomin, lomax
+        Dictionary with lamin, lamax, lomin, lomax. Near the antimeridian
+        lomin/lomax may fall outside -180..180, see split_antimeridian().
+        If the circle contains a pole the box spans every longitude.
     """
-    # Approximately 111km per degree of latitude/longitude
-    delta = radius_km / 111.0
-    
+    # The ellipsoid is flattest (smallest radius) towards the equator
+    rough_deg = math.degrees(radius_km / meridian_radius_km(0))
+    nearest_equator = max(0.0, abs(user_lat) - rough_deg)
+    angular = radius_km / meridian_radius_km(nearest_equator)  # Radians
+    delta_lat = math.degrees(angular)
+    lamin, lamax = user_lat - delta_lat, user_lat + delta_lat
+
+    if lamax >= 90 or lamin <= -90:
+        # Pole inside the circle: every longitude is covered
+        return {'lamin': max(lamin, -90.0), 'lamax': min(lamax, 90.0), 'lomin': -180.0, 'lomax': 180.0}
+
+    ratio = math.sin(angular) / math.cos(math.radians(user_lat))
+    delta_lon = math.degrees(math.asin(ratio)) if ratio < 1 else 180.0
+    if delta_lon >= 180:
+        return {'lamin': lamin, 'lamax': lamax, 'lomin': -180.0, 'lomax': 180.0}
+
     return {
-        'lamin': user_lat - delta,
-        'lamax': user_lat + delta,
-        'lomin': user_lon - delta,
-        'lomax': user_lon + delta
+        'lamin': lamin,
+        'lamax': lamax,
+        'lomin': user_lon - delta_lon,
+        'lomax': user_lon + delta_lon
     }
+
+
+def split_antimeridian(bbox: dict[str, float]) -> list[dict[str, float]]:
+    """OpenSky boxes can't wrap around +/-180, so split a box that crosses it in two"""
+    lomin, lomax = bbox['lomin'], bbox['lomax']
+    if lomin >= -180 and lomax <= 180:
+        return [bbox]
+    if lomax - lomin >= 360:
+        return [{**bbox, 'lomin': -180.0, 'lomax': 180.0}]
+    if lomin < -180:
+        return [{**bbox, 'lomin': lomin + 360, 'lomax': 180.0}, {**bbox, 'lomin': -180.0, 'lomax': lomax}]
+    return [{**bbox, 'lomin': lomin, 'lomax': 180.0}, {**bbox, 'lomin': -180.0, 'lomax': lomax - 360}]
+
+
+def positions_from_states(states: list[list]) -> tuple[np.ndarray, np.ndarray]:
+    """Pull lat/lon columns out of OpenSky state vectors (NaN where unknown)
+
+    Returns:
+        (lats, lons) float arrays in the same order as states
+    """
+    lats = np.array([s[6] if s[6] is not None else np.nan for s in states], dtype=float)
+    lons = np.array([s[5] if s[5] is not None else np.nan for s in states], dtype=float)
+    return lats, lons
+
+
+def haversine_km(lats: np.ndarray, lons: np.ndarray, user_lat: float, user_lon: float) -> np.ndarray:
+    """Great-circle distance from the user to every position, in one vectorized pass"""
+    lat1 = np.radians(user_lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons - user_lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def filter_within_radius(lats: np.ndarray, lons: np.ndarray, user_lat: float, user_lon: float,
+                         radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+    """Find the positions within radius_km of the user
+
+    Haversine runs over the whole batch, then only the aircraft close to
+    the edge get the exact geopy check (see HAVERSINE_TOLERANCE).
+
+    Args:
+        lats: Aircraft latitudes (NaN if unknown)
+        lons: Aircraft longitudes (NaN if unknown)
+        user_lat: User latitude
+        user_lon: User longitude
+        radius_km: Radius in kilometers
+
+    Returns:
+        (indices, distances_km) of the aircraft inside the radius
+    """
+    with np.errstate(invalid='ignore'):  # NaN positions just compare False
+        approx_km = haversine_km(lats, lons, user_lat, user_lon)
+        inside = approx_km <= radius_km * (1 - HAVERSINE_TOLERANCE)
+        edge = np.flatnonzero(~inside & (approx_km <= radius_km * (1 + HAVERSINE_TOLERANCE)))
+
+    # Exact geodesic check, only for the few aircraft near the edge
+    user_pos = (user_lat, user_lon)
+    for i in edge:
+        exact_km = geodesic_km(user_pos, (lats[i], lons[i]))
+        if exact_km <= radius_km:
+            inside[i] = True
+            approx_km[i] = exact_km
+
+    indices = np.flatnonzero(inside)
+    return indices, approx_km[indices]
@@ -0,0 +1,318 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'flight_tracker_'
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+STATS_INTERVAL_S = 60
+STATS_MAX_BYTES = 1_000_000
+STATS_BACKUPS = 3
+
+
+class Counter:
+    """Monotonically increasing value"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, '', self.value
+
+
+class Gauge:
+    """Value that goes up and down (last one set wins)"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self):
+        yield self.name, '', self.value
+
+
+class Histogram:
+    """Fixed-bucket histogram: an observation is one bisect and two additions"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.last = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            self.last = value
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate quantile (upper bound of the bucket it falls in, capped at the largest bucket)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.buckets[-1]
+
+    def samples(self):
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield f"{self.name}_bucket", f'le="{bound}"', running
+        yield f"{self.name}_bucket", 'le="+Inf"', self.count
+        yield f"{self.name}_sum", '', self.sum
+        yield f"{self.name}_count", '', self.count
+
+
+class _Timer:
+    """Context manager that observes the elapsed seconds into a histogram"""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms for the monitoring hot path
+
+    Disabled by default: then inc/set/observe return right away and timer()
+    hands out one shared no-op context manager, so instrumented code costs
+    a method call and an attribute check per metric.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics = {}
+
+        # Metrics the loops, client, database and dispatcher report
+        self.histogram('fetch_seconds', "OpenSky states request latency (incl. download)")
+        self.histogram('payload_bytes', "Decompressed states response size", SIZE_BUCKETS)
+        self.histogram('decode_seconds', "JSON decode time of a states response")
+        self.histogram('filter_seconds', "Radius filter time per poll")
+        self.histogram('lookup_seconds', "Aircraft database lookup time")
+        self.histogram('notify_seconds', "Time to show one notification on every backend")
+        self.counter('lookup_cache_hits_total', "Aircraft lookups answered by the LRU cache")
+        self.counter('lookup_cache_misses_total', "Aircraft lookups that went to the database file")
+        self.counter('enrichment_cache_hits_total', "New-aircraft notifications whose title was cached")
+        self.counter('enrichment_cache_misses_total', "New-aircraft notifications that needed a database lookup")
+        self.counter('polls_total', "States requests made")
+        self.counter('fetch_errors_total', "States requests that failed")
+        self.counter('credits_spent_total', "OpenSky API credits spent")
+        self.counter('notifications_total', "Notifications queued")
+        self.gauge('aircraft_in_box', "Aircraft returned for the bounding box(es) in the last poll")
+        self.gauge('aircraft_in_radius', "Aircraft inside the radius in the last poll")
+        self.gauge('time_to_first_poll_seconds', "Seconds from process start to the first completed poll")
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str = '') -> Gauge:
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str = '', buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def __getitem__(self, name: str):
+        return self._metrics[name]
+
+    def inc(self, name: str, amount: float = 1):
+        if self.enabled:
+            self._metrics[name].inc(amount)
+
+    def set(self, name: str, value: float):
+        if self.enabled:
+            self._metrics[name].set(value)
+
+    def observe(self, name: str, value: float):
+        if self.enabled:
+            self._metrics[name].observe(value)
+
+    def timer(self, name: str):
+        """with METRICS.timer('filter_seconds'): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._metrics[name])
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            full_name = PREFIX + metric.name
+            lines.append(f"# HELP {full_name} {metric.help}")
+            lines.append(f"# TYPE {full_name} {metric.kind}")
+            for sample, labels, value in metric.samples():
+                labels = f"{{{labels}}}" if labels else ''
+                lines.append(f"{PREFIX}{sample}{labels} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict:
+        """Plain values for the stats file: counters/gauges as is, histograms as count/mean/p50/p95"""
+        snap = {'time': time.time()}
+        for name, metric in self._metrics.items():
+            if isinstance(metric, Histogram):
+                snap[name] = {
+                    'count': metric.count,
+                    'mean': metric.sum / metric.count if metric.count else None,
+                    'p50': metric.quantile(0.5),
+                    'p95': metric.quantile(0.95)
+                }
+            else:
+                snap[name] = metric.value
+        return snap
+
+    def summary(self) -> str | None:
+        """One line for the tray menu, None until there is something to show"""
+        if not self.enabled:
+            return None
+        fetch = self['fetch_seconds'].last
+        if fetch is None:
+            return None
+        hits = self['lookup_cache_hits_total'].value
+        lookups = hits + self['lookup_cache_misses_total'].value
+        cache = f" • cache {hits / lookups:.0%}" if lookups else ''
+        return (f"Fetch {fetch * 1000:.0f} ms • filter {(self['filter_seconds'].last or 0) * 1000:.1f} ms • "
+                f"{self['aircraft_in_radius'].value}/{self['aircraft_in_box'].value} in radius{cache}")
+
+    def publish(self, state):
+        """Copy the summary line into the shared state for the tray"""
+        if self.enabled:
+            state['metrics_summary'] = self.summary()
+
+
+# Process-wide registry the instrumented modules report to, see enable()
+METRICS = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves the registry at http://host:port/metrics for Prometheus (or curl)"""
+
+    def __init__(self, registry: MetricsRegistry = METRICS, host: str = '127.0.0.1', port: int = 9464):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Scrapes shouldn't spam the console
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/metrics"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StatsFileWriter:
+    """Appends a JSON snapshot of the registry every interval, rotating the file by size
+
+    stats.jsonl -> stats.jsonl.1 -> ... -> stats.jsonl.<backups>, oldest dropped.
+    """
+
+    def __init__(self, path: str, registry: MetricsRegistry = METRICS, interval: float = STATS_INTERVAL_S,
+                 max_bytes: int = STATS_MAX_BYTES, backups: int = STATS_BACKUPS):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._stop = threading.Event()
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.registry.snapshot()) + '\n')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"WARNING: Could not write stats file: {e}")
+
+    def start(self):
+        threading.Thread(target=self._run, name='stats-writer', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
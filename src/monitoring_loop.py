@@ -1,157 +1,235 @@
-from src.location import calculate_bounding_box, get_my_location
-from src.opensky import get_aircraft_in_area, get_token
-from windows_toasts import Toast, InteractableWindowsToaster, ToastDuration
-from src.airline_lookup import extract_airline_code, get_airline_name
-from src.helper_funcs import degrees_to_direction
-from geopy.distance import distance
+from src.location import filter_within_radius, geodesic_km
+from src.track_predictor import TrackPredictor
+from src.seen_tracker import SeenAircraftTracker
+from src.opensky import credits_for_bbox, get_default_client
+from src.query_planner import QueryPlanner
+from src.states_decoder import StatesBatch
+from src.token_manager import TokenManager
+from src.notifier import NotificationDispatcher, create_backends
+from src.enrichment import EnrichmentCache
+from src.scheduler import PollScheduler, QUIET, traffic_level
+from src.startup import report_first_poll
+from src.shared_state import resumed, woken
+from src.metrics import METRICS
 import time
 
 
-def monitoring_loop(state, aircraft_db, user_lat, user_lon, tray_obj):
+def current_token(token_manager, client):
+    """Token to poll with, None if there isn't one yet
+
+    Also tells the token manager to refresh right away when the last
+    request was rejected with 401.
+    """
+    if client.last_response['status'] == 401:
+        token_manager.invalidate()
+        client.last_response['status'] = None
+
+    token = token_manager.get_token()
+    if token is None:
+        print("Waiting for an access token...")
+    return token
+
+
+def build_notification(state_vec, enrichment, dist_to_plane_km):
+    """Build notification text for a new aircraft
+
+    Args:
+        state_vec: StateVector of the aircraft
+        enrichment: EnrichmentCache with the aircraft's static details (type, operator, title)
+        dist_to_plane_km: Distance from the watched location
+
+    Returns:
+        Dictionary with title, message and callsign
+    """
+    callsign = state_vec.callsign.strip() if state_vec.callsign else "No callsign"
+
+    # Only the dynamic fields are formatted per notification, the title is cached per aircraft
+    altitude_m = state_vec.altitude
+    if altitude_m:
+        altitude_str = f"{altitude_m * 3.28084:.0f} ft"
+    elif state_vec.on_ground:
+        altitude_str = "On ground"
+    else:
+        altitude_str = "Unknown alt"
+
+    return {
+        'title': enrichment.lookup(state_vec.icao24, callsign).title,
+        'message': f"{callsign} • {altitude_str} • {dist_to_plane_km:.1f} km",
+        'callsign': callsign,
+        'url': f'https://www.flightradar24.com/{callsign}'
+    }
+
+
+def default_dispatcher(state, tray_obj):
+    """Dispatcher with the original console + Windows toast behaviour"""
+    return NotificationDispatcher(state, tray_obj, create_backends(['console', 'windows'])).start()
+
+
+def record_request(client, bbox, scheduler, state):
+    """Account for one states request the client just made
+
+    Only a 200 costs credits, so the token counter, the scheduler's daily
+    budget and the credits metric all count successful requests only.
+    """
+    credits = credits_for_bbox(bbox)
+    status = client.last_response['status']
+    scheduler.record_response(credits, status, client.last_response['retry_after'])
+    METRICS.inc('polls_total')
+    if status == 200:
+        state.increment('tokens_used', credits)
+        METRICS.inc('credits_spent_total', credits)
+
+
+def fetch_boxes(client, token, boxes, scheduler, state):
+    """Fetch every query box of one poll and merge them into one batch
+
+    Returns:
+        The merged StatesBatch, None if any request failed
+    """
+    batches = []
+    for bbox in boxes:
+        batch = client.get_states(token, bbox)
+        record_request(client, bbox, scheduler, state)
+        if batch is None:
+            return None
+        batches.append(batch)
+    return StatesBatch.concat(batches)
+
+
+def wait_for_token(state, token_manager, client, timeout: float = 5):
+    """Token to poll with, blocking until the token manager has one (or timeout passes)
+
+    Returns:
+        The token, None if there still isn't one or the app is exiting
+    """
+    token = current_token(token_manager, client)
+    if token is None:
+        state.wait_for(lambda values: values['token'] is not None or values['exiting'], timeout)
+        token = token_manager.get_token() if not state['exiting'] else None
+    return token
+
+
+def wait_for_next_poll(state, dispatcher, enrichment, predictor, targets, interval, wake=None) -> bool:
+    """Sleep until the next poll, notifying predicted radius entries on the way
+
+    Aircraft that dead reckoning says will enter a radius before the next
+    poll are notified at the predicted crossing time instead of up to a
+    whole interval later (or never, if they cross a small radius between polls).
+
+    Args:
+        targets: List of (lat, lon, radius_km, seen_aircraft, label) to check
+        interval: Seconds until the next poll
+        wake: Optional predicate over the state values, ends the wait as soon as a
+            write makes it true (e.g. woken(radius_km): radius changed, paused, exiting)
+
+    Returns:
+        True if woken early by wake
+    """
+    now = time.time()
+    deadline = now + interval
+
+    entries = []
+    for lat, lon, radius_km, seen, label in targets:
+        for eta, icao24, state_vec in predictor.predict_entries(lat, lon, radius_km, now, deadline, exclude=seen):
+            entries.append((eta, icao24, state_vec, (lat, lon), seen, label))
+    entries.sort(key=lambda e: e[0])
+
+    for eta, icao24, state_vec, center, seen, label in entries:
+        if state.wait_until(eta, wake):
+            return True
+        if state['paused']:
+            break
+
+        predicted_pos = predictor.predict_position(icao24, eta)
+        notification = build_notification(state_vec, enrichment, geodesic_km(center, predicted_pos))
+        notification['message'] += f"{label} (predicted)"
+        dispatcher.enqueue(notification)
+        seen.add(icao24)
+
+    return state.wait_until(deadline, wake)
+
+
+def monitoring_loop(state, aircraft_db, user_lat, user_lon, tray_obj, scheduler=None, client=None,
+                    token_manager=None, dispatcher=None, seen_aircraft=None, history=None, snapshots=None):
     """Background monitoring loop"""
-    seen_aircraft = set()
-    user_pos = (user_lat, user_lon)
+    if seen_aircraft is None:  # An empty tracker is falsy, `or` would drop the one passed in
+        seen_aircraft = SeenAircraftTracker()  # Bounded, forgets aircraft gone for a while
+    client = client or get_default_client()
+    token_manager = token_manager or TokenManager(client, state).start()
+    dispatcher = dispatcher or default_dispatcher(state, tray_obj)  # Notifications shown off this thread
+    scheduler = scheduler or PollScheduler()
+    predictor = TrackPredictor()  # Dead reckoning between polls
+    enrichment = EnrichmentCache(aircraft_db)  # Notification titles per aircraft
+    planner = QueryPlanner(user_lat, user_lon)  # Query boxes per radius, last fetch for radius changes
+    radius_changed = False
+    next_poll_at = 0
 
     print("=== Monitoring Started ===\n")
 
     try:
-        while True:
-            # Check if paused
+        while not state['exiting']:
+            # Check if paused, sleeps until the tray resumes
             if state['paused']:
                 print("[PAUSED - monitoring stopped]")
-                time.sleep(15)
+                state.wait_for(resumed)
+                continue
+
+            # Token is refreshed in the background, waits only until the first one arrives
+            token = wait_for_token(state, token_manager, client)
+            if token is None:
                 continue
 
-            # Check if token has expired
-            current_time = time.time()
-            if current_time >= state['token_expires_at']:
-                print("\nToken expired (30 minutes passed), refreshing...")
-                state['token'] = get_token()
-                state['token_expires_at'] = time.time() + (1800)
-                print("Token refreshed.\n")
-
-            # Calculate bounding box
-            bounding_box = calculate_bounding_box(user_lat, user_lon, state['radius_km'])
-
-            # Get aircraft data
-            data = get_aircraft_in_area(state['token'], bounding_box)
-            state['tokens_used'] += 1
-
-            # # Will be None if cannot grab data either, have to think of that
-            # if data.get('states') is None:
-            #     print(f"No aircraft in area... [Tokens: {state['tokens_used']}]")
-            if data is None:
-                # Error occurred (already printed in get_aircraft_in_area)
+            radius_km = state['radius_km']
+            reused = planner.reusable(radius_km) if radius_changed else None
+            if reused:
+                # Radius shrank right after a poll: the last fetch already covers it, no new query
+                batch, fetched_at = reused
+                print(f"[Radius changed to {radius_km}km, re-checking the last fetch]")
+            else:
+                # Get aircraft data (decoded straight into columns), one request per query box
+                fetched_at = time.time()
+                batch = fetch_boxes(client, token, planner.boxes(radius_km), scheduler, state)
+                scheduler.credits_per_poll = planner.credits(radius_km)
+                if batch is not None:
+                    planner.remember(radius_km, batch, fetched_at)
+                    report_first_poll(state)
+            traffic = QUIET
+
+            if batch is None:
+                # Error occurred (already printed in get_states)
+                METRICS.inc('fetch_errors_total')
                 print(f"Error fetching data, will retry... [Tokens: {state['tokens_used']}]")
-            elif data.get('states') is None:
+            elif len(batch) == 0:
                 # API succeeded but no aircraft in range
+                METRICS.set('aircraft_in_box', 0)
+                METRICS.set('aircraft_in_radius', 0)
                 print(f"No aircraft in area... [Tokens: {state['tokens_used']}]")
             else:
                 current_aircraft = set()  # Aircraft currently in range
                 new_count = 0
 
-                for state_vec in data['states']:
-                    icao24 = state_vec[0]
-                    plane_lat = state_vec[6]
-                    plane_lon = state_vec[5]
-
-                    if plane_lat and plane_lon:  # if either is None, skip, cannot find position anyway
-                        plane_pos = (plane_lat, plane_lon)
-                        dist_to_plane_km = distance(user_pos, plane_pos).km
-
-                        # Only process aircraft within user specified radius
-                        if dist_to_plane_km <= state['radius_km']:
-                            current_aircraft.add(icao24)
-
-                            # Is this a NEW aircraft?
-                            if icao24 not in seen_aircraft:
-                                # Extract data for notification
-                                callsign = state_vec[1].strip() if state_vec[1] else "No callsign"
-                                altitude_m = state_vec[7]
-                                on_ground = state_vec[8]
-                                velocity_ms = state_vec[9]
-                                heading_degrees = state_vec[10]
-
-                                # Convert units
-                                altitude_ft = altitude_m * 3.28084 if altitude_m else None
-                                speed_mph = velocity_ms * 2.23694 if velocity_ms else None
-                                heading = degrees_to_direction(heading_degrees)
-
-                                # Format altitude
-                                if altitude_ft:
-                                    altitude_str = f"{altitude_ft:.0f} ft"
-                                elif on_ground:
-                                    altitude_str = "On ground"
-                                else:
-                                    altitude_str = None
-
-                                # Format speed
-                                speed_str = f"{speed_mph:.0f} mph" if speed_mph else None
-
-                                # Look up aircraft in database
-                                aircraft_info = aircraft_db.lookup(icao24)
-
-                                # Determine operator (first try database, then fallback to callsign lookup)
-                                operator = None
-                                if aircraft_info and aircraft_info['operator']:
-                                    operator = aircraft_info['operator']
-                                else:
-                                    # Fallback: try to get airline from callsign
-                                    airline_code = extract_airline_code(callsign)
-                                    if airline_code:
-                                        operator = get_airline_name(airline_code)
-
-                                # Build notification title
-                                title_parts = []
-
-                                if aircraft_info:
-                                    # Either "Boeing 737", "737", or "Boeing" (whatever is available)
-                                    if aircraft_info['manufacturer'] and aircraft_info['model']:
-                                        model_str = f"{aircraft_info['manufacturer']} {aircraft_info['model']}"
-                                        title_parts.append(model_str)
-                                    elif aircraft_info['model']:
-                                        title_parts.append(aircraft_info['model'])
-                                    elif aircraft_info['manufacturer']:
-                                        title_parts.append(aircraft_info['manufacturer'])
-
-                                # Build notification title with operator
-                                if operator:
-                                    if title_parts:
-                                        notif_title = f"{title_parts[0]} - {operator}"
-                                    else:
-                                        notif_title = f"{operator}"
-                                else:
-                                    if title_parts:
-                                        notif_title = f"{title_parts[0]}"
-                                    else:
-                                        notif_title = f"{callsign}"
-
-                                # Build notification message
-                                notif_message = f"{callsign} • {altitude_str or 'Unknown alt'} • {dist_to_plane_km:.1f} km"
-
-                                # Show notification
-                                toaster = InteractableWindowsToaster('Click to view on FlightRadar24')
-                                new_toast = Toast()
-                                new_toast.text_fields = [notif_title, notif_message]
-                                new_toast.launch_action = f'https://www.flightradar24.com/{callsign}'
-                                new_toast.duration = ToastDuration.Default
-                                toaster.show_toast(new_toast)
-
-                                # Print to console
-                                print(f"✈️  NEW: {notif_title}")
-                                print(f"    {notif_message}")
-                                print(f"    View: https://www.flightradar24.com/{callsign}\n")
-
-                                # Add to recent flights (for tray menu)
-                                state['recent_flights'].append({
-                                    'display': f"{notif_title} ({callsign})",
-                                    'callsign': callsign
-                                })
-                                tray_obj.update_menu()
-
-                                # Mark as seen
-                                seen_aircraft.add(icao24)
-                                new_count += 1
+                # Vectorized radius filter over the whole batch (aircraft without a position are dropped)
+                with METRICS.timer('filter_seconds'):
+                    in_radius, distances_km = filter_within_radius(batch.lats, batch.lons, user_lat, user_lon,
+                                                                   radius_km)
+                METRICS.set('aircraft_in_box', len(batch))
+                METRICS.set('aircraft_in_radius', len(in_radius))
+                traffic = traffic_level(batch.lats, batch.lons, batch.tracks, user_lat, user_lon, radius_km)
+                if not reused:
+                    predictor.update(batch, fetched_at)
+                if history is not None:
+                    history.record(fetched_at, batch, in_radius, distances_km)  # Written on its own thread
+
+                # Only process aircraft within user specified radius
+                for index, dist_to_plane_km in zip(in_radius.tolist(), distances_km.tolist()):
+                    icao24 = batch.icao24[index]
+                    current_aircraft.add(icao24)
+
+                    # Is this a NEW aircraft? (also refreshes its last-seen time)
+                    if seen_aircraft.observe(icao24):
+                        notification = build_notification(batch.vector(index), enrichment, dist_to_plane_km)
+                        dispatcher.enqueue(notification)
+                        new_count += 1
 
                 # Update current aircraft count for tray
                 state['current_aircraft'] = current_aircraft
@@ -162,8 +240,19 @@ def monitoring_loop(state, aircraft_db, user_lat, user_lon, tray_obj):
                 else:
                     print(f"[Monitoring... {len(current_aircraft)} aircraft in range] [Tokens: {state['tokens_used']}]")
 
-            # Wait 15 seconds before next check so we don't stress CPU
-            time.sleep(15)
+            # Wait for the scheduler's interval (traffic, quiet hours, daily budget, backoff).
+            # A re-check after a radius change keeps the poll that was already planned.
+            if not reused:
+                next_poll_at = time.time() + scheduler.next_interval(traffic)
+            scheduler.publish(state)
+            METRICS.publish(state)
+            tray_obj.update_menu()
+            if snapshots is not None:
+                snapshots.tick()  # Copies the seen aircraft here, written on its own thread
+            targets = [(user_lat, user_lon, radius_km, seen_aircraft, '')]
+            woke = wait_for_next_poll(state, dispatcher, enrichment, predictor, targets,
+                                      next_poll_at - time.time(), wake=woken(radius_km))
+            radius_changed = woke and state['radius_km'] != radius_km  # Pause/exit wake-ups re-check above
 
     except KeyboardInterrupt:
         print("\n\nStopping flight tracker...")
@@ -0,0 +1,175 @@
+import json
+import queue
+import threading
+import time
+
+from src.metrics import METRICS
+
+FR24_URL = 'https://www.flightradar24.com/'
+BURST_THRESHOLD = 5    # More new aircraft than this in one burst get one summary notification
+BURST_WINDOW_S = 0.5   # A burst ends once no arrival came for this long
+BURST_MAX_S = 2.0      # ... or at the latest this long after its first arrival
+MAX_QUEUE = 1000
+
+
+class ConsoleBackend:
+    """Prints notifications to the console"""
+
+    def send(self, notification: dict):
+        print(f"✈️  NEW: {notification['title']}")
+        print(f"    {notification['message']}")
+        print(f"    View: {notification['url']}\n")
+
+
+class WindowsToastBackend:
+    """Windows toast notifications, one toaster reused for every toast"""
+
+    def __init__(self):
+        # Imported here so the rest of the app runs on machines without windows_toasts
+        from windows_toasts import Toast, InteractableWindowsToaster, ToastDuration
+        self._toast_cls = Toast
+        self._duration = ToastDuration.Default
+        self.toaster = InteractableWindowsToaster('Click to view on FlightRadar24')
+
+    def send(self, notification: dict):
+        new_toast = self._toast_cls()
+        new_toast.text_fields = [notification['title'], notification['message']]
+        new_toast.launch_action = notification['url']
+        new_toast.duration = self._duration
+        self.toaster.show_toast(new_toast)
+
+
+class JsonlFileBackend:
+    """Appends notifications as JSON lines, for running headless"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, notification: dict):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'time': time.time(), **notification}, ensure_ascii=False) + '\n')
+
+
+def create_backends(names: list[str], jsonl_path: str = 'notifications.jsonl') -> list:
+    """Build backends by name: 'windows', 'console', 'jsonl'
+
+    'windows' quietly falls back to nothing if windows_toasts isn't installed,
+    the console backend still reports everything.
+    """
+    backends = []
+    for name in names:
+        if name == 'console':
+            backends.append(ConsoleBackend())
+        elif name == 'jsonl':
+            backends.append(JsonlFileBackend(jsonl_path))
+        elif name == 'windows':
+            try:
+                backends.append(WindowsToastBackend())
+            except ImportError:
+                print("windows_toasts not available, toast notifications disabled")
+        else:
+            raise ValueError(f"Unknown notification backend: {name}")
+    return backends
+
+
+def summarize(notifications: list[dict]) -> dict:
+    """One notification standing in for a burst of arrivals"""
+    titles = [n['title'] for n in notifications[:3]]
+    extra = len(notifications) - len(titles)
+    message = ', '.join(titles) + (f" and {extra} more" if extra else "")
+    return {
+        'title': f"{len(notifications)} new aircraft nearby",
+        'message': message,
+        'callsign': None,
+        'url': FR24_URL
+    }
+
+
+class NotificationDispatcher:
+    """Shows notifications on its own thread so the polling thread only enqueues
+
+    Arrivals close together are collected into a burst; bursts larger than
+    burst_threshold become one summary notification instead of a flood.
+    Every arrival still goes into recent flights, and the tray is updated
+    once per burst.
+    """
+
+    def __init__(self, state, tray_obj, backends: list, burst_threshold: int = BURST_THRESHOLD,
+                 burst_window: float = BURST_WINDOW_S, burst_max: float = BURST_MAX_S, max_queue: int = MAX_QUEUE):
+        self.state = state
+        self.tray_obj = tray_obj
+        self.backends = backends
+        self.burst_threshold = burst_threshold
+        self.burst_window = burst_window
+        self.burst_max = burst_max
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.queue.put(None)
+
+    def enqueue(self, notification: dict):
+        """Hand a notification to the dispatcher (never blocks)"""
+        try:
+            self.queue.put_nowait(notification)
+            METRICS.inc('notifications_total')
+        except queue.Full:
+            self.dropped += 1
+
+    def _collect_burst(self, first: dict) -> tuple[list[dict], bool]:
+        """Keep taking notifications until the queue stays quiet for burst_window (at most burst_max in all)"""
+        burst = [first]
+        started = time.monotonic()
+        last_arrival = started
+        while True:
+            # Each arrival extends the burst, capped so a steady trickle is still shown
+            remaining = min(last_arrival + self.burst_window, started + self.burst_max) - time.monotonic()
+            if remaining <= 0:
+                return burst, False
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                return burst, False
+            if item is None:
+                return burst, True
+            burst.append(item)
+            last_arrival = time.monotonic()
+
+    def _send(self, notification: dict):
+        with METRICS.timer('notify_seconds'):
+            for backend in self.backends:
+                try:
+                    backend.send(notification)
+                except Exception as e:  # One broken backend shouldn't stop the others
+                    print(f"WARNING: {type(backend).__name__} failed: {e}")
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+
+            burst, stopping = self._collect_burst(first)
+            if len(burst) > self.burst_threshold:
+                self._send(summarize(burst))
+            else:
+                for notification in burst:
+                    self._send(notification)
+
+            # Add to recent flights (for tray menu)
+            for notification in burst:
+                self.state.append('recent_flights', {
+                    'display': f"{notification['title']} ({notification['callsign']})",
+                    'callsign': notification['callsign']
+                })
+            self.tray_obj.update_menu()
+
+            if stopping:
+                return
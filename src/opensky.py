@@ -1,127 +1,297 @@
 import os
 import sys
+import time
+from collections import deque
+
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def get_token():
-    """Get OpenSky access token"""
-    # load env variables from .env file
-    load_dotenv()
-
-    CLIENT_ID = os.getenv('OPENSKY_CLIENT_ID')
-    CLIENT_SECRET = os.getenv('OPENSKY_CLIENT_SECRET')
-
-    if not CLIENT_ID or not CLIENT_SECRET:
-        print("ERROR: Missing OpenSky credentials in .env file")
-        sys.exit(1)
-
-    print('getting access token...')
-
-    try:
-        token_response = requests.post(
-            # token_response.json() will return a dictionary like:
-            # {
-            #     'access_token': ""
-            #     'expires_in': 1800,
-            #     'refresh_expires_in': 0,
-            #     'token_type': "Bearer",
-            #     'not-before-policy': (some value),
-            #     'scope': 'profile email'
-            # }
-
-            "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token",
-            data = {
-                "grant_type": "client_credentials",
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET
-            },
-            timeout=30
+from src.metrics import METRICS
+from src.states_decoder import StatesBatch, decode_states, loads
+
+DEFAULT_BASE_URL = "https://opensky-network.org/api"
+DEFAULT_AUTH_URL = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
+
+# OpenSky charges /states/all by the area of the bounding box (square degrees)
+# https://openskynetwork.github.io/opensky-api/rest.html#limitations
+CREDIT_TIERS = [(25, 1), (100, 2), (400, 3)]  # (max area, credits)
+MAX_CREDITS = 4
+
+
+def credits_for_bbox(bbox: dict[str, float]) -> int:
+    """API credits a /states/all request for this bounding box costs"""
+    area = (bbox['lamax'] - bbox['lamin']) * (bbox['lomax'] - bbox['lomin'])
+    for max_area, credits in CREDIT_TIERS:
+        if area <= max_area:
+            return credits
+    return MAX_CREDITS
+
+
+class OpenSkyAuthError(Exception):
+    """Raised when an access token can't be obtained"""
+
+    def __init__(self, message: str, status: int | None = None, fatal: bool = False):
+        """
+        Args:
+            message: What went wrong, ready to show the user
+            status: HTTP status code, if the server answered
+            fatal: True if retrying won't help (bad or missing credentials)
+        """
+        super().__init__(message)
+        self.status = status
+        self.fatal = fatal
+
+
+class OpenSkyClient:
+    """OpenSky API client sharing one pooled, keep-alive HTTP session"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, auth_url: str = DEFAULT_AUTH_URL,
+                 retries: int = 2, backoff_factor: float = 0.5, pool_size: int = 4, timeout: float = 30):
+        """
+        Args:
+            base_url: API root, point it at a local stand-in server for tests
+            auth_url: OAuth2 token endpoint
+            retries: Automatic retries for connection errors and 502/503/504
+            backoff_factor: urllib3 backoff between retries (0.5 -> 0.5s, 1s, 2s...)
+            pool_size: Connections kept alive per host
+            timeout: Seconds before a request times out
+        """
+        self.base_url = base_url.rstrip('/')
+        self.auth_url = auth_url
+        self.timeout = timeout
+
+        # 429 is not retried here, the poll scheduler decides how long to back off
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
         )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+
+        # Outcome of the last get_aircraft_in_area call, read by the poll scheduler
+        self.last_response = {'status': None, 'retry_after': None}
+        # Recent request timings: (name, status or None, seconds)
+        self.timings = deque(maxlen=500)
+
+    def _request(self, name: str, method: str, url: str, **kwargs) -> tuple[requests.Response, float]:
+        """Send a request through the pooled session and record how long it took
+
+        Returns:
+            (response, seconds), the time is this call's own (the token refresh
+            thread appends to timings concurrently)
+        """
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            status = response.status_code
+            return response, time.perf_counter() - start
+        finally:
+            self.timings.append((name, status, time.perf_counter() - start))
+
+    def timing_summary(self) -> dict[str, dict[str, float]]:
+        """Count, mean and max latency (ms) per request type"""
+        summary = {}
+        for name, _, seconds in self.timings:
+            entry = summary.setdefault(name, {'count': 0, 'mean_ms': 0.0, 'max_ms': 0.0})
+            entry['count'] += 1
+            entry['mean_ms'] += (seconds * 1000 - entry['mean_ms']) / entry['count']
+            entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+        return summary
+
+    def close(self):
+        self.session.close()
+
+    def fetch_token(self) -> dict:
+        """Request a new access token
+
+        Returns:
+            The token response, e.g. {'access_token': ..., 'expires_in': 1800, ...}
+
+        Raises:
+            OpenSkyAuthError: With a user-facing message when no token could be obtained
+        """
+        # load env variables from .env file
+        load_dotenv()
+
+        CLIENT_ID = os.getenv('OPENSKY_CLIENT_ID')
+        CLIENT_SECRET = os.getenv('OPENSKY_CLIENT_SECRET')
+
+        if not CLIENT_ID or not CLIENT_SECRET:
+            raise OpenSkyAuthError("Missing OpenSky credentials in .env file", fatal=True)
 
-        token_response.raise_for_status() # Raises http error if raised
-        token_data = token_response.json()
+        print('getting access token...')
+
+        try:
+            token_response, _ = self._request(
+                'token',
+                'POST',
+                # token_response.json() will return a dictionary like:
+                # {
+                #     'access_token': ""
+                #     'expires_in': 1800,
+                #     'refresh_expires_in': 0,
+                #     'token_type': "Bearer",
+                #     'not-before-policy': (some value),
+                #     'scope': 'profile email'
+                # }
+
+                self.auth_url,
+                data = {
+                    "grant_type": "client_credentials",
+                    "client_id": CLIENT_ID,
+                    "client_secret": CLIENT_SECRET
+                }
+            )
+
+            token_response.raise_for_status() # Raises http error if raised
+            token_data = token_response.json()
+
+        # Specifies timeout error
+        except requests.exceptions.Timeout:
+            raise OpenSkyAuthError("Request timed out while getting token")
+
+        # Handles no connection, DNS resolution fails, Network unreachable, and more.
+        except requests.exceptions.ConnectionError:
+            raise OpenSkyAuthError("Could not connect to OpenSky API (try checking your wifi?)")
+
+        # Different HTTP error handling
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code
+            if status == 401:
+                raise OpenSkyAuthError("HTTP error 401: Invalid credentials - check your .env file", status, fatal=True)
+            elif status == 403:
+                raise OpenSkyAuthError("HTTP error 403: Access forbidden - your account may not have API access",
+                                       status, fatal=True)
+            elif status == 429:
+                raise OpenSkyAuthError("HTTP error 429: Rate limit exceeded - too many requests", status)
+            elif status == 500:
+                raise OpenSkyAuthError("HTTP error 500: OpenSky server error - try again later", status)
+            elif status == 503:
+                raise OpenSkyAuthError("HTTP error 503: OpenSky service temporarily unavailable", status)
+            else:
+                raise OpenSkyAuthError(f"HTTP error {status}: Unexpected error code", status)
+
+        # All unhandled exceptoins
+        except Exception as e:
+            raise OpenSkyAuthError(f"Unexpected error getting token: {e}")
 
         if "access_token" not in token_data:
-            print("ERROR: Token response missing access_token field")
+            raise OpenSkyAuthError("Token response missing access_token field")
+
+        print(f"Got token: {token_data['access_token'][:10]}... (obviously more to this token))")
+        return token_data
+
+    def get_token(self):
+        """Get OpenSky access token, exits the program if it can't"""
+        try:
+            return self.fetch_token()["access_token"]
+        except OpenSkyAuthError as e:
+            print(f"ERROR: {e}")
             sys.exit(1)
 
-        token = token_data["access_token"]
-        print(f"Got token: {token[:10]}... (obviously more to this token))")
-        return token
-
-    # Specifies timeout error
-    except requests.exceptions.Timeout:
-        print("ERROR: Request timed out while getting token")
-        # Later give user option to exit or retry
-        sys.exit(1)
-
-    # Handles no connection, DNS resolution fails, Network unreachable, and more.
-    except requests.exceptions.ConnectionError:
-        print("ERROR: Could not connect to OpenSky API (try checking your wifi?)")
-        # Later give user option to exit or retry
-        sys.exit(1)
-
-    # Different HTTP error handling
-    except requests.exceptions.HTTPError as e:
-        print(f"ERROR: HTTP error {e.response.status_code}")
-        status = e.response.status_code
-        if status == 401:
-            print("Invalid credentials - check your .env file")
-        elif status == 403:
-            print("Access forbidden - your account may not have API access")
-        elif status == 429:
-            print("Rate limit exceeded - too many requests")
-            print("Wait a few minutes and try again")
-        elif status == 500:
-            print("OpenSky server error - try again later")
-        elif status == 503:
-            print("OpenSky service temporarily unavailable")
-        else:
-            print(f"Unexpected error code: {status}")
-        sys.exit(1)
-
-    # All unhandled exceptoins
-    except Exception as e:
-        print(f"ERROR: Unexpected error getting token: {e}")
-        sys.exit(1)
+    def fetch_states_body(self, token: str, bbox: dict[str, float]) -> bytes | None:
+        """Raw /states/all response body for a bounding box, None on errors (already reported)"""
+        print("\n\nMaking authenticated request to OpenSky API...\n")
+        self.last_response['status'] = None
+        self.last_response['retry_after'] = None
 
-def get_aircraft_in_area(token: str, bbox: dict[str, float]) -> dict[str, list] | None:
-    """Get aircraft within a bounding box"""
-    print("\n\nMaking authenticated request to OpenSky API...\n")
-
-    try:
-        response = requests.get(
-            "https://opensky-network.org/api/states/all",
-            params=bbox,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30
-        )
+        try:
+            response, seconds = self._request(
+                'states',
+                'GET',
+                f"{self.base_url}/states/all",
+                params=bbox,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+
+            self.last_response['status'] = response.status_code
+            METRICS.observe('fetch_seconds', seconds)
+            response.raise_for_status()
+            METRICS.observe('payload_bytes', len(response.content))
+            return response.content
 
-        response.raise_for_status()
-        data = response.json()
-        return data
+        except requests.exceptions.Timeout:
+            print("WARNING: API request timed out, will retry next cycle")
+            return None
 
-    except requests.exceptions.Timeout:
-        print("WARNING: API request timed out, will retry next cycle")
-        return None
+        except requests.exceptions.ConnectionError:
+            print("WARNING: Connection error, will retry next cycle")
+            return None
 
-    except requests.exceptions.ConnectionError:
-        print("WARNING: Connection error, will retry next cycle")
-        return None
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code
+            print(f"WARNING: HTTP error {status}")
 
-    except requests.exceptions.HTTPError as e:
-        status = e.response.status_code
-        print(f"WARNING: HTTP error {status}")
+            if status == 401:
+                print("Token rejected, refreshing it in the background")
+            elif status == 429:
+                print("Rate limit exceeded - reduce polling frequency or wait")
+                retry_after = e.response.headers.get('X-Rate-Limit-Retry-After-Seconds')
+                if retry_after and retry_after.isdigit():
+                    self.last_response['retry_after'] = float(retry_after)
+            elif status >= 500:
+                print("OpenSky server error - not your fault")
 
-        if status == 401:
-            print("Token probably expired, try restarting app")
-        elif status == 429:
-            print("Rate limit exceeded - reduce polling frequency or wait")
-        elif status >= 500:
-            print("OpenSky server error - not your fault")
+            return None
 
-        return None
+        except Exception as e:
+            print(f"WARNING: Error fetching aircraft data: {e}")
+            return None
 
-    except Exception as e:
-        print(f"WARNING: Error fetching aircraft data: {e}")
-        return None
+    def get_states(self, token: str, bbox: dict[str, float]) -> StatesBatch | None:
+        """Get aircraft within a bounding box as a columnar StatesBatch (what the monitor uses)"""
+        body = self.fetch_states_body(token, bbox)
+        if body is None:
+            return None
+        try:
+            return decode_states(body)
+        except ValueError as e:  # Not JSON (e.g. a proxy error page)
+            print(f"WARNING: Could not decode aircraft data: {e}")
+            return None
+
+    def get_aircraft_in_area(self, token: str, bbox: dict[str, float]) -> dict[str, list] | None:
+        """Get aircraft within a bounding box as the parsed JSON response"""
+        body = self.fetch_states_body(token, bbox)
+        if body is None:
+            return None
+        try:
+            with METRICS.timer('decode_seconds'):
+                return loads(body)
+        except ValueError as e:
+            print(f"WARNING: Could not decode aircraft data: {e}")
+            return None
+
+
+# Shared client behind the module-level helpers
+_default_client = None
+
+
+def get_default_client() -> OpenSkyClient:
+    """Client used by get_token() and get_aircraft_in_area()"""
+    global _default_client
+    if _default_client is None:
+        _default_client = OpenSkyClient()
+    return _default_client
+
+
+def get_token():
+    """Get OpenSky access token (through the shared default client)"""
+    return get_default_client().get_token()
+
+
+def get_aircraft_in_area(token: str, bbox: dict[str, float]) -> dict[str, list] | None:
+    """Get aircraft within a bounding box (through the shared default client)"""
+    return get_default_client().get_aircraft_in_area(token, bbox)
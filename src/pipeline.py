@@ -0,0 +1,256 @@
+import asyncio
+import time
+
+from src.enrichment import EnrichmentCache
+from src.location import filter_within_radius, geodesic_km
+from src.metrics import METRICS
+from src.monitoring_loop import build_notification, current_token, default_dispatcher, fetch_boxes
+from src.opensky import get_default_client
+from src.query_planner import QueryPlanner
+from src.scheduler import PollScheduler, QUIET, traffic_level
+from src.seen_tracker import SeenAircraftTracker
+from src.shared_state import resumed, woken
+from src.startup import report_first_poll
+from src.token_manager import TokenManager
+from src.track_predictor import TrackPredictor
+
+QUEUE_SIZE = 8  # Per stage; fetched batches beyond this drop the oldest
+
+
+class MonitoringPipeline:
+    """Monitoring split into fetch -> filter -> enrich -> notify stages on one asyncio loop
+
+    Stages are connected by bounded queues. The fetch stage polls on the
+    scheduler's cadence no matter how slow the later stages are: if the
+    filter stage falls behind, the oldest unprocessed batch is dropped
+    (only the newest positions matter). Enrich and notify apply normal
+    backpressure since every new aircraft should be notified. Blocking
+    work (HTTP) runs in worker threads via asyncio.to_thread.
+
+    Runs on its own thread next to the pystray main loop; see run().
+    """
+
+    def __init__(self, state, aircraft_db, user_lat, user_lon, tray_obj, scheduler=None, client=None,
+                 token_manager=None, dispatcher=None, seen_aircraft=None, history=None, snapshots=None,
+                 queue_size: int = QUEUE_SIZE):
+        self.state = state
+        self.aircraft_db = aircraft_db
+        self.enrichment = EnrichmentCache(aircraft_db)  # Notification titles per aircraft
+        self.user_lat = user_lat
+        self.user_lon = user_lon
+        self.tray_obj = tray_obj
+        self.client = client or get_default_client()
+        self.token_manager = token_manager or TokenManager(self.client, state).start()
+        self.dispatcher = dispatcher or default_dispatcher(state, tray_obj)
+        self.scheduler = scheduler or PollScheduler()
+        self.seen_aircraft = SeenAircraftTracker() if seen_aircraft is None else seen_aircraft
+        self.history = history  # Optional SightingHistory, records every in-radius observation
+        self.snapshots = snapshots  # Optional RuntimeSnapshots, restart state
+        self.predictor = TrackPredictor()
+        self.planner = QueryPlanner(user_lat, user_lon)
+        self.queue_size = queue_size
+
+        self.traffic = QUIET      # Traffic level of the last fetched batch, paces the next poll
+        self.dropped_batches = 0
+        self._predictions = set()  # Pending predicted-entry tasks (asyncio only keeps weak refs)
+        self._state_changed = None  # asyncio.Event, set from any thread by a shared state write
+
+    def run(self):
+        """Run the pipeline until the process exits (blocking, call it on a thread)"""
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            print("\n\nStopping flight tracker...")
+
+    async def _main(self):
+        batches = asyncio.Queue(self.queue_size)      # (fetch time, radius, StatesBatch, reused)
+        arrivals = asyncio.Queue(self.queue_size)     # (state vector, distance km, label)
+        notifications = asyncio.Queue(self.queue_size)
+
+        # Tray clicks and token refreshes happen on other threads, hand them to this loop
+        loop = asyncio.get_running_loop()
+        self._state_changed = asyncio.Event()
+        listener = lambda: loop.call_soon_threadsafe(self._state_changed.set)
+        self.state.add_listener(listener)
+
+        print("=== Monitoring Started (pipeline) ===\n")
+        stages = [
+            asyncio.create_task(self._fetch_stage(batches)),
+            asyncio.create_task(self._filter_stage(batches, arrivals)),
+            asyncio.create_task(self._enrich_stage(arrivals, notifications)),
+            asyncio.create_task(self._notify_stage(notifications))
+        ]
+        try:
+            # Only the fetch stage returns (on exit), a stage that raises ends the pipeline too
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            self.state.remove_listener(listener)
+            for task in stages + list(self._predictions):
+                task.cancel()
+
+    async def _wait(self, predicate, deadline: float | None = None) -> bool:
+        """Wait until predicate(state values) is true or deadline passes
+
+        Woken by every shared state write instead of polling the state.
+
+        Returns:
+            True if the predicate ended the wait
+        """
+        while True:
+            self._state_changed.clear()
+            if self.state.wait_for(predicate, 0):
+                return True
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._state_changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+
+    async def _fetch_stage(self, batches: asyncio.Queue):
+        state = self.state
+        radius_changed = False
+        next_poll_at = 0
+        while not state['exiting']:
+            # Check if paused, sleeps until the tray resumes
+            if state['paused']:
+                print("[PAUSED - monitoring stopped]")
+                await self._wait(resumed)
+                continue
+
+            # Token is refreshed in the background, waits only until the first one arrives
+            token = current_token(self.token_manager, self.client)
+            if token is None:
+                await self._wait(lambda values: values['token'] is not None or values['exiting'], time.time() + 5)
+                continue
+
+            radius_km = state['radius_km']
+            reused = self.planner.reusable(radius_km) if radius_changed else None
+            if reused:
+                # Radius shrank right after a poll: the last fetch already covers it, no new query
+                batch, fetched_at = reused
+                print(f"[Radius changed to {radius_km}km, re-checking the last fetch]")
+            else:
+                fetched_at = time.time()
+                batch = await asyncio.to_thread(fetch_boxes, self.client, token, self.planner.boxes(radius_km),
+                                                self.scheduler, state)
+                self.scheduler.credits_per_poll = self.planner.credits(radius_km)
+
+            traffic = QUIET
+            if batch is None:
+                # Error occurred (already printed in get_states)
+                METRICS.inc('fetch_errors_total')
+                print(f"Error fetching data, will retry... [Tokens: {state['tokens_used']}]")
+            else:
+                if not reused:
+                    self.planner.remember(radius_km, batch, fetched_at)
+                    report_first_poll(state)
+                if len(batch):
+                    # Classified here (one vectorized pass), so this batch paces the next poll
+                    traffic = traffic_level(batch.lats, batch.lons, batch.tracks, self.user_lat, self.user_lon,
+                                            radius_km)
+                if batches.full():
+                    batches.get_nowait()  # Filter is behind, newest positions win
+                    self.dropped_batches += 1
+                batches.put_nowait((fetched_at, radius_km, batch, reused))
+
+            # Cadence only depends on the scheduler, never on downstream stages.
+            # A re-check after a radius change keeps the poll that was already planned.
+            if not reused:
+                self.traffic = traffic
+                next_poll_at = time.time() + self.scheduler.next_interval(self.traffic)
+            self.scheduler.publish(state)
+            METRICS.publish(state)
+            self.tray_obj.update_menu()
+            if self.snapshots is not None:
+                self.snapshots.tick()  # Same thread as the filter stage, which updates the seen aircraft
+            woke = await self._wait(woken(radius_km), next_poll_at)
+            radius_changed = woke and state['radius_km'] != radius_km  # Pause/exit wake-ups re-check above
+
+    async def _filter_stage(self, batches: asyncio.Queue, arrivals: asyncio.Queue):
+        state = self.state
+        while True:
+            fetched_at, radius_km, batch, reused = await batches.get()
+
+            # Predictions from the previous batch are superseded (and may be for another radius)
+            for task in list(self._predictions):
+                task.cancel()
+
+            if len(batch) == 0:
+                # API succeeded but no aircraft in range
+                METRICS.set('aircraft_in_box', 0)
+                METRICS.set('aircraft_in_radius', 0)
+                print(f"No aircraft in area... [Tokens: {state['tokens_used']}]")
+                continue
+
+            # Vectorized radius filter over the whole batch (aircraft without a position are dropped)
+            with METRICS.timer('filter_seconds'):
+                in_radius, distances_km = filter_within_radius(batch.lats, batch.lons, self.user_lat, self.user_lon,
+                                                               radius_km)
+            METRICS.set('aircraft_in_box', len(batch))
+            METRICS.set('aircraft_in_radius', len(in_radius))
+            if not reused:
+                self.predictor.update(batch, fetched_at)  # A re-checked fetch is already in the tracks
+            if self.history is not None:
+                self.history.record(fetched_at, batch, in_radius, distances_km)
+
+            current_aircraft = set()  # Aircraft currently in range
+            new_count = 0
+            for index, dist_to_plane_km in zip(in_radius.tolist(), distances_km.tolist()):
+                icao24 = batch.icao24[index]
+                current_aircraft.add(icao24)
+
+                # Is this a NEW aircraft? (also refreshes its last-seen time)
+                if self.seen_aircraft.observe(icao24):
+                    await arrivals.put((batch.vector(index), dist_to_plane_km, ''))
+                    new_count += 1
+
+            # Update current aircraft count for tray
+            state['current_aircraft'] = current_aircraft
+
+            # Status update in console
+            if new_count > 0:
+                print(f"[{new_count} new aircraft detected] [Tokens: {state['tokens_used']}]")
+            else:
+                print(f"[Monitoring... {len(current_aircraft)} aircraft in range] [Tokens: {state['tokens_used']}]")
+
+            # Dead reckoning: notify predicted entries before the next poll
+            now = time.time()
+            entries = self.predictor.predict_entries(self.user_lat, self.user_lon, radius_km,
+                                                     now, now + self.scheduler.interval, exclude=self.seen_aircraft)
+            for eta, icao24, state_vec in entries:
+                task = asyncio.create_task(self._predicted_entry(arrivals, eta, icao24, state_vec, radius_km))
+                self._predictions.add(task)
+                task.add_done_callback(self._predictions.discard)
+
+    async def _predicted_entry(self, arrivals: asyncio.Queue, eta: float, icao24: str, state_vec, radius_km: float):
+        await asyncio.sleep(max(0, eta - time.time()))
+        if self.state['paused'] or icao24 in self.seen_aircraft:
+            return  # A newer poll already caught it
+        if self.state['radius_km'] != radius_km:
+            return  # Radius changed from the tray, the prediction was for the old one
+        predicted_pos = self.predictor.predict_position(icao24, eta)
+        if predicted_pos is None:
+            return
+        self.seen_aircraft.add(icao24)
+        await arrivals.put((state_vec, geodesic_km((self.user_lat, self.user_lon), predicted_pos), ' (predicted)'))
+
+    async def _enrich_stage(self, arrivals: asyncio.Queue, notifications: asyncio.Queue):
+        while True:
+            state_vec, dist_to_plane_km, label = await arrivals.get()
+            notification = build_notification(state_vec, self.enrichment, dist_to_plane_km)
+            notification['message'] += label
+            await notifications.put(notification)
+
+    async def _notify_stage(self, notifications: asyncio.Queue):
+        while True:
+            notification = await notifications.get()
+            self.dispatcher.enqueue(notification)  # Dispatcher shows it on its own thread
+
+
+def pipeline_loop(state, aircraft_db, user_lat, user_lon, tray_obj, **kwargs):
+    """Drop-in replacement for monitoring_loop that runs the staged pipeline"""
+    MonitoringPipeline(state, aircraft_db, user_lat, user_lon, tray_obj, **kwargs).run()
@@ -0,0 +1,53 @@
+import time
+
+from src.location import calculate_bounding_box, split_antimeridian
+from src.opensky import credits_for_bbox
+
+REUSE_MAX_AGE_S = 30  # A fetch older than this is not re-filtered after a radius change
+
+
+class QueryPlanner:
+    """Query boxes for one watched location, cached per radius, plus the last fetch for reuse
+
+    Boxes are the tightest ones that cover the radius (see calculate_bounding_box),
+    split in two where they cross the antimeridian. When the radius changes to one
+    the last fetch already covers (a smaller radius), that fetch can be filtered
+    again instead of spending credits on a new query.
+    """
+
+    def __init__(self, lat: float, lon: float, reuse_max_age: float = REUSE_MAX_AGE_S):
+        self.lat = lat
+        self.lon = lon
+        self.reuse_max_age = reuse_max_age
+        self._boxes = {}   # radius_km -> list of query boxes
+        self._last = None  # (radius_km, fetched_at, batch) of the last successful fetch
+
+    def boxes(self, radius_km: float) -> list[dict[str, float]]:
+        """Query boxes covering radius_km around the location"""
+        boxes = self._boxes.get(radius_km)
+        if boxes is None:
+            boxes = split_antimeridian(calculate_bounding_box(self.lat, self.lon, radius_km))
+            self._boxes[radius_km] = boxes
+        return boxes
+
+    def credits(self, radius_km: float) -> int:
+        """Credits one poll at this radius costs"""
+        return sum(credits_for_bbox(bbox) for bbox in self.boxes(radius_km))
+
+    def remember(self, radius_km: float, batch, fetched_at: float | None = None):
+        """Keep a successful fetch for reuse after a radius change"""
+        self._last = (radius_km, time.time() if fetched_at is None else fetched_at, batch)
+
+    def reusable(self, radius_km: float, now: float | None = None):
+        """The last fetch, if it covers radius_km and is recent enough
+
+        Returns:
+            (batch, fetched_at), or None if a new query is needed
+        """
+        if self._last is None:
+            return None
+        fetched_radius, fetched_at, batch = self._last
+        now = time.time() if now is None else now
+        if radius_km > fetched_radius or now - fetched_at > self.reuse_max_age:
+            return None
+        return batch, fetched_at
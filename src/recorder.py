@@ -0,0 +1,207 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from src.states_decoder import StatesBatch
+
+# Recording file: a sequence of independent frames, appended as responses arrive.
+#   frame header  magic, flags, recorded-at timestamp, payload length
+#   payload       zlib-compressed JSON: {"bbox": {...}, "time": ..., "states": [...]}
+# With FLAG_COLUMNAR the states are stored transposed ("columns": one list per
+# state-vector field), which compresses noticeably better. A crash mid-write only
+# loses the last frame; readers stop at the first incomplete one.
+FRAME_MAGIC = b'OSRF'
+FRAME_HEADER = struct.Struct('<4sBdI')
+FLAG_COLUMNAR = 1
+STATE_FIELDS = 17
+
+
+def _encode_frame(recorded_at: float, bbox: dict, data: dict, columnar: bool) -> bytes:
+    states = data.get('states')
+    payload = {'bbox': bbox, 'time': data.get('time')}
+    if columnar and states:
+        payload['columns'] = [list(col) for col in zip(*states)]
+    else:
+        payload['states'] = states
+    body = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6)
+    flags = FLAG_COLUMNAR if columnar and states else 0
+    return FRAME_HEADER.pack(FRAME_MAGIC, flags, recorded_at, len(body)) + body
+
+
+def write_frame(path: str, recorded_at: float, bbox: dict, data: dict, columnar: bool = True):
+    """Append one states response to a recording"""
+    frame = _encode_frame(recorded_at, bbox, data, columnar)
+    with open(path, 'ab') as f:
+        f.write(frame)
+
+
+def read_recording(path: str):
+    """Yield (recorded_at, bbox, data) for every complete frame in a recording"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            magic, flags, recorded_at, length = FRAME_HEADER.unpack(header)
+            if magic != FRAME_MAGIC:
+                raise ValueError(f"{path}: corrupt frame at offset {f.tell() - FRAME_HEADER.size}")
+            body = f.read(length)
+            if len(body) < length:
+                return  # Truncated last frame (recording was interrupted)
+
+            payload = json.loads(zlib.decompress(body))
+            if flags & FLAG_COLUMNAR:
+                states = [list(row) for row in zip(*payload['columns'])]
+            else:
+                states = payload['states']
+            yield recorded_at, payload['bbox'], {'time': payload['time'], 'states': states}
+
+
+class RecordingClient:
+    """Wraps an OpenSkyClient and appends every successful states response to a recording"""
+
+    def __init__(self, client, path: str, columnar: bool = True):
+        self.client = client
+        self.path = path
+        self.columnar = columnar
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Everything else (tokens, last_response, timings) comes from the real client
+        return getattr(self.client, name)
+
+    def get_aircraft_in_area(self, token: str, bbox: dict[str, float]) -> dict[str, list] | None:
+        data = self.client.get_aircraft_in_area(token, bbox)
+        if data is not None:
+            with self._lock:
+                write_frame(self.path, time.time(), bbox, data, self.columnar)
+            self.frames += 1
+        return data
+
+    def get_states(self, token: str, bbox: dict[str, float]) -> StatesBatch | None:
+        # Recording needs every field, so this parses the full response first
+        data = self.get_aircraft_in_area(token, bbox)
+        if data is None:
+            return None
+        return StatesBatch.from_states(data.get('states'), data.get('time'))
+
+
+class ReplayServer:
+    """Local stand-in for the OpenSky API that serves a recording
+
+    Point an OpenSkyClient at url / token_url and the real network code
+    path (session, gzip-less JSON, status handling) is exercised offline.
+
+    speed: 1.0 replays in real time (each request gets the frame that was
+    current at the same offset into the recording), 10.0 runs ten times
+    faster, 0 serves the next frame on every request (as fast as possible).
+    The server answers 404 once the recording is exhausted.
+    """
+
+    def __init__(self, path: str, speed: float = 0, host: str = '127.0.0.1', port: int = 0):
+        self.frames = list(read_recording(path))
+        if not self.frames:
+            raise ValueError(f"{path} has no frames")
+        self.speed = speed
+        self._next = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def _send_json(self, status: int, obj):
+                body = json.dumps(obj).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._send_json(200, {'access_token': 'replay-token', 'expires_in': 1800, 'token_type': 'Bearer'})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/api/states/all':
+                    self._send_json(404, {'error': 'not found'})
+                    return
+                data = replay.next_frame()
+                if data is None:
+                    self._send_json(404, {'error': 'recording exhausted'})
+                    return
+                self._send_json(200, data)
+
+            def log_message(self, *args):
+                pass  # Keep the console for the monitor's own output
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/api"
+        self.token_url = f"http://{host}:{self.server.server_address[1]}/token"
+
+    @property
+    def first_bbox(self) -> dict[str, float]:
+        return self.frames[0][1]
+
+    def next_frame(self) -> dict | None:
+        with self._lock:
+            if self.speed <= 0:
+                if self._next >= len(self.frames):
+                    return None
+                frame = self.frames[self._next]
+                self._next += 1
+                return frame[2]
+
+            # Real time (scaled): newest frame recorded at or before the replay clock
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            replay_at = self.frames[0][0] + (now - self._started) * self.speed
+            while self._next + 1 < len(self.frames) and self.frames[self._next + 1][0] <= replay_at:
+                self._next += 1
+            if replay_at > self.frames[-1][0] + 60:
+                return None
+            return self.frames[self._next][2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='replay-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def recording_info(path: str) -> dict:
+    """Summary of a recording: frame count, time span, aircraft and compression"""
+    frames = list(read_recording(path))
+    aircraft = [len(data['states'] or []) for _, _, data in frames]
+    raw_bytes = sum(len(json.dumps(data['states'])) for _, _, data in frames)
+    return {
+        'frames': len(frames),
+        'duration_s': frames[-1][0] - frames[0][0] if frames else 0,
+        'aircraft_total': sum(aircraft),
+        'aircraft_max': max(aircraft, default=0),
+        'file_bytes': os.path.getsize(path),
+        'json_bytes': raw_bytes
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[1] != 'info':
+        print("Usage: python -m src.recorder info <recording.osrec>")
+        sys.exit(1)
+    for key, value in recording_info(sys.argv[2]).items():
+        print(f"{key:>15}: {value}")
@@ -0,0 +1,172 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.location import haversine_km
+
+DAILY_CREDIT_BUDGET = 4000  # OpenSky OAuth accounts, resets at 00:00 UTC
+
+# Traffic levels reported by traffic_level(), mapped to interval multipliers
+BUSY = 'busy'        # Something is heading for the radius, poll faster
+NORMAL = 'normal'    # Aircraft around but nothing inbound
+QUIET = 'quiet'      # Empty sky, poll slower
+TRAFFIC_FACTORS = {BUSY: 0.5, NORMAL: 1.0, QUIET: 2.0}
+
+QUIET_HOURS_FACTOR = 3.0
+INBOUND_ANGLE_DEG = 60  # Track within this many degrees of the bearing to the user counts as inbound
+
+
+def traffic_level(lats: np.ndarray, lons: np.ndarray, tracks: np.ndarray,
+                  user_lat: float, user_lon: float, radius_km: float) -> str:
+    """Classify the traffic around the user from one batch of positions
+
+    Args:
+        lats, lons: Aircraft positions (NaN if unknown)
+        tracks: Aircraft true track in degrees (NaN if unknown)
+        user_lat, user_lon: Watched location
+        radius_km: Notification radius
+
+    Returns:
+        BUSY, NORMAL or QUIET
+    """
+    with np.errstate(invalid='ignore'):
+        known = ~(np.isnan(lats) | np.isnan(lons))
+        if not known.any():
+            return QUIET
+
+        dist_km = haversine_km(lats, lons, user_lat, user_lon)
+        outside = known & (dist_km > radius_km)
+
+        # Initial bearing from each aircraft to the user
+        lat1, lat2 = np.radians(lats), np.radians(user_lat)
+        dlon = np.radians(user_lon - lons)
+        bearing = np.degrees(np.arctan2(
+            np.sin(dlon) * np.cos(lat2),
+            np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+        )) % 360
+
+        off_course = np.abs((tracks - bearing + 180) % 360 - 180)
+        inbound = outside & (off_course <= INBOUND_ANGLE_DEG)
+
+    return BUSY if inbound.any() else NORMAL
+
+
+class PollScheduler:
+    """Picks the next poll interval while keeping OpenSky credit spend within a daily budget"""
+
+    def __init__(self, daily_budget: int = DAILY_CREDIT_BUDGET, base_interval: float = 15,
+                 min_interval: float = 5, max_interval: float = 300,
+                 quiet_hours: tuple[int, int] | None = (0, 6), max_backoff: float = 600):
+        """
+        Args:
+            daily_budget: Credits allowed per UTC day
+            base_interval: Interval for normal traffic, in seconds
+            min_interval: Never poll faster than this
+            max_interval: Never poll slower than this (except budget exhaustion and backoff)
+            quiet_hours: (start, end) local hours that get polled less, or None
+            max_backoff: Cap for the error backoff interval
+        """
+        self.daily_budget = daily_budget
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.quiet_hours = quiet_hours
+        self.max_backoff = max_backoff
+
+        self.credits_today = 0
+        self.day = self._utc_day()
+        self.consecutive_errors = 0
+        self.retry_after = None
+        self.credits_per_poll = 1  # Credits one full poll cycle costs, set by the loop
+        self.interval = base_interval
+        self.level = NORMAL
+
+    @staticmethod
+    def _utc_day():
+        return datetime.now(timezone.utc).date()
+
+    @staticmethod
+    def _seconds_until_reset() -> float:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        return (midnight - now).total_seconds()
+
+    def _roll_day(self):
+        """Reset the spend counter when the UTC day changes"""
+        today = self._utc_day()
+        if today != self.day:
+            self.day = today
+            self.credits_today = 0
+
+    def _in_quiet_hours(self) -> bool:
+        if not self.quiet_hours:
+            return False
+        start, end = self.quiet_hours
+        hour = datetime.now().hour
+        return start <= hour < end if start <= end else (hour >= start or hour < end)
+
+    def record_response(self, credits: int, status: int | None, retry_after: float | None = None):
+        """Record the outcome of one API request
+
+        Args:
+            credits: Credits the request costs when it succeeds
+            status: HTTP status code (None if the request never got a response)
+            retry_after: Seconds the server asked us to wait, if any
+        """
+        self._roll_day()
+
+        if status == 200:
+            self.credits_today += credits
+            self.consecutive_errors = 0
+            self.retry_after = None
+        elif status is None or status == 429 or status >= 500:
+            # Rate limited, server trouble or no connection: back off
+            self.consecutive_errors += 1
+            self.retry_after = retry_after
+
+    def budget_interval(self) -> float:
+        """Shortest interval that keeps the rest of today's polls within budget"""
+        remaining = self.daily_budget - self.credits_today
+        if remaining <= 0:
+            return self._seconds_until_reset()  # Out of credits, wait for the reset
+        return self._seconds_until_reset() / (remaining / self.credits_per_poll)
+
+    def next_interval(self, level: str = NORMAL) -> float:
+        """Seconds to wait before the next poll
+
+        Args:
+            level: Traffic level from the last poll (BUSY, NORMAL, QUIET)
+        """
+        self._roll_day()
+        self.level = level
+
+        if self.consecutive_errors:
+            # Exponential backoff with jitter, or whatever the server asked for
+            backoff = min(self.max_backoff, self.base_interval * 2 ** self.consecutive_errors)
+            backoff *= random.uniform(0.8, 1.2)
+            self.interval = max(backoff, self.retry_after or 0)
+            return self.interval
+
+        interval = self.base_interval * TRAFFIC_FACTORS[level]
+        if level != BUSY and self._in_quiet_hours():
+            interval *= QUIET_HOURS_FACTOR
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        # Budget always wins. Busy periods may poll at up to twice the budget
+        # pace; the pace is recomputed from what is left, so later polls slow down to pay it back.
+        budget_floor = self.budget_interval()
+        if level == BUSY and self.credits_today < self.daily_budget:
+            budget_floor *= 0.5
+        self.interval = max(interval, budget_floor)
+        return self.interval
+
+    def projected_daily_spend(self) -> int:
+        """Credits spent today plus what the current interval would spend until the reset"""
+        upcoming = self._seconds_until_reset() / self.interval * self.credits_per_poll
+        return int(self.credits_today + upcoming)
+
+    def publish(self, state):
+        """Expose scheduler numbers in shared state for the tray"""
+        state.update(poll_interval=self.interval, credits_today=self.credits_today,
+                     projected_daily_spend=self.projected_daily_spend(), daily_budget=self.daily_budget)
@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+
+from src.aircraft_db import icao24_to_int
+
+QUIET_PERIOD_S = 30 * 60  # Out of range this long, then back = new arrival
+MAX_TRACKED = 20_000      # Hard memory bound
+
+
+class SeenAircraftTracker:
+    """Remembers which aircraft were recently in range, keyed by 24-bit icao24 ints
+
+    Entries are kept in an OrderedDict ordered by last-seen time: seeing an
+    aircraft moves it to the end, so the oldest entries are always at the
+    front and expiry just pops from the front (O(1) amortized). An aircraft
+    that stays away for quiet_period and then returns counts as new again.
+    """
+
+    def __init__(self, quiet_period: float = QUIET_PERIOD_S, max_size: int = MAX_TRACKED):
+        self.quiet_period = quiet_period
+        self.max_size = max_size
+        self._last_seen = OrderedDict()  # icao24 int -> last seen time
+
+    @staticmethod
+    def _key(icao24) -> int | str:
+        """24-bit int for normal hex codes, the string itself for anything odd"""
+        if isinstance(icao24, int):
+            return icao24
+        key = icao24_to_int(icao24)
+        return icao24 if key is None else key
+
+    def expire(self, now: float | None = None):
+        """Drop aircraft not seen for quiet_period, and the oldest beyond max_size"""
+        now = time.time() if now is None else now
+        cutoff = now - self.quiet_period
+        last_seen = self._last_seen
+        while last_seen:
+            key, seen_at = next(iter(last_seen.items()))
+            if seen_at > cutoff and len(last_seen) <= self.max_size:
+                break
+            last_seen.popitem(last=False)
+
+    def observe(self, icao24, now: float | None = None) -> bool:
+        """Record that an aircraft is in range
+
+        Returns:
+            True if it is new (never seen, or back after the quiet period)
+        """
+        now = time.time() if now is None else now
+        key = self._key(icao24)
+        self.expire(now)
+        is_new = key not in self._last_seen
+        self._last_seen[key] = now
+        self._last_seen.move_to_end(key)
+        if len(self._last_seen) > self.max_size:
+            self._last_seen.popitem(last=False)  # Oldest goes, never the one just added
+        return is_new
+
+    def add(self, icao24, now: float | None = None):
+        """Mark an aircraft as seen (e.g. after a predicted entry was notified)"""
+        self.observe(icao24, now)
+
+    def export(self) -> tuple[list[int], list[float]]:
+        """icao24 ints and last-seen times, oldest first (for snapshots, odd string keys are left out)"""
+        keys, times = [], []
+        for key, seen_at in self._last_seen.items():
+            if isinstance(key, int):
+                keys.append(key)
+                times.append(seen_at)
+        return keys, times
+
+    def restore(self, keys, times, now: float | None = None):
+        """Re-add exported entries (oldest first), e.g. after a restart; call before the first poll"""
+        for key, seen_at in zip(keys, times):
+            self._last_seen[key] = seen_at
+            self._last_seen.move_to_end(key)
+        self.expire(now)
+
+    def __contains__(self, icao24) -> bool:
+        key = self._key(icao24)
+        seen_at = self._last_seen.get(key)
+        return seen_at is not None and seen_at > time.time() - self.quiet_period
+
+    def __len__(self):
+        return len(self._last_seen)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+
+
+class SharedState:
+    """State shared between the monitor, tray, dispatcher and token threads
+
+    Reads and writes go through one lock, so a reader never sees a half
+    applied update, and snapshot() gives the tray a consistent copy of
+    everything at once. Every write wakes threads blocked in wait_for() /
+    wait_until() and calls the listeners (how the asyncio pipeline gets
+    woken), so a tray click reaches the monitor loop right away instead of
+    after its next sleep.
+    """
+
+    def __init__(self, **values):
+        self._values = values
+        self._cond = threading.Condition()
+        self._listeners = []
+        self.version = 0  # Bumped by every write
+
+    def __getitem__(self, key):
+        with self._cond:
+            return self._values[key]
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __contains__(self, key) -> bool:
+        with self._cond:
+            return key in self._values
+
+    def get(self, key, default=None):
+        with self._cond:
+            return self._values.get(key, default)
+
+    def pop(self, key, default=None):
+        with self._cond:
+            return self._values.pop(key, default)
+
+    def _changed(self):
+        """Call with the lock held"""
+        self.version += 1
+        self._cond.notify_all()
+
+    def _notify_listeners(self):
+        for callback in list(self._listeners):
+            callback()
+
+    def update(self, values: dict | None = None, **kwargs):
+        """Set several keys at once, readers see all of them change together"""
+        with self._cond:
+            if values:
+                self._values.update(values)
+            self._values.update(kwargs)
+            self._changed()
+        self._notify_listeners()
+
+    def increment(self, key, amount=1):
+        """Atomic += (e.g. credits spent, written from more than one thread)"""
+        with self._cond:
+            value = self._values[key] = self._values[key] + amount
+            self._changed()
+        self._notify_listeners()
+        return value
+
+    def append(self, key, item):
+        """Append to a list/deque value (e.g. recent flights) without racing readers"""
+        with self._cond:
+            self._values[key].append(item)
+            self._changed()
+        self._notify_listeners()
+
+    def snapshot(self) -> dict:
+        """Copy of every value, containers copied too so they can be iterated freely"""
+        with self._cond:
+            snap = {}
+            for key, value in self._values.items():
+                if isinstance(value, deque):
+                    value = list(value)
+                elif isinstance(value, (set, list, dict)):
+                    value = value.copy()
+                snap[key] = value
+            return snap
+
+    def wait_for(self, predicate, timeout: float | None = None) -> bool:
+        """Block until predicate(values) is true or timeout passes, returns the predicate's last value
+
+        The predicate gets the plain values dict and runs with the lock held,
+        so it should only read.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: predicate(self._values), timeout)
+
+    def wait_until(self, deadline: float, predicate=None) -> bool:
+        """Sleep until deadline (a time.time() value), returns True if predicate(values) ended it early"""
+        remaining = deadline - time.time()
+        if predicate is None:
+            if remaining > 0:
+                time.sleep(remaining)
+            return False
+        return bool(self.wait_for(predicate, max(remaining, 0)))
+
+    def add_listener(self, callback):
+        """callback() runs on the writing thread after every change"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+
+def halted(values) -> bool:
+    """Predicate for the loops' sleeps: paused or exiting"""
+    return values['paused'] or values['exiting']
+
+
+def woken(radius_km: float):
+    """Predicate for the loops' sleeps: radius changed, paused or exiting"""
+    return lambda values: values['radius_km'] != radius_km or halted(values)
+
+
+def resumed(values) -> bool:
+    """Predicate for a paused loop"""
+    return not values['paused'] or values['exiting']
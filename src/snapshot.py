@@ -0,0 +1,259 @@
+import argparse
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+# Snapshot file: what the monitor needs to carry on after a restart.
+#   header  magic, version, tracker count, recent flight count, saved-at timestamp,
+#           UTC day (ordinal) the credit count belongs to, credits spent that day, tokens used
+#   body    zlib-compressed: per seen-aircraft tracker its name, entry count, icao24s
+#           (uint32) and seconds since each was last seen (float32), oldest first;
+#           then the recent flights as length-prefixed UTF-8 (display, callsign)
+# Written to a temporary file and renamed over the old one, so a crash mid-write
+# leaves the previous snapshot in place.
+SNAPSHOT_MAGIC = b'FTSS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHHHdIII')
+SNAPSHOT_INTERVAL_S = 60
+_LENGTH = struct.Struct('<H')
+_COUNT = struct.Struct('<I')
+
+# trackers: name -> (icao24 ints, last-seen times), '' for the single-location loop
+Snapshot = namedtuple('Snapshot', ['saved_at', 'day', 'credits_today', 'tokens_used', 'trackers', 'recent'])
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode('utf-8')[:0xFFFF]
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_str(body: bytes, offset: int) -> tuple[str, int]:
+    (length,) = _LENGTH.unpack_from(body, offset)
+    offset += _LENGTH.size
+    return body[offset:offset + length].decode('utf-8', 'replace'), offset + length
+
+
+def encode_snapshot(snapshot: Snapshot) -> bytes:
+    parts = []
+    for name, (keys, times) in snapshot.trackers.items():
+        ages = snapshot.saved_at - np.asarray(times, dtype=np.float64)
+        parts.append(_pack_str(name))
+        parts.append(_COUNT.pack(len(keys)))
+        parts.append(np.asarray(keys, dtype='<u4').tobytes())
+        parts.append(ages.astype('<f4').tobytes())
+    for display, callsign in snapshot.recent:
+        parts.append(_pack_str(display))
+        parts.append(_pack_str(callsign))
+
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(snapshot.trackers), len(snapshot.recent),
+                                  snapshot.saved_at, snapshot.day, snapshot.credits_today, snapshot.tokens_used)
+    return header + zlib.compress(b''.join(parts), 1)
+
+
+def decode_snapshot(data: bytes) -> Snapshot:
+    """Raises ValueError for anything that isn't a complete snapshot of this version"""
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise ValueError("truncated snapshot")
+    (magic, version, ntrackers, nrecent, saved_at, day,
+     credits_today, tokens_used) = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"not a runtime snapshot (version {SNAPSHOT_VERSION})")
+
+    try:
+        body = zlib.decompress(data[SNAPSHOT_HEADER.size:])
+        offset = 0
+        trackers = {}
+        for _ in range(ntrackers):
+            name, offset = _unpack_str(body, offset)
+            (count,) = _COUNT.unpack_from(body, offset)
+            offset += _COUNT.size
+            keys = np.frombuffer(body, '<u4', count, offset)
+            offset += keys.nbytes
+            ages = np.frombuffer(body, '<f4', count, offset)
+            offset += ages.nbytes
+            trackers[name] = (keys.tolist(), (saved_at - ages.astype(np.float64)).tolist())
+
+        recent = []
+        for _ in range(nrecent):
+            display, offset = _unpack_str(body, offset)
+            callsign, offset = _unpack_str(body, offset)
+            recent.append((display, callsign))
+    except (zlib.error, struct.error, ValueError) as e:
+        raise ValueError(f"corrupt snapshot: {e}")
+
+    return Snapshot(saved_at, day, credits_today, tokens_used, trackers, recent)
+
+
+def write_snapshot(path: str, data: bytes):
+    """Atomically replace the snapshot file (synced, so it survives a reboot too)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Snapshot | None:
+    """The snapshot at path, None if there isn't one"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return decode_snapshot(data)
+
+
+class RuntimeSnapshots:
+    """Periodic snapshots of the monitor's runtime state, restored at the next start
+
+    Keeps what a restart would otherwise lose: which aircraft were already
+    notified (the ones still overhead aren't notified again), credits spent
+    today (the scheduler keeps pacing the daily budget), the token counter
+    and the recent flights. The access token itself is already cached by
+    TokenManager.
+
+    tick() is called by the monitor loop after each poll, so the trackers
+    are copied on the only thread that changes them; compressing and
+    writing happen on a writer thread.
+    """
+
+    def __init__(self, path: str, state, scheduler, trackers: dict, interval: float = SNAPSHOT_INTERVAL_S):
+        """
+        Args:
+            path: Snapshot file
+            state: SharedState ('tokens_used', 'recent_flights')
+            scheduler: PollScheduler whose credits_today is kept
+            trackers: name -> SeenAircraftTracker ('' for the single-location loop)
+            interval: Seconds between snapshots
+        """
+        self.path = path
+        self.state = state
+        self.scheduler = scheduler
+        self.trackers = trackers
+        self.interval = interval
+        self.saves = 0
+        self.last_size = None
+        self.last_write_ms = None
+
+        self._due_at = time.time() + interval
+        self._pending = None  # Latest captured snapshot the writer hasn't written yet
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def capture(self) -> Snapshot:
+        """Copy the current state (on the monitor thread, or once it has stopped)"""
+        recent = self.state.snapshot()['recent_flights']
+        return Snapshot(
+            time.time(),
+            self.scheduler.day.toordinal(),
+            self.scheduler.credits_today,
+            self.state['tokens_used'],
+            {name: tracker.export() for name, tracker in self.trackers.items()},
+            [(flight['display'], flight['callsign']) for flight in recent]
+        )
+
+    def restore(self, now: float | None = None) -> bool:
+        """Load the last snapshot into the trackers, scheduler and shared state (before monitoring starts)
+
+        Returns:
+            True if a snapshot was restored
+        """
+        try:
+            snapshot = read_snapshot(self.path)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not read runtime snapshot {self.path}: {e}")
+            return False
+        if snapshot is None:
+            return False
+
+        now = time.time() if now is None else now
+        remembered = 0
+        for name, (keys, times) in snapshot.trackers.items():
+            tracker = self.trackers.get(name)
+            if tracker is not None:
+                tracker.restore(keys, times, now)  # Aircraft gone longer than the quiet period expire here
+                remembered += len(tracker)
+
+        if snapshot.day == self.scheduler.day.toordinal():
+            self.scheduler.credits_today = snapshot.credits_today  # Same UTC day, the budget keeps counting
+        self.state['tokens_used'] = snapshot.tokens_used
+        for display, callsign in snapshot.recent:  # Exactly as the tray showed them
+            self.state.append('recent_flights', {'display': display, 'callsign': callsign})
+
+        print(f"Restored state from {(now - snapshot.saved_at) / 60:.0f} min ago: {remembered} aircraft already "
+              f"notified, {self.scheduler.credits_today} credits spent today")
+        return True
+
+    def tick(self, now: float | None = None):
+        """Capture a snapshot if one is due, call from the monitor thread after a poll"""
+        now = time.time() if now is None else now
+        if now < self._due_at:
+            return
+        self._due_at = now + self.interval
+        snapshot = self.capture()
+        with self._lock:
+            self._pending = snapshot
+        self._wake.set()
+
+    def save(self):
+        """Capture and write right away on this thread (at exit, once the monitor and writer stopped)"""
+        self._write(self.capture())
+
+    def _write(self, snapshot: Snapshot):
+        start = time.perf_counter()
+        try:
+            data = encode_snapshot(snapshot)
+            write_snapshot(self.path, data)
+        except OSError as e:
+            print(f"WARNING: Could not save runtime snapshot: {e}")
+            return
+        self.saves += 1
+        self.last_size = len(data)
+        self.last_write_ms = (time.perf_counter() - start) * 1000
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                snapshot, self._pending = self._pending, None
+            if snapshot is not None:
+                self._write(snapshot)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='runtime-snapshots', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Stop the writer thread (a snapshot being written is finished first)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show what a runtime snapshot holds")
+    parser.add_argument('path')
+    args = parser.parse_args()
+
+    snapshot = read_snapshot(args.path)
+    if snapshot is None:
+        raise SystemExit(f"{args.path} not found")
+    print(f"Saved {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.saved_at))}, "
+          f"{os.path.getsize(args.path):,} bytes")
+    print(f"Credits spent {date.fromordinal(snapshot.day)} (UTC): {snapshot.credits_today}, "
+          f"tokens used: {snapshot.tokens_used}")
+    for name, (keys, _) in snapshot.trackers.items():
+        print(f"Seen aircraft{f' ({name})' if name else ''}: {len(keys)}")
+    print(f"Recent flights: {', '.join(display for display, _ in snapshot.recent) or 'none'}")
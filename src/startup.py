@@ -0,0 +1,144 @@
+import threading
+import time
+
+from src.metrics import METRICS
+
+
+class StartupStep:
+    """One startup step running on its own daemon thread"""
+
+    def __init__(self, name: str, func, *args):
+        self.name = name
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, args=(func, args), name=f"startup-{name}", daemon=True)
+
+    def _run(self, func, args):
+        start = time.perf_counter()
+        try:
+            self.result = func(*args)
+        except Exception as e:
+            self.error = e
+        self.seconds = time.perf_counter() - start
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None):
+        """Block until the step finished and return its result (re-raises its exception)"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Startup step {self.name} still running after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def on_done(self, callback):
+        """Call callback(step) on the step's thread when it finishes (right away if it already has)"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+
+class StartupOrchestrator:
+    """Runs the independent startup steps (token, location, database) at the same time
+
+    Each step gets a daemon thread, so a slow database compile never keeps
+    the app from exiting. The caller waits only for the steps it needs
+    before starting the monitor and tray, the rest finish in the background.
+    """
+
+    def __init__(self, started_at: float | None = None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.steps = {}
+
+    def start(self, name: str, func, *args) -> StartupStep:
+        step = StartupStep(name, func, *args).start()
+        self.steps[name] = step
+        return step
+
+    def wait(self, name: str, timeout: float | None = None):
+        return self.steps[name].wait(timeout)
+
+    def elapsed(self) -> float:
+        """Seconds since the process started"""
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        """Step durations so far, e.g. 'token 0.4s, location 0.2s, database running'"""
+        parts = []
+        for name, step in self.steps.items():
+            if not step.done():
+                parts.append(f"{name} running")
+            elif step.error is not None:
+                parts.append(f"{name} failed")
+            else:
+                parts.append(f"{name} {step.seconds:.1f}s")
+        return ', '.join(parts)
+
+
+class DeferredDatabase:
+    """Stands in for the AircraftDatabase while it loads in the background
+
+    Lookups return None (no enrichment, the callsign airline fallback still
+    works) until set() hands over the loaded database. Reading one attribute
+    keeps the switch-over atomic for the monitor thread.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.ready = threading.Event()
+
+    def set(self, db):
+        self.db = db
+        self.ready.set()
+
+    @property
+    def version(self) -> int:
+        """0 while loading, then the database's own version (bumped by every update)"""
+        db = self.db
+        return db.version if db is not None else 0
+
+    def __len__(self):
+        db = self.db
+        return len(db) if db is not None else 0
+
+    def lookup_record(self, icao24: str):
+        db = self.db
+        return db.lookup_record(icao24) if db is not None else None
+
+    def peek_record(self, icao24: str):
+        db = self.db
+        return db.peek_record(icao24) if db is not None else None
+
+    def lookup(self, icao24: str) -> dict | None:
+        db = self.db
+        return db.lookup(icao24) if db is not None else None
+
+
+def report_first_poll(state):
+    """Print the time from process start to the first completed poll, once
+
+    The start time is the 'started_at' perf_counter() value main.py puts in
+    the shared state, popped here so later polls pay one dict lookup.
+    """
+    started_at = state.pop('started_at', None)
+    if started_at is None:
+        return
+    seconds = time.perf_counter() - started_at
+    METRICS.set('time_to_first_poll_seconds', seconds)
+    print(f"[First poll {seconds:.1f}s after startup]")
@@ -0,0 +1,149 @@
+import math
+from operator import itemgetter
+
+import numpy as np
+
+from src.metrics import METRICS
+
+try:
+    from orjson import loads as _loads  # Optional, several times faster than json on big responses
+except ImportError:
+    from json import loads as _loads
+
+# Positions of the fields we use in an OpenSky state vector
+# https://openskynetwork.github.io/opensky-api/rest.html#all-state-vectors
+ICAO24, CALLSIGN, TIME_POSITION, LONGITUDE, LATITUDE = 0, 1, 3, 5, 6
+BARO_ALTITUDE, ON_GROUND, VELOCITY, TRUE_TRACK = 7, 8, 9, 10
+
+
+def loads(body: bytes | str):
+    """Parse JSON with orjson when it's installed, the json module otherwise"""
+    return _loads(body)
+
+
+def _float(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+class StateVector:
+    """The fields of one aircraft the monitor uses (attribute access instead of state_vec[6])"""
+    __slots__ = ('icao24', 'callsign', 'time_position', 'lat', 'lon', 'altitude', 'on_ground', 'velocity', 'track')
+
+    def __init__(self, icao24, callsign, time_position, lat, lon, altitude, on_ground, velocity, track):
+        self.icao24 = icao24
+        self.callsign = callsign
+        self.time_position = time_position
+        self.lat = lat
+        self.lon = lon
+        self.altitude = altitude
+        self.on_ground = on_ground
+        self.velocity = velocity
+        self.track = track
+
+    def __repr__(self):
+        return f"StateVector({self.icao24!r}, {self.callsign!r}, lat={self.lat}, lon={self.lon})"
+
+
+class StatesBatch:
+    """One states/all response stored as columns, only the fields the monitor uses
+
+    lats, lons and tracks are float arrays (NaN where unknown) that go straight
+    into the radius filter and traffic classification. The other columns are
+    tuples, read per aircraft when a notification is built. The row lists the
+    JSON parser produced are dropped as soon as the columns exist.
+    """
+    __slots__ = ('time', 'icao24', 'callsign', 'time_position', 'altitude', 'on_ground', 'velocity',
+                 'lats', 'lons', 'tracks')
+
+    def __init__(self, time, icao24, callsign, time_position, altitude, on_ground, velocity, lats, lons, tracks):
+        self.time = time
+        self.icao24 = icao24
+        self.callsign = callsign
+        self.time_position = time_position
+        self.altitude = altitude
+        self.on_ground = on_ground
+        self.velocity = velocity
+        self.lats = lats
+        self.lons = lons
+        self.tracks = tracks
+
+    @classmethod
+    def from_states(cls, states: list[list] | None, time: float | None = None) -> 'StatesBatch':
+        """Build a batch from state vector lists (a parsed response, a recording, a simulation)"""
+        if not states:
+            empty = np.empty(0, dtype=float)
+            return cls(time, (), (), (), (), (), (), empty, empty, empty)
+
+        # One C-level pass per column we keep, the other 8 fields are never copied
+        def column(field):
+            return tuple(map(itemgetter(field), states))
+
+        return cls(
+            time,
+            column(ICAO24),
+            column(CALLSIGN),
+            column(TIME_POSITION),
+            column(BARO_ALTITUDE),
+            column(ON_GROUND),
+            column(VELOCITY),
+            np.array(column(LATITUDE), dtype=float),  # None becomes NaN
+            np.array(column(LONGITUDE), dtype=float),
+            np.array(column(TRUE_TRACK), dtype=float)
+        )
+
+    @classmethod
+    def concat(cls, batches: list['StatesBatch']) -> 'StatesBatch':
+        """Merge batches (e.g. overlapping query regions), one row per aircraft, the last one wins"""
+        batches = [batch for batch in batches if len(batch)]
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls.from_states(None)
+
+        latest = {}
+        offset = 0
+        for batch in batches:
+            for index, icao24 in enumerate(batch.icao24):
+                latest[icao24] = offset + index
+            offset += len(batch)
+        keep = list(latest.values())
+
+        def column(name):
+            merged = [value for batch in batches for value in getattr(batch, name)]
+            return tuple(merged[i] for i in keep)
+
+        return cls(
+            max(batch.time or 0 for batch in batches),
+            column('icao24'), column('callsign'), column('time_position'),
+            column('altitude'), column('on_ground'), column('velocity'),
+            np.concatenate([batch.lats for batch in batches])[keep],
+            np.concatenate([batch.lons for batch in batches])[keep],
+            np.concatenate([batch.tracks for batch in batches])[keep]
+        )
+
+    def __len__(self):
+        return len(self.icao24)
+
+    def vector(self, index: int) -> StateVector:
+        """One aircraft as a StateVector"""
+        return StateVector(
+            self.icao24[index],
+            self.callsign[index],
+            self.time_position[index],
+            _float(float(self.lats[index])),
+            _float(float(self.lons[index])),
+            self.altitude[index],
+            self.on_ground[index],
+            self.velocity[index],
+            _float(float(self.tracks[index]))
+        )
+
+
+def decode_states(body: bytes | str) -> StatesBatch:
+    """Parse a states/all response body into a StatesBatch
+
+    An empty sky ("states": null) gives an empty batch.
+    """
+    with METRICS.timer('decode_seconds'):
+        data = loads(body)
+        return StatesBatch.from_states(data.get('states'), data.get('time'))
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+
+from src.opensky import OpenSkyAuthError
+
+# Cached token lives next to .env in the project root
+TOKEN_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.opensky_token.json')
+
+DEFAULT_EXPIRES_IN = 1800   # Used only if the auth response leaves out expires_in
+REFRESH_MARGIN_S = 120      # Refresh this long before the token expires
+MIN_REMAINING_S = 60        # Don't reuse a cached token with less life than this left
+RETRY_BASE_S = 5
+RETRY_MAX_S = 300
+
+
+class TokenManager:
+    """Keeps a valid OpenSky token available without ever blocking the poll loop
+
+    A background thread refreshes the token REFRESH_MARGIN_S before it
+    expires (using expires_in from the auth response), retrying with
+    exponential backoff on failure instead of exiting. The current token
+    is cached on disk so a restart within its lifetime skips re-authenticating.
+    """
+
+    def __init__(self, client, state=None, cache_path: str | None = TOKEN_CACHE_PATH,
+                 refresh_margin: float = REFRESH_MARGIN_S):
+        """
+        Args:
+            client: OpenSkyClient used for the token requests
+            state: SharedState, 'token' and 'token_expires_at' are kept in sync
+            cache_path: Where to cache the token across restarts (None to disable)
+            refresh_margin: Seconds before expiry to refresh
+        """
+        self.client = client
+        self.state = state
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+
+        self.token = None
+        self.expires_at = 0.0
+        self.failures = 0
+        self.error = None  # OpenSkyAuthError that ended startup (fatal, before any token)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()   # Set to refresh right away
+        self._ready = threading.Event()  # Set once any valid token is available
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load the cached token (if still valid) and start the refresh thread"""
+        self._load_cache()
+        self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Block until a token is available (only meant for startup)
+
+        Returns:
+            False if timeout passed first
+
+        Raises:
+            OpenSkyAuthError: The first token failed with a fatal error (bad or missing credentials)
+        """
+        if not self._ready.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def get_token(self) -> str | None:
+        """Current token, never blocks. None until the first token arrives."""
+        with self._lock:
+            return self.token
+
+    def invalidate(self):
+        """The API rejected the token (401), refresh it now in the background"""
+        with self._lock:
+            self.expires_at = 0.0
+        self._wake.set()
+
+    def _set_token(self, token: str, expires_at: float):
+        with self._lock:
+            self.token = token
+            self.expires_at = expires_at
+        if self.state is not None:
+            self.state.update(token=token, token_expires_at=expires_at)  # Wakes a loop waiting for its first token
+        self._ready.set()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get('expires_at', 0) - time.time() > MIN_REMAINING_S:
+            print(f"Using cached token (valid for {(cached['expires_at'] - time.time()) / 60:.0f} more minutes)")
+            self._set_token(cached['access_token'], cached['expires_at'])
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            # Owner-only permissions, it's a credential
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'access_token': self.token, 'expires_at': self.expires_at}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"WARNING: Could not cache token: {e}")
+
+    def _refresh(self) -> bool:
+        """Fetch a new token, True on success"""
+        try:
+            token_data = self.client.fetch_token()
+        except OpenSkyAuthError as e:
+            if e.fatal and self.get_token() is None:
+                # Never had a token and retrying won't help: fail startup instead of hanging
+                self.error = e
+                self._stop.set()
+                self._ready.set()
+                return False
+            print(f"ERROR: {e}")
+            if e.fatal:
+                print("Token refresh will keep retrying, fix the credentials in .env")
+            return False
+
+        expires_in = token_data.get('expires_in') or DEFAULT_EXPIRES_IN
+        self._set_token(token_data['access_token'], time.time() + expires_in)
+        self._save_cache()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                refresh_at = self.expires_at - self.refresh_margin
+
+            delay = refresh_at - time.time()
+            if delay > 0:
+                # Sleep until it's time to refresh (or invalidate()/stop() wakes us)
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+
+            if self._refresh():
+                self.failures = 0
+            elif self.error is not None:
+                return  # Startup failed, wait_ready() reports it
+            else:
+                # Exponential backoff; the old token keeps being handed out meanwhile
+                self.failures += 1
+                backoff = min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (self.failures - 1))
+                print(f"Retrying token refresh in {backoff}s")
+                self._wake.wait(backoff)
+                self._wake.clear()
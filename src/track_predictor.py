@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+from src.states_decoder import StateVector
+
+KM_PER_DEG_LAT = 111.32
+MAX_EXTRAPOLATION_S = 180  # Don't trust a straight line for longer than this
+STALE_TRACK_S = 300        # Forget aircraft not reported for this long
+
+
+class TrackPredictor:
+    """Keeps per-aircraft kinematics across polls and predicts radius entries between them
+
+    Positions are extrapolated in a straight line from the last reported
+    position, speed and true track (dead reckoning). Turns and speed changes
+    between polls are not modelled, so predictions are limited to
+    MAX_EXTRAPOLATION_S after the last position report.
+    """
+
+    def __init__(self, max_extrapolation: float = MAX_EXTRAPOLATION_S, stale_after: float = STALE_TRACK_S):
+        self.max_extrapolation = max_extrapolation
+        self.stale_after = stale_after
+        # icao24 -> (lat, lon, time_position, velocity m/s, true track deg, callsign, altitude m)
+        self.tracks = {}
+
+    def update(self, batch, now: float):
+        """Store the latest kinematics from a StatesBatch"""
+        tracks = self.tracks
+        for icao24, lat, lon, time_position, velocity, heading, on_ground, callsign, altitude in zip(
+                batch.icao24, batch.lats.tolist(), batch.lons.tolist(), batch.time_position, batch.velocity,
+                batch.tracks.tolist(), batch.on_ground, batch.callsign, batch.altitude):
+            if on_ground or velocity is None or math.isnan(lat) or math.isnan(lon) or math.isnan(heading):
+                continue  # Need a position and a vector, and aircraft on the ground don't cross radii
+            tracks[icao24] = (lat, lon, time_position or now, velocity, heading, callsign, altitude)
+
+        # Drop aircraft that stopped reporting
+        stale = [icao24 for icao24, track in self.tracks.items() if now - track[2] > self.stale_after]
+        for icao24 in stale:
+            del self.tracks[icao24]
+
+    def predict_position(self, icao24: str, at: float) -> tuple[float, float] | None:
+        """Extrapolated (lat, lon) of an aircraft at a given time"""
+        track = self.tracks.get(icao24)
+        if track is None:
+            return None
+        lat, lon, t0, velocity, heading = track[:5]
+        dt = at - t0
+        dist_km = velocity * dt / 1000
+        north_km = dist_km * math.cos(math.radians(heading))
+        east_km = dist_km * math.sin(math.radians(heading))
+        new_lat = lat + north_km / KM_PER_DEG_LAT
+        new_lon = lon + east_km / (KM_PER_DEG_LAT * math.cos(math.radians(lat)))
+        return new_lat, new_lon
+
+    def predict_entries(self, center_lat: float, center_lon: float, radius_km: float,
+                        start: float, end: float, exclude=()) -> list[tuple[float, str, StateVector]]:
+        """Aircraft predicted to enter the radius between start and end
+
+        Solves |p + v*t| = radius in a local flat-earth frame around the
+        center for every track at once.
+
+        Args:
+            center_lat, center_lon: Center of the radius
+            radius_km: Radius in kilometers
+            start, end: Time window (unix seconds)
+            exclude: icao24 codes to skip (already notified)
+
+        Returns:
+            Sorted list of (predicted entry time, icao24, StateVector as last reported)
+        """
+        icaos = [icao24 for icao24 in self.tracks if icao24 not in exclude]
+        if not icaos:
+            return []
+
+        tracks = np.array([self.tracks[icao24][:5] for icao24 in icaos], dtype=float)
+        lat, lon, t0, velocity, heading = tracks.T
+
+        # Position relative to the center and velocity, both in km and km/s
+        km_per_deg_lon = KM_PER_DEG_LAT * math.cos(math.radians(center_lat))
+        px = (lon - center_lon) * km_per_deg_lon
+        py = (lat - center_lat) * KM_PER_DEG_LAT
+        vx = velocity / 1000 * np.sin(np.radians(heading))
+        vy = velocity / 1000 * np.cos(np.radians(heading))
+
+        # |p + v*tau|^2 = r^2  ->  a*tau^2 + b*tau + c = 0
+        a = vx ** 2 + vy ** 2
+        b = 2 * (px * vx + py * vy)
+        c = px ** 2 + py ** 2 - radius_km ** 2
+        disc = b ** 2 - 4 * a * c
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tau_in = (-b - np.sqrt(disc)) / (2 * a)   # First crossing, relative to t0
+            tau_out = (-b + np.sqrt(disc)) / (2 * a)
+
+        # Already inside at the window start counts as entering at the start
+        window_start = start - t0
+        entry = np.maximum(tau_in, window_start)
+        hits = (
+            (a > 0) & (disc >= 0)
+            & (tau_out >= window_start)              # Hasn't already left
+            & (entry <= end - t0)                    # Gets in before the window closes
+            & (entry <= self.max_extrapolation)      # Still close enough to the last report to trust
+        )
+
+        entries = []
+        for i in np.flatnonzero(hits):
+            icao24 = icaos[i]
+            lat, lon, time_position, velocity, heading, callsign, altitude = self.tracks[icao24]
+            state_vec = StateVector(icao24, callsign, time_position, lat, lon, altitude, False, velocity, heading)
+            entries.append((float(t0[i] + entry[i]), icao24, state_vec))
+        entries.sort(key=lambda e: e[0])
+        return entries
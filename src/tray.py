@@ -1,31 +1,123 @@
+import threading
+import time
+
 import pystray
 from PIL import Image, ImageDraw
 import webbrowser
 
 from src.helper_funcs import make_radius_handler, make_flight_handler
 
+MENU_DEBOUNCE_S = 0.25  # update_menu() calls this close together are coalesced into one refresh
+RADIUS_OPTIONS = (1, 2, 5, 8, 10, 15, 20, 30, 40)
+
+
+def _no_action(icon, item):
+    pass
+
+
+class MenuModel:
+    """What the tray menu shows, taken from the shared state
+
+    The pystray menu is built once with texts that are callables reading
+    this model, so a refresh is one state snapshot, a few compares and
+    (only if something shown changed) one icon.update_menu(). The recent
+    flights submenu is the only part with items of its own and is rebuilt
+    only when the recent flights change.
+    """
+
+    def __init__(self, tray):
+        self.tray = tray
+        self.version = 0           # Bumped whenever something shown changed
+        self.state_version = -1    # SharedState.version the model was last refreshed from
+        self.radius_km = None
+        self.paused = False
+        self.status_text = ''      # Live "N aircraft in range • credits" line
+        self.budget_text = ''
+        self.metrics_text = ''
+        self.recent_items = ()
+        self._recent_key = None
+        self._shown = None
+
+    def refresh(self, state) -> bool:
+        """Bring the model up to date with state
+
+        Returns:
+            True if anything the menu shows changed
+        """
+        version = state.version
+        if version == self.state_version:
+            return False  # Nothing written since the last refresh
+        self.state_version = version
+        values = state.snapshot()
+
+        # Recent flights submenu, rebuilt only when the flights change
+        recent_key = tuple((flight['display'], flight['callsign']) for flight in values['recent_flights'])
+        if recent_key != self._recent_key:
+            self._recent_key = recent_key
+            self.recent_items = tuple(
+                pystray.MenuItem(display, make_flight_handler(self.tray, callsign))
+                for display, callsign in recent_key
+            ) or (pystray.MenuItem('No recent flights', _no_action, enabled=False),)
+
+        # Poll scheduler status (interval and projected credit spend)
+        in_range = f"{len(values['current_aircraft'])} aircraft in range"
+        if values.get('poll_interval'):
+            status_text = f"{in_range} • {values['credits_today']}/{values['daily_budget']} credits used"
+            budget_text = (f"Polling every {values['poll_interval']:.0f}s • "
+                           f"~{values['projected_daily_spend']}/{values['daily_budget']} credits today")
+        else:
+            status_text = in_range
+            budget_text = "Polling: starting..."
+
+        shown = (values['radius_km'], values['paused'], status_text, budget_text,
+                 values.get('metrics_summary') or '', recent_key)
+        if shown == self._shown:
+            return False
+        self._shown = shown
+        self.radius_km, self.paused, self.status_text, self.budget_text, self.metrics_text, _ = shown
+        self.version += 1
+        return True
+
+
 class FlightTrackerTray:
     """System tray interface for flight tracker"""
-    
-    def __init__(self, state):
+
+    def __init__(self, state, debounce: float = MENU_DEBOUNCE_S, show_radius: bool = True):
         """
         Initialize tray with shared state
-        
+
         Args:
-            state: Dictionary with shared data
+            state: SharedState with the shared data
+            debounce: Seconds update_menu() requests are collected before one refresh
+            show_radius: Offer the 'Set Radius' submenu (off for watchpoints, each has its own radius)
         """
         self.state = state
+        self.show_radius = show_radius
         self.icon = None
-    
+        self.debounce = debounce
+        self.model = MenuModel(self)
+        self.menu_updates = 0  # Refreshes that reached pystray
+        self._menu = None
+        self._icons = {}  # paused -> rendered icon image
+        self._lock = threading.Lock()  # Refreshes come from the refresher thread and from clicks
+        self._pending = threading.Event()
+
     def create_icon(self, paused=False): # paused set to False at first, changed in run() based on state.
+        """The airplane icon, drawn once per state (active/paused) and reused"""
+        image = self._icons.get(paused)
+        if image is None:
+            image = self._icons[paused] = self._draw_icon(paused)
+        return image
+
+    def _draw_icon(self, paused):
         """Create a simple airplane icon"""
         # Create a 64x64 blue square for now
         bg_color = '#b66f6d' if paused else '#7b9c98'  # Red if paused, green if active
-            
+
         # Create image
         image = Image.new('RGB', (64, 64), color=bg_color)
         draw = ImageDraw.Draw(image)
-        
+
         # Simple shape of airplane
         # Body of plane
         draw.rectangle([28, 20, 36, 50], fill='white')
@@ -35,78 +127,96 @@ class FlightTrackerTray:
         draw.polygon([28, 20, 36, 20, 32, 12], fill='white')
         # Tail wings
         draw.rectangle([24, 18, 40, 22], fill='white')
-        
+
         return image
-    
+
     def toggle_pause(self, icon, item):
         """Toggle pause/resume searching for nearby planes"""
-        self.state['paused'] = not self.state['paused']
-        status_str = "paused" if self.state['paused'] else "resumed"
+        paused = not self.state['paused']
+        self.state['paused'] = paused  # Wakes the monitor right away (see SharedState)
+        status_str = "paused" if paused else "resumed"
         print(f"\nMonitoring {status_str}")
-        
+
         # Update both menu AND icon
-        icon.icon = self.create_icon(self.state['paused'])  # Rebuild icon image to reflect program state
-        icon.menu = self.create_menu()  # Rebuild menu to update text
+        icon.icon = self.create_icon(paused)  # Cached image for the new state
+        self.refresh_menu()  # Clicks aren't debounced
 
     def change_radius(self, icon, item, radius):
         """Change monitoring radius"""
-        self.state['radius_km'] = radius
+        self.state['radius_km'] = radius  # Wakes the monitor right away (see SharedState)
         print(f'\nRadius changed to {radius}km')
-        icon.menu = self.create_menu()  # Rebuild menu to update text
+        self.refresh_menu()
 
     def quit_app(self, icon, item):
         """Exit the application"""
         print("\nExiting flight tracker...")
+        self.state['exiting'] = True  # Monitor loop returns instead of sleeping on
         icon.stop()
-    
+
     def open_flight_link(self, callsign):
         """Open FlightRadar24 link from tray"""
         webbrowser.open(f'https://www.flightradar24.com/{callsign}')
-    
+
+    def _radius_label(self, radius):
+        # Add checkmark to radius selected
+        return lambda item: f"{'✓ ' if self.model.radius_km == radius else '  '}{radius} km"
+
     def create_menu(self):
-        """Create the system tray menu"""
-        # Radius submenu
-        radius_items = []
-        for r in [1, 2, 5, 8, 10, 15, 20, 30, 40]:  # Options for radius
-            # Add checkmark to radius selected
-            label = f"{'✓ ' if self.state['radius_km'] == r else '  '}{r} km"
-            radius_items.append(
-                pystray.MenuItem(label, make_radius_handler(self, r))
+        """Create the system tray menu (once, later calls refresh the model and return the same menu)"""
+        with self._lock:
+            self.model.refresh(self.state)
+            if self._menu is not None:
+                return self._menu
+
+            model = self.model
+            radius_items = [pystray.MenuItem(self._radius_label(r), make_radius_handler(self, r))
+                            for r in RADIUS_OPTIONS]
+
+            # Build main menu, texts are read from the model whenever pystray updates it
+            self._menu = pystray.Menu(
+                pystray.MenuItem('Recent Flights', pystray.Menu(lambda: iter(model.recent_items))),
+                pystray.MenuItem('Set Radius', pystray.Menu(*radius_items),  # Each radius option passed as separate item
+                                 visible=self.show_radius),
+                pystray.Menu.SEPARATOR,
+                pystray.MenuItem(lambda item: model.status_text, _no_action, enabled=False),
+                pystray.MenuItem(lambda item: model.budget_text, _no_action, enabled=False),
+                # Hot-path timings, only when metrics are enabled (--metrics-port / --stats-file)
+                pystray.MenuItem(lambda item: model.metrics_text, _no_action, enabled=False,
+                                 visible=lambda item: bool(model.metrics_text)),
+                pystray.Menu.SEPARATOR,
+                pystray.MenuItem(lambda item: "Resume" if model.paused else "Pause", self.toggle_pause),
+                pystray.Menu.SEPARATOR,
+                pystray.MenuItem('Exit', self.quit_app)
             )
-        
-        # Recent flights submenu
-        recent_items = []
-        if self.state['recent_flights']:
-            for flight in self.state['recent_flights']:
-                recent_items.append(
-                    pystray.MenuItem(
-                        flight['display'],
-                        make_flight_handler(self, flight['callsign'])
-                    )
-                )
-        else:
-            recent_items.append(pystray.MenuItem('No recent flights', lambda icon, item: None, enabled=False))
-        
-        # Pause or resume program
-        pause_text = "Resume" if self.state['paused'] else "Pause"
-        
-        # Build main menu
-        menu = pystray.Menu(
-            pystray.MenuItem('Recent Flights', pystray.Menu(*recent_items)),  # Each flight passed as separate item
-            pystray.MenuItem('Set Radius', pystray.Menu(*radius_items)),  # Each radius option passed as separate item
-            pystray.Menu.SEPARATOR,
-            pystray.MenuItem(pause_text, self.toggle_pause),
-            pystray.Menu.SEPARATOR,
-            pystray.MenuItem('Exit', self.quit_app)
-        )
-        
-        return menu
-    
+            return self._menu
+
+    def refresh_menu(self) -> bool:
+        """Bring the menu up to date now, on the calling thread
+
+        Returns:
+            True if something shown changed (and pystray was asked to redraw)
+        """
+        with self._lock:
+            changed = self.model.refresh(self.state)
+        if changed and self.icon:
+            self.icon.update_menu()
+            self.menu_updates += 1
+        return changed
+
     def update_menu(self):
-        """Update menu with new state (changes menu whenever flight is 
-        added, not just when tray.run() is called.)"""
-        if self.icon:
-            self.icon.menu= self.create_menu()
+        """Ask for a menu refresh (e.g. a flight was added), returns right away
+
+        Called from the monitor and notification threads. Requests within
+        `debounce` seconds are coalesced, a burst of arrivals costs one refresh.
+        """
+        self._pending.set()
+
+    def _refresh_loop(self):
+        while True:
+            self._pending.wait()
+            time.sleep(self.debounce)  # Let the rest of a burst arrive
+            self._pending.clear()
+            self.refresh_menu()
 
     def run(self):
         """Start the system tray icon"""
@@ -116,6 +226,7 @@ class FlightTrackerTray:
             'Flight Tracker',
             self.create_menu()
         )
-        
+        threading.Thread(target=self._refresh_loop, name='tray-menu', daemon=True).start()
+
         # This blocks until icon.stop() is called
         self.icon.run()
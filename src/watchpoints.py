@@ -0,0 +1,243 @@
+import json
+import math
+import time
+
+import numpy as np
+
+from src.enrichment import EnrichmentCache
+from src.location import calculate_bounding_box, filter_within_radius, split_antimeridian
+from src.metrics import METRICS
+from src.monitoring_loop import (build_notification, default_dispatcher, record_request, wait_for_next_poll,
+                                 wait_for_token)
+from src.opensky import credits_for_bbox, get_default_client
+from src.token_manager import TokenManager
+from src.scheduler import BUSY, QUIET, PollScheduler, traffic_level
+from src.states_decoder import StatesBatch
+from src.track_predictor import TrackPredictor
+from src.seen_tracker import QUIET_PERIOD_S, SeenAircraftTracker
+from src.shared_state import halted, resumed
+from src.startup import report_first_poll
+
+GRID_CELL_DEG = 0.5  # Spatial index cell size (about 55 km of latitude)
+
+
+class Watchpoint:
+    """A watched location with its own radius and seen-aircraft set"""
+
+    def __init__(self, name: str, lat: float, lon: float, radius_km: float, quiet_period: float = QUIET_PERIOD_S):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.radius_km = radius_km
+        self.seen_aircraft = SeenAircraftTracker(quiet_period)
+
+    def bounding_box(self) -> dict[str, float]:
+        return calculate_bounding_box(self.lat, self.lon, self.radius_km)
+
+    def __repr__(self):
+        return f"Watchpoint({self.name!r}, {self.lat:.4f}, {self.lon:.4f}, {self.radius_km}km)"
+
+
+def load_watchpoints(path: str, quiet_period: float = QUIET_PERIOD_S) -> list[Watchpoint]:
+    """Load watchpoints from a JSON file
+
+    Format:
+        [{"name": "Office", "lat": 47.61, "lon": -122.33, "radius_km": 5}, ...]
+    """
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    return [Watchpoint(e['name'], e['lat'], e['lon'], e.get('radius_km', 5), quiet_period) for e in entries]
+
+
+def union_bounding_box(boxes: list[dict[str, float]]) -> dict[str, float]:
+    """Smallest bounding box containing all the given boxes"""
+    return {
+        'lamin': min(b['lamin'] for b in boxes),
+        'lamax': max(b['lamax'] for b in boxes),
+        'lomin': min(b['lomin'] for b in boxes),
+        'lomax': max(b['lomax'] for b in boxes)
+    }
+
+
+def plan_query_regions(watchpoints: list[Watchpoint]) -> list[tuple[dict[str, float], list[Watchpoint]]]:
+    """Group watchpoints into as few query regions as possible
+
+    Starts with one box per watchpoint and greedily merges the pair whose
+    union is smallest, as long as the merged box costs at least one credit
+    less than querying the two separately. Nearby sites collapse into one
+    fetch, far apart sites (different cities) keep their own small box.
+
+    Returns:
+        List of (bounding box, watchpoints in it). A region crossing the
+        antimeridian becomes two boxes for the same watchpoints.
+    """
+    regions = [(wp.bounding_box(), [wp]) for wp in watchpoints]
+
+    while len(regions) > 1:
+        best = None
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                merged = union_bounding_box([regions[i][0], regions[j][0]])
+                cost = credits_for_bbox(merged)
+                if cost > credits_for_bbox(regions[i][0]) + credits_for_bbox(regions[j][0]) - 1:
+                    continue  # Merging would not save any credits
+                area = (merged['lamax'] - merged['lamin']) * (merged['lomax'] - merged['lomin'])
+                if best is None or area < best[0]:
+                    best = (area, i, j, merged)
+
+        if best is None:
+            break
+        _, i, j, merged = best
+        regions[i] = (merged, regions[i][1] + regions[j][1])
+        del regions[j]
+
+    return [(box, wps) for bbox, wps in regions for box in split_antimeridian(bbox)]
+
+
+class WatchpointGrid:
+    """Uniform lat/lon grid mapping cells to the watchpoints whose box overlaps them"""
+
+    def __init__(self, watchpoints: list[Watchpoint], cell_deg: float = GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}  # (row, col) -> list of watchpoints
+        for wp in watchpoints:
+            # Aircraft longitudes are within -180..180, so a box crossing the antimeridian is indexed as two
+            for bbox in split_antimeridian(wp.bounding_box()):
+                for row in range(self._cell(bbox['lamin']), self._cell(bbox['lamax']) + 1):
+                    for col in range(self._cell(bbox['lomin']), self._cell(bbox['lomax']) + 1):
+                        self.cells.setdefault((row, col), []).append(wp)
+
+    def _cell(self, degrees: float) -> int:
+        return math.floor(degrees / self.cell_deg)
+
+    def assign(self, lats: np.ndarray, lons: np.ndarray) -> dict[Watchpoint, np.ndarray]:
+        """Candidate aircraft indices for each watchpoint
+
+        Aircraft are bucketed by cell in one vectorized pass, so each
+        watchpoint only has to distance-check the aircraft near it.
+        """
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        rows = np.floor(lats[valid] / self.cell_deg).astype(np.int64)
+        cols = np.floor(lons[valid] / self.cell_deg).astype(np.int64)
+
+        candidates = {}
+        cell_keys = np.stack([rows, cols], axis=1) if len(valid) else np.empty((0, 2), dtype=np.int64)
+        unique_cells, inverse = np.unique(cell_keys, axis=0, return_inverse=True)
+        for cell_index, (row, col) in enumerate(unique_cells.tolist()):
+            wps = self.cells.get((row, col))
+            if not wps:
+                continue
+            in_cell = valid[inverse.ravel() == cell_index]
+            for wp in wps:
+                candidates.setdefault(wp, []).append(in_cell)
+
+        return {wp: np.concatenate(parts) for wp, parts in candidates.items()}
+
+
+def multi_monitoring_loop(state, aircraft_db, watchpoints, tray_obj, scheduler=None, client=None,
+                          token_manager=None, dispatcher=None, history=None, snapshots=None):
+    """Background monitoring loop for many watchpoints sharing one fetch per region"""
+    client = client or get_default_client()
+    token_manager = token_manager or TokenManager(client, state).start()
+    dispatcher = dispatcher or default_dispatcher(state, tray_obj)  # Notifications shown off this thread
+    regions = plan_query_regions(watchpoints)
+    grid = WatchpointGrid(watchpoints)
+    scheduler = scheduler or PollScheduler()
+    scheduler.credits_per_poll = sum(credits_for_bbox(bbox) for bbox, _ in regions)
+    predictor = TrackPredictor()  # Dead reckoning between polls
+    enrichment = EnrichmentCache(aircraft_db)  # Notification titles per aircraft
+
+    print(f"=== Monitoring Started: {len(watchpoints)} watchpoints in {len(regions)} query region(s) ===\n")
+    for bbox, wps in regions:
+        names = ', '.join(wp.name for wp in wps)
+        print(f"  Region ({credits_for_bbox(bbox)} credit(s)): {names}")
+    print()
+
+    try:
+        while not state['exiting']:
+            # Check if paused, sleeps until the tray resumes
+            if state['paused']:
+                print("[PAUSED - monitoring stopped]")
+                state.wait_for(resumed)
+                continue
+
+            # Token is refreshed in the background, waits only until the first one arrives
+            token = wait_for_token(state, token_manager, client)
+            if token is None:
+                continue
+
+            # One fetch per query region, merged by icao24 (regions may overlap)
+            batches = []
+            failed = False
+            for bbox, _ in regions:
+                batch = client.get_states(token, bbox)
+                record_request(client, bbox, scheduler, state)
+                if batch is None:
+                    METRICS.inc('fetch_errors_total')
+                    failed = True
+                    continue
+                batches.append(batch)
+
+            traffic = QUIET
+            batch = StatesBatch.concat(batches)
+            if failed and len(batch) == 0:
+                print(f"Error fetching data, will retry... [Tokens: {state['tokens_used']}]")
+            else:
+                report_first_poll(state)
+                lats, lons, tracks = batch.lats, batch.lons, batch.tracks
+                observed_at = time.time()
+                predictor.update(batch, observed_at)
+
+                current_aircraft = set()  # Aircraft currently in range of any watchpoint
+                new_count = 0
+                filter_start = time.perf_counter()
+
+                for wp, candidates in grid.assign(lats, lons).items():
+                    # Busiest watchpoint sets the pace
+                    if traffic != BUSY:
+                        level = traffic_level(lats[candidates], lons[candidates], tracks[candidates],
+                                              wp.lat, wp.lon, wp.radius_km)
+                        if level != QUIET:
+                            traffic = level
+                    in_radius, distances_km = filter_within_radius(
+                        lats[candidates], lons[candidates], wp.lat, wp.lon, wp.radius_km
+                    )
+                    if history is not None:
+                        history.record(observed_at, batch, candidates[in_radius], distances_km, wp.name)
+                    for index, dist_to_plane_km in zip(candidates[in_radius].tolist(), distances_km.tolist()):
+                        icao24 = batch.icao24[index]
+                        current_aircraft.add(icao24)
+
+                        # Is this a NEW aircraft for this watchpoint? (also refreshes its last-seen time)
+                        if wp.seen_aircraft.observe(icao24):
+                            notification = build_notification(batch.vector(index), enrichment, dist_to_plane_km)
+                            notification['message'] += f" from {wp.name}"
+                            dispatcher.enqueue(notification)
+                            new_count += 1
+
+                # Filter time includes notification building here (the loop interleaves them)
+                METRICS.observe('filter_seconds', time.perf_counter() - filter_start)
+                METRICS.set('aircraft_in_box', len(batch))
+                METRICS.set('aircraft_in_radius', len(current_aircraft))
+
+                # Update current aircraft count for tray
+                state['current_aircraft'] = current_aircraft
+
+                # Status update in console
+                if new_count > 0:
+                    print(f"[{new_count} new aircraft detected] [Tokens: {state['tokens_used']}]")
+                else:
+                    print(f"[Monitoring... {len(current_aircraft)} aircraft in range] [Tokens: {state['tokens_used']}]")
+
+            # Wait for the scheduler's interval (traffic, quiet hours, daily budget, backoff)
+            interval = scheduler.next_interval(traffic)
+            scheduler.publish(state)
+            METRICS.publish(state)
+            tray_obj.update_menu()
+            if snapshots is not None:
+                snapshots.tick()  # Copies the seen aircraft here, written on its own thread
+            targets = [(wp.lat, wp.lon, wp.radius_km, wp.seen_aircraft, f" from {wp.name}") for wp in watchpoints]
+            wait_for_next_poll(state, dispatcher, enrichment, predictor, targets, interval, wake=halted)
+
+    except KeyboardInterrupt:
+        print("\n\nStopping flight tracker...")
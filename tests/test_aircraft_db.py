@@ -0,0 +1,74 @@
+import pytest
+
+from src.aircraft_db import AircraftDatabase, delta_path_for
+
+HEADER = "'icao24','registration','manufacturerName','model','operator','operatorIcao'\n"
+ROWS = {
+    'a': "'a1b2c3','N123AB','Boeing','737-800','Delta Air Lines','DAL'\n",
+    'b': "'abcdef','N45','Cessna','172S','unknown',''\n",
+    'c': "'0c0ffe','G-ABCD','Airbus','A320','British Airways','BAW'\n",
+}
+
+
+def write_dump(path, *names, changed=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+        for name in names:
+            f.write(changed if changed and name == 'a' else ROWS[name])
+    return str(path)
+
+
+@pytest.fixture
+def db(tmp_path, capsys):
+    database = AircraftDatabase(write_dump(tmp_path / 'aircraft-database-complete-2025-01.csv', 'a', 'b'))
+    yield database
+    database.close()
+
+
+def test_compiled_round_trip(db):
+    assert len(db) == 2
+    record = db.lookup_record('A1B2C3')
+    assert record.manufacturer == 'Boeing'
+    assert record.model == '737-800'
+    assert record.operator == 'Delta Air Lines'
+    assert db.lookup_record('abcdef').operator is None  # 'unknown' is cleaned at compile time
+    assert db.lookup_record('0c0ffe') is None
+    assert db.lookup_record('0c0ffe') is None  # Cached miss
+
+
+def test_diff_counts_added_changed_removed(db, tmp_path):
+    changed_row = "'a1b2c3','N123AB','Boeing','737-900','Delta Air Lines','DAL'\n"
+    stats = db.update_from_dump(write_dump(tmp_path / 'aircraft-database-complete-2025-02.csv',
+                                           'a', 'c', changed=changed_row))
+    assert (stats['added'], stats['changed'], stats['removed']) == (1, 1, 1)
+    assert len(db) == 2
+    assert db.lookup_record('a1b2c3').model == '737-900'
+    assert db.lookup_record('abcdef') is None
+    assert db.lookup_record('0c0ffe').operator == 'British Airways'
+
+
+def test_diff_counts_removal_of_aircraft_added_by_earlier_delta(db, tmp_path):
+    stats = db.update_from_dump(write_dump(tmp_path / 'aircraft-database-complete-2025-02.csv', 'a', 'b', 'c'))
+    assert (stats['added'], stats['removed']) == (1, 0)
+    assert len(db) == 3
+
+    stats = db.update_from_dump(write_dump(tmp_path / 'aircraft-database-complete-2025-03.csv', 'a', 'b'))
+    assert (stats['added'], stats['changed'], stats['removed']) == (0, 0, 1)
+    assert len(db) == 2
+    assert db.lookup_record('0c0ffe') is None
+
+
+def test_delta_is_reloaded(db, tmp_path):
+    version = db.version
+    db.update_from_dump(write_dump(tmp_path / 'aircraft-database-complete-2025-02.csv', 'a', 'c'))
+    assert db.version == version + 1
+    assert (tmp_path / 'aircraft-database-complete-2025-01.acdelta').exists()
+    assert delta_path_for(db.path).endswith('.acdelta')
+
+    reopened = AircraftDatabase(db.csv_path)
+    try:
+        assert len(reopened) == 2
+        assert reopened.lookup_record('abcdef') is None
+        assert reopened.lookup_record('0c0ffe').model == 'A320'
+    finally:
+        reopened.close()
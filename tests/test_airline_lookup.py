@@ -0,0 +1,59 @@
+import os
+
+from src.airline_lookup import compile_airline_table, ensure_airline_table, load_airline_codes, load_airline_table
+
+OPENFLIGHTS = (
+    '1,"Delta Air Lines",\\N,"DL","DAL","DELTA","United States","Y"\n'
+    '2,"Old Delta",\\N,"","DAL","","United States","N"\n'
+    '3,"Example\tCargo",\\N,"","XCG","","Nowhere","N"\n'
+    '4,"No Designator",\\N,"ND","N/A","","Nowhere","Y"\n'
+)
+AIRCRAFT_DUMP = (
+    "'icao24','registration','manufacturerName','model','operator','operatorIcao'\n"
+    "'a1b2c3','N123AB','Boeing','737-800','Delta Air Lines Inc','DAL'\n"
+    "'a1b2c4','N124AB','Boeing','737-900','Delta Air Lines','DAL'\n"
+    "'a1b2c5','N125AB','Airbus','A321','Delta Air Lines','dal'\n"
+    "'400a01','G-ABCD','Airbus','A320','British Airways','BAW'\n"
+    "'abcdef','N45','Cessna','172S','unknown','XXX'\n"
+    "'abcdee','N46','Cessna','172S','Private owner',''\n"
+)
+
+
+def test_compile_from_aircraft_dump_and_openflights(tmp_path):
+    (tmp_path / 'dump.csv').write_text(AIRCRAFT_DUMP, encoding='utf-8')
+    (tmp_path / 'airlines.dat').write_text(OPENFLIGHTS, encoding='utf-8')
+    table_path = str(tmp_path / 'airline_table.tsv')
+
+    compile_airline_table([str(tmp_path / 'dump.csv')], table_path)
+    assert load_airline_table(table_path) == {
+        'BAW': 'British Airways',
+        'DAL': 'Delta Air Lines',  # Most common spelling
+    }
+
+    compile_airline_table([str(tmp_path / 'dump.csv'), str(tmp_path / 'airlines.dat')], table_path)
+    assert load_airline_table(table_path) == {
+        'BAW': 'British Airways',
+        'DAL': 'Delta Air Lines',  # Active airline wins over the defunct one
+        'XCG': 'Example Cargo',
+    }
+
+
+def test_table_is_compiled_when_the_dump_is_newer(tmp_path):
+    dump = tmp_path / 'dump.csv'
+    dump.write_text(AIRCRAFT_DUMP, encoding='utf-8')
+    table_path = str(tmp_path / 'airline_table.tsv')
+    assert ensure_airline_table(str(dump), table_path)
+    assert not ensure_airline_table(str(dump), table_path)
+
+    os.utime(dump, (os.path.getmtime(table_path) + 60,) * 2)
+    assert ensure_airline_table(str(dump), table_path)
+
+
+def test_curated_names_win_over_the_table(tmp_path):
+    (tmp_path / 'airline_table.tsv').write_text("AAL\tAmerican\nQXE\tHorizon Air\n", encoding='utf-8')
+    (tmp_path / 'codes.json').write_text('{"aal": "American Airlines"}', encoding='utf-8')
+    codes = load_airline_codes(str(tmp_path / 'codes.json'), str(tmp_path / 'airline_table.tsv'))
+    assert codes == {'AAL': 'American Airlines', 'QXE': 'Horizon Air'}
+
+    assert load_airline_codes(str(tmp_path / 'codes.json'), str(tmp_path / 'missing.tsv')) == \
+        {'AAL': 'American Airlines'}
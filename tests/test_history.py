@@ -0,0 +1,32 @@
+import sqlite3
+
+from src.history import SightingHistory
+
+
+def test_visits_keep_the_notification_title(tmp_path):
+    history = SightingHistory(str(tmp_path / 'history.db'))
+    history.write([
+        (1000.0, 'a1b2c3', 'DAL12', 47.5, -122.5, 1000.0, 2.5, ''),
+        (1010.0, 'a1b2c3', 'DAL12', 47.5, -122.5, 1000.0, 2.0, ''),
+        (1020.0, 'abcdef', None, 47.6, -122.4, 500.0, 4.0, ''),
+    ])
+    flights = history.last_flights()
+    assert [(f['icao24'], f['title'], f['sightings']) for f in flights] == [
+        ('abcdef', 'No callsign', 1),
+        ('a1b2c3', 'Delta Air Lines', 2),
+    ]
+
+
+def test_history_without_titles_is_migrated(tmp_path):
+    path = str(tmp_path / 'history.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY, icao24 TEXT NOT NULL, callsign TEXT, operator TEXT,"
+                 " watchpoint TEXT NOT NULL DEFAULT '', first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+                 " closest_km REAL, sightings INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("INSERT INTO visits (icao24, callsign, first_seen, last_seen) VALUES ('a1b2c3', 'N45', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    history = SightingHistory(path)
+    history.write([(1000.0, 'abcdef', 'DAL12', 47.5, -122.5, 1000.0, 2.5, '')])
+    assert [f['title'] for f in history.last_flights()] == ['Delta Air Lines', None]
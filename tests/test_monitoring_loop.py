@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+
+from src.monitoring_loop import record_request
+from src.scheduler import PollScheduler
+from src.shared_state import SharedState
+
+BBOX = {'lamin': 47.0, 'lamax': 48.0, 'lomin': -123.0, 'lomax': -122.0}
+
+
+def test_only_successful_requests_count_credits():
+    scheduler = PollScheduler()
+    state = SharedState(tokens_used=0)
+    for status in (200, 429, None, 200, 500):
+        client = SimpleNamespace(last_response={'status': status, 'retry_after': None})
+        record_request(client, BBOX, scheduler, state)
+    assert state['tokens_used'] == scheduler.credits_today == 2
+    assert scheduler.consecutive_errors == 1
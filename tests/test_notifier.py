@@ -0,0 +1,35 @@
+import threading
+import time
+
+from src.notifier import NotificationDispatcher
+
+
+def collect(arrival_gaps, burst_window=0.1, burst_max=0.35):
+    dispatcher = NotificationDispatcher(None, None, [], burst_window=burst_window, burst_max=burst_max)
+
+    def feed():
+        for n, gap in enumerate(arrival_gaps, 1):
+            time.sleep(gap)
+            dispatcher.enqueue({'n': n})
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    burst, stopping = dispatcher._collect_burst({'n': 0})
+    feeder.join()
+    return [item['n'] for item in burst], stopping
+
+
+def test_burst_extends_while_arrivals_keep_coming():
+    burst, stopping = collect([0.05] * 4)  # Over 0.2 s, past the first window
+    assert burst == [0, 1, 2, 3, 4]
+    assert not stopping
+
+
+def test_burst_ends_after_a_quiet_window():
+    burst, _ = collect([0.05, 0.25])
+    assert burst == [0, 1]
+
+
+def test_burst_is_capped():
+    burst, _ = collect([0.05] * 12)  # A steady trickle for 0.6 s
+    assert 5 <= len(burst) <= 8
@@ -0,0 +1,28 @@
+from benchmarks import synthetic
+from src.recorder import read_recording, write_frame
+
+BBOX = {'lamin': 47.0, 'lomin': -123.0, 'lamax': 48.0, 'lomax': -122.0}
+
+
+def test_frames_round_trip(tmp_path):
+    path = str(tmp_path / 'traffic.osrec')
+    frames = [synthetic.generate_payload(47.5, -122.5, 20, seed=1, now=1000),
+              {'time': 1010, 'states': None}]  # Empty sky
+    write_frame(path, 1000.5, BBOX, frames[0])
+    write_frame(path, 1010.5, BBOX, frames[1], columnar=False)
+
+    recorded = list(read_recording(path))
+    assert [at for at, _, _ in recorded] == [1000.5, 1010.5]
+    assert recorded[0][1] == BBOX
+    assert recorded[0][2] == frames[0]
+    assert recorded[1][2] == frames[1]
+
+
+def test_truncated_last_frame_is_skipped(tmp_path):
+    path = str(tmp_path / 'traffic.osrec')
+    write_frame(path, 1000.0, BBOX, synthetic.generate_payload(47.5, -122.5, 5, now=1000))
+    write_frame(path, 1010.0, BBOX, synthetic.generate_payload(47.5, -122.5, 5, now=1010))
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 3)  # Interrupted while writing the second frame
+
+    assert [at for at, _, _ in read_recording(path)] == [1000.0]
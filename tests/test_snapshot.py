@@ -0,0 +1,61 @@
+import time
+from collections import deque
+
+import pytest
+
+from src.scheduler import PollScheduler
+from src.seen_tracker import SeenAircraftTracker
+from src.shared_state import SharedState
+from src.snapshot import RuntimeSnapshots, Snapshot, decode_snapshot, encode_snapshot
+
+
+def make_state(recent=()):
+    return SharedState(tokens_used=0, recent_flights=deque(recent, maxlen=5))
+
+
+def test_encode_decode_round_trip():
+    now = time.time()
+    snapshot = Snapshot(now, 739000, 120, 130, {'': ([1, 0xABCDEF], [now - 60, now - 5]), 'Office': ([], [])},
+                        [('Boeing 737-800 - Delta Air Lines', 'DAL12'), ('Cessna 172S', 'N45')])
+    decoded = decode_snapshot(encode_snapshot(snapshot))
+    assert decoded.saved_at == snapshot.saved_at
+    assert (decoded.day, decoded.credits_today, decoded.tokens_used) == (739000, 120, 130)
+    assert decoded.trackers[''][0] == [1, 0xABCDEF]
+    assert decoded.trackers[''][1] == pytest.approx([now - 60, now - 5], abs=0.01)
+    assert decoded.trackers['Office'] == ([], [])
+    assert decoded.recent == snapshot.recent
+
+
+def test_corrupt_snapshot_is_rejected():
+    data = encode_snapshot(Snapshot(time.time(), 1, 0, 0, {'': ([1, 2], [0.0, 0.0])}, []))
+    with pytest.raises(ValueError):
+        decode_snapshot(data[:-4])
+    with pytest.raises(ValueError):
+        decode_snapshot(b'XXXX' + data[4:])
+
+
+def test_save_and_restore(tmp_path):
+    path = str(tmp_path / 'runtime.snapshot')
+    scheduler = PollScheduler()
+    scheduler.credits_today = 42
+    tracker = SeenAircraftTracker()
+    tracker.observe('abcdef', time.time() - 2 * 3600)  # Gone longer than the quiet period
+    tracker.observe('a1b2c3')
+    state = make_state([{'display': 'Cessna 172S (N45)', 'callsign': 'N45'}])
+    state['tokens_used'] = 7
+    RuntimeSnapshots(path, state, scheduler, {'': tracker}).save()
+
+    restored_tracker = SeenAircraftTracker()
+    restored_scheduler = PollScheduler()
+    restored_state = make_state()
+    assert RuntimeSnapshots(path, restored_state, restored_scheduler, {'': restored_tracker}).restore()
+    assert 'a1b2c3' in restored_tracker
+    assert len(restored_tracker) == 1
+    assert not restored_tracker.observe('a1b2c3')  # Not notified again
+    assert restored_scheduler.credits_today == 42
+    assert restored_state['tokens_used'] == 7
+    assert list(restored_state['recent_flights']) == [{'display': 'Cessna 172S (N45)', 'callsign': 'N45'}]
+
+
+def test_missing_snapshot(tmp_path):
+    assert not RuntimeSnapshots(str(tmp_path / 'none'), make_state(), PollScheduler(), {}).restore()
@@ -0,0 +1,15 @@
+import numpy as np
+
+from src.watchpoints import Watchpoint, WatchpointGrid
+
+
+def test_grid_covers_both_sides_of_the_antimeridian():
+    fiji = Watchpoint('Fiji', -17.75, 179.9, 30)
+    samoa = Watchpoint('Samoa', -13.83, -171.76, 10)
+    grid = WatchpointGrid([fiji, samoa])
+
+    lats = np.array([-17.7, -17.8, -13.84, 10.0, np.nan])
+    lons = np.array([179.95, -179.9, -171.75, 179.95, 0.0])
+    candidates = grid.assign(lats, lons)
+    assert sorted(candidates[fiji].tolist()) == [0, 1]  # East and west of 180
+    assert candidates[samoa].tolist() == [2]